@@ -1,87 +1,433 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory
+from flask import Flask, Request, Response, render_template, stream_with_context, request, redirect, url_for, flash, session, make_response, abort, get_flashed_messages
 import random
 import sqlite3
-import pandas as pd
+import importlib
+import importlib.util
 import os
+import json
+import gzip
+import hashlib
+import threading
+import csv
+import io
+import tempfile
+import time
+import zlib
+from collections import OrderedDict
 from werkzeug.utils import secure_filename
 import urllib.parse
-from datetime import datetime
+
+import bulk_import
+import changelog
+import components
+import cube
+import grading
+import importer
+import migrations
+import risk
+import single_flight
+import standing
+import student_search
+import upload_store
+import usn_index
+import write_queue
+
+try:
+    import brotli
+except ImportError:  # optional, gzip is always available
+    brotli = None
+
+class LazyModule:
+    """Module proxy that imports on first attribute access (keeps pandas off the startup path)"""
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    @property
+    def available(self) -> bool:
+        return self._module is not None or importlib.util.find_spec(self._name) is not None
+
+pd = LazyModule("pandas")
+# optional, only needed for ?format=xlsx exports
+xlsxwriter = LazyModule("xlsxwriter")
+
+class UploadRequest(Request):
+    """Uploaded files stay in memory up to UPLOAD_SPOOL_BYTES and are hashed as they arrive"""
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return upload_store.HashingSpool(UPLOAD_SPOOL_BYTES)
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 app.secret_key = "tracker_secret_key"
 
 # ---------------- DATA/UPLOAD CONFIG ----------------
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Directory holding eduboard_semN.db (overridable for benchmarks and staging copies)
+DATA_DIR = os.environ.get("EDUBOARD_DATA_DIR", BASE_DIR)
+# Fast start: schema checks run on the first request that needs a DB, not at import
+FAST_START = os.environ.get("EDUBOARD_FAST_START", "1") != "0"
 DB_PATH = os.path.join(BASE_DIR, "eduboard.db")
-UPLOAD_FOLDER = os.path.join(BASE_DIR, "uploads")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Retained copies of imported sheets and their catalog, created on the first upload
+UPLOAD_FOLDER = os.path.join(DATA_DIR, "uploads")
 ALLOWED_EXTENSIONS = {"xls", "xlsx", "csv"}
-
-def ensure_final_total_column(df):
-    """Ensure dataframe has final_total100 column, handle transition from final_total150"""
-    if 'final_total150' in df.columns and 'final_total100' not in df.columns:
-        df = df.rename(columns={'final_total150': 'final_total100'})
-    return df
+# Uploads larger than this spill from memory to a temp file while being parsed
+UPLOAD_SPOOL_BYTES = 16 * 1024 * 1024
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 512
+COMPRESSIBLE_MIMETYPES = {"text/html", "text/css", "text/csv", "application/json", "application/javascript", "image/svg+xml"}
+# Static URLs carry a content hash (?v=...), so they can be cached for a year
+STATIC_MAX_AGE = 365 * 24 * 3600
+# Semester sets for the topper lists
+TOPPER_SCOPES = {"year1": (1, 2), "year2": (3, 4), "college": (1, 2, 3, 4)}
+# Topper score per student: mean over subject rows, or mean of per-semester means
+TOPPER_WEIGHTINGS = {"subject": "SUM(sem_sum) / SUM(subjects)", "semester": "AVG(sem_avg)"}
+# Rows fetched from SQLite per chunk when streaming exports
+EXPORT_CHUNK_ROWS = 1000
+# Flags listed on the at-risk page at most (the per-rule counts cover all of them)
+AT_RISK_PAGE_ROWS = 500
+# Students whose cross-semester history is kept in memory
+HISTORY_CACHE_SIZE = 4096
+# How often change_log is checked for writes made by other processes (ingest_daemon.py, grading.py regrade)
+OUTSIDE_WRITES_POLL_SECONDS = 2.0
+# How often this process renews its change-feed cursors (they expire after changelog.PROCESS_CONSUMER_TTL_SECONDS)
+CONSUMER_HEARTBEAT_SECONDS = 60.0
+# Most results /api/students/search returns per request
+SEARCH_MAX_RESULTS = 100
+# Analytics computations (dashboards, toppers, charts) running at once; more queue, then get a 503
+ANALYTICS_MAX_CONCURRENT = max(2, os.cpu_count() or 1)
+ANALYTICS_MAX_QUEUED = 32
+ANALYTICS_QUEUE_SECONDS = 10.0
+ANALYTICS_RETRY_AFTER_SECONDS = 5
+# Dashboard tables are rendered while rows are read, instead of after loading them all
+STREAM_DASHBOARDS = os.environ.get("EDUBOARD_STREAM_DASHBOARDS", "1") != "0"
+# Rows fetched from SQLite per chunk of a streamed page; each chunk is sent as it is rendered
+STREAM_CHUNK_ROWS = 200
+EXPORT_COLUMNS = ["usn", "name", "subject", "cie1", "cie2", "cie_total50", "assignment1marks", "assignment2marks",
+                  "ass_total50", "see", "see_total50", "final_total100", "grade"]
 
 # ---------------- DB INIT ----------------
 def get_db_path(sem_number: int) -> str:
-    return os.path.join(BASE_DIR, f"eduboard_sem{sem_number}.db")
+    return os.path.join(DATA_DIR, f"eduboard_sem{sem_number}.db")
 
 def init_db():
-    for sem in (1, 2, 3, 4):
-        conn = sqlite3.connect(get_db_path(sem))
-        c = conn.cursor()
-        # Create table if it doesn't exist
-        c.execute(
-            """
-            CREATE TABLE IF NOT EXISTS students(
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                usn TEXT,
-                name TEXT,
-                subject TEXT,
-                cie1 REAL,
-                cie2 REAL,
-                cie_total50 REAL,
-                assignment1marks REAL,
-                assignment2marks REAL,
-                ass_total50 REAL,
-                see REAL,
-                see_total50 REAL,
-                final_total150 REAL,
-                final_total100 REAL,
-                grade TEXT
-            )
-            """
-        )
-        # Add final_total100 column if it doesn't exist
-        c.execute("PRAGMA table_info(students)")
-        columns = [column[1] for column in c.fetchall()]
-        if 'final_total100' not in columns:
-            c.execute("ALTER TABLE students ADD COLUMN final_total100 REAL")
-        conn.commit()
-        conn.close()
-
-init_db()
+    # Versioned and stamped in PRAGMA user_version, so up-to-date DBs return immediately
+    migrations.migrate_all([get_db_path(sem) for sem in (1, 2, 3, 4)])
+
+def connect_semesters(sems):
+    """One connection over several semester DBs: the first is main, the others are attached as s<N>"""
+    conn = sqlite3.connect(get_db_path(sems[0]))
+    for s in sems[1:]:
+        conn.execute(f"ATTACH DATABASE ? AS s{s}", (get_db_path(s),))
+    return conn
+
+def semester_schema(sems, sem: int) -> str:
+    return 'main' if sem == sems[0] else f's{sem}'
+
+_db_ready = False
+_db_ready_lock = threading.Lock()
+
+def ensure_db_ready():
+    """Run init_db once per process"""
+    global _db_ready
+    if _db_ready:
+        return
+    with _db_ready_lock:
+        if not _db_ready:
+            init_db()
+            # Derived state is kept current from the change feed rather than rebuilt per write:
+            # each consumer gets the (semester, usn, subject) of every committed change and
+            # recomputes or drops only what those rows affect. Subscribing before anything is
+            # loaded means no write falls in between.
+            change_feed.subscribe('usn_index', student_usns.apply_changes)
+            change_feed.subscribe('student_history', _invalidate_history)
+            change_feed.subscribe('standing', standing_refresher.apply_changes)
+            change_feed.subscribe('risk', risk_monitor.apply_changes)
+            change_feed.subscribe('components', component_analytics.apply_changes)
+            change_feed.subscribe('cube', grade_cube.apply_changes)
+            change_feed.subscribe('upload_catalog', _forget_deleted_uploads)
+            threading.Thread(target=_watch_outside_writes, name="outside-writes", daemon=True).start()
+            _db_ready = True
+
+_backfill_queued = False
+
+def ensure_backfill_queued():
+    """ensure_db_ready, then queue the standing/risk backfill once per process (it loads pandas)"""
+    global _backfill_queued
+    ensure_db_ready()
+    if _backfill_queued:
+        return
+    with _db_ready_lock:
+        if not _backfill_queued:
+            for sem in (1, 2, 3, 4):
+                standing_refresher.refresh_stale(sem)
+                risk_monitor.refresh_if_empty(sem)
+            _backfill_queued = True
+
+def _watch_outside_writes():
+    """Deliver change_log entries written by other processes; this process's writes are delivered on commit"""
+    # None: the first poll also delivers whatever was written while this process was down
+    seen = dict.fromkeys((1, 2, 3, 4))
+    last_heartbeat = time.monotonic()
+    while True:
+        time.sleep(OUTSIDE_WRITES_POLL_SECONDS)
+        if time.monotonic() - last_heartbeat >= CONSUMER_HEARTBEAT_SECONDS:
+            try:
+                change_feed.heartbeat()
+                last_heartbeat = time.monotonic()
+            except sqlite3.Error:
+                pass
+        for sem in (1, 2, 3, 4):
+            try:
+                latest = change_feed.latest_version(sem)
+                if latest != seen[sem]:
+                    change_feed.notify(sem)
+                    seen[sem] = latest
+            except sqlite3.Error:
+                pass  # retried on the next poll
+
+# Change-data feed: consumers subscribe and are notified after each write commits
+change_feed = changelog.ChangeFeed(get_db_path)
+# Per-(semester, subject) CIE/assignment/SEE analytics (see components.py)
+component_analytics = components.ComponentAnalytics(get_db_path)
+# USNs present per semester, answers student_login without a query
+student_usns = usn_index.UsnIndex(get_db_path)
+# Concurrent identical analytics computations run once (see single_flight.py)
+analytics_flights = single_flight.SingleFlight(ANALYTICS_MAX_CONCURRENT, ANALYTICS_MAX_QUEUED, ANALYTICS_QUEUE_SECONDS)
+# FTS5 search over student USNs and names (see student_search.py)
+student_finder = student_search.StudentSearch(get_db_path)
+# Retained uploads by content hash, with re-upload detection (see upload_store.py)
+upload_catalog = upload_store.UploadCatalog(UPLOAD_FOLDER)
+
+# ---------------- WRITE QUEUES ----------------
+# All writes to a semester DB go through its single writer thread (group commit)
+def _semester_committed(sem: int):
+    def on_commit(batches):
+        metrics_add('write_queue', f'sem{sem}', commits=len(batches), jobs=sum(batches))
+        change_feed.notify(sem)
+    return on_commit
+
+write_queues = {sem: write_queue.WriteQueue(get_db_path(sem), on_commit=_semester_committed(sem)) for sem in (1, 2, 3, 4)}
+# Cohort percentiles and z-scores, written by jobs on the semester's writer (see standing.py)
+standing_refresher = standing.StandingRefresher(write_queues)
+# At-risk flags, written the same way (see risk.py)
+risk_monitor = risk.RiskMonitor(write_queues, get_db_path)
+# semester x subject x grade x band counts and sums, kept exact by triggers (see cube.py)
+grade_cube = cube.GradeCube(write_queues, get_db_path)
+# Cross-semester histories per USN (see get_student_history)
+_history_cache = OrderedDict()
+_history_lock = threading.Lock()
+# Bumped on every invalidation so a load that raced a write is not cached
+_history_generation = 0
+
+def _invalidate_history(changes):
+    """ChangeFeed callback: drop cached histories of students whose rows changed"""
+    global _history_generation
+    with _history_lock:
+        _history_generation += 1
+        for change in changes:
+            if change.usn is not None:
+                _history_cache.pop(change.usn.upper(), None)
+
+def _forget_deleted_uploads(changes):
+    """ChangeFeed callback: sheets whose rows were deleted may be imported again"""
+    deleted = {}
+    for change in changes:
+        if change.op == 'D':
+            deleted.setdefault(change.semester, set()).add(change.subject)
+    for sem, subjects in deleted.items():
+        upload_catalog.forget(sem, subjects)
+
+# Endpoints that never open a semester DB skip the schema check
+NO_DB_ENDPOINTS = {"index", "static", "favicon", "logout", "admin_login", "admin_dashboard", "metrics"}
+# Student login only reads the USN index: its form needs no DB, and its POST needs migrated
+# DBs but not the standing/risk backfill, which waits for the first page that shows them
+LOGIN_ENDPOINTS = {"student_login"}
+
+@app.before_request
+def lazy_db_init():
+    if request.endpoint in NO_DB_ENDPOINTS:
+        return
+    if request.endpoint in LOGIN_ENDPOINTS:
+        if request.method != 'GET':
+            ensure_db_ready()
+        return
+    ensure_backfill_queued()
+
+# Sheet-parsing workers (bulk_import) started under `python app.py` import it as __mp_main__ and need none of this
+if not FAST_START and __name__ != "__mp_main__":
+    ensure_backfill_queued()
+    student_usns.rebuild()
+    pd.load()
 
 # ---------------- UTIL ----------------
-def compute_grade(final_total):
-    try:
-        percent = float(final_total)
-    except Exception:
-        percent = 0.0
-    if percent >= 90:
-        return "O"
-    if percent >= 75:
-        return "A"
-    if percent >= 55:
-        return "B"
-    if percent >= 35:
-        return "C"
-    return "F"
+def grade_point(final_total):
+    """10-point scale for one subject: a point per 10 marks, 0 below the pass mark"""
+    if final_total is None or final_total < grading.POLICY.pass_mark:
+        return 0
+    return min(10, int(final_total // 10) + 1)
 
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def pick_encoding(accept_encoding: str):
+    """br or gzip from the Accept-Encoding header, None for identity"""
+    accept_encoding = (accept_encoding or '').lower()
+    if brotli is not None and 'br' in accept_encoding:
+        return 'br'
+    if 'gzip' in accept_encoding:
+        return 'gzip'
+    return None
+
+def compress_body(body: bytes, accept_encoding: str):
+    """Pick br/gzip from the Accept-Encoding header; returns (body, encoding or None)"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    encoding = pick_encoding(accept_encoding)
+    if encoding == 'br':
+        return brotli.compress(body, quality=5), 'br'
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+def compress_stream(chunks, encoding: str, route: str):
+    """Compress a streamed body chunk by chunk, flushing after each so the client can render it right away.
+
+    Bytes in and out are added to the route's compression metrics when the stream ends.
+    """
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        compress, flush, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        compress, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+    bytes_in = bytes_out = 0
+    for chunk in chunks:
+        bytes_in += len(chunk)
+        out = compress(chunk) + flush()
+        if out:
+            bytes_out += len(out)
+            yield out
+    out = finish()
+    bytes_out += len(out)
+    yield out
+    metrics_add('compression', route, responses=1, bytes_in=bytes_in, bytes_out=bytes_out,
+                bytes_saved=bytes_in - bytes_out)
+
+def json_payload_response(payload):
+    """Compact JSON response with ETag revalidation (compressed by compress_response)"""
+    body = json.dumps(payload, separators=(',', ':'), default=str).encode('utf-8')
+    etag = hashlib.sha1(body).hexdigest()
+    if request.if_none_match.contains_weak(etag):
+        resp = make_response('', 304)
+    else:
+        resp = make_response(body)
+        resp.mimetype = 'application/json'
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+# ---------------- METRICS ----------------
+_metrics_lock = threading.Lock()
+_metrics = {}
+
+def metrics_add(group: str, key: str, **amounts):
+    """Accumulate counters under metrics[group][key]"""
+    with _metrics_lock:
+        bucket = _metrics.setdefault(group, {}).setdefault(key, {})
+        for name, amount in amounts.items():
+            bucket[name] = bucket.get(name, 0) + amount
+
+def metrics_observe(group: str, key: str, seconds: float):
+    """Record a latency sample (count / total / max in milliseconds)"""
+    ms = seconds * 1000.0
+    with _metrics_lock:
+        bucket = _metrics.setdefault(group, {}).setdefault(key, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+        bucket['count'] += 1
+        bucket['total_ms'] += ms
+        bucket['max_ms'] = max(bucket['max_ms'], ms)
+
+def metrics_snapshot():
+    with _metrics_lock:
+        return {group: {key: dict(values) for key, values in keys.items()} for group, keys in _metrics.items()}
+
+@app.route('/metrics')
+def metrics():
+    return json_payload_response({**metrics_snapshot(), 'single_flight': analytics_flights.stats()})
+
+# ---------------- REQUEST COALESCING ----------------
+def coalesce(route: str, sems, compute, *args):
+    """compute(), run once for all concurrent requests with the same route, args and data version.
+
+    The result is shared between requests, so callers must not modify it.
+    """
+    version = tuple(change_feed.latest_version(s) for s in sems)
+    return analytics_flights.do((route, *args, version), compute)
+
+@app.errorhandler(single_flight.Overloaded)
+def analytics_overloaded(e):
+    resp = make_response('The server is busy computing analytics, please retry shortly.', 503)
+    resp.headers['Retry-After'] = str(ANALYTICS_RETRY_AFTER_SECONDS)
+    return resp
+
+# ---------------- COMPRESSION / STATIC CACHING ----------------
+_static_hashes = {}
+
+def static_file_hash(filename: str):
+    """Short content hash of a static file, recomputed only when its mtime changes"""
+    path = os.path.join(app.static_folder, filename)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    cached = _static_hashes.get(filename)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha1(f.read()).hexdigest()[:12]
+    _static_hashes[filename] = (mtime, digest)
+    return digest
+
+@app.url_defaults
+def hashed_static_url(endpoint, values):
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        digest = static_file_hash(values['filename'])
+        if digest:
+            values['v'] = digest
+
+@app.after_request
+def compress_response(response):
+    if request.endpoint == 'static' and request.args.get('v'):
+        if request.args['v'] == static_file_hash(request.view_args.get('filename', '')):
+            response.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES
+            or (response.is_streamed and not response.direct_passthrough)):
+        return response
+
+    response.direct_passthrough = False
+    body = response.get_data()
+    compressed, encoding = compress_body(body, request.headers.get('Accept-Encoding'))
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+        etag, _ = response.get_etag()
+        if etag:
+            response.set_etag(etag, weak=True)
+        route = request.url_rule.rule if request.url_rule else request.path
+        metrics_add('compression', route, responses=1, bytes_in=len(body), bytes_out=len(compressed),
+                    bytes_saved=len(body) - len(compressed))
+    return response
+
 
 
 # ---------------- HOME PAGE ----------------
@@ -107,17 +453,7 @@ def student_login():
                 flash('Invalid semester selected', 'danger')
                 return redirect(url_for('student_login'))
 
-            conn = sqlite3.connect(get_db_path(sem))
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM students 
-                WHERE UPPER(usn) = ? 
-                LIMIT 1
-            """, (usn,))
-            student_data = cursor.fetchone()
-            conn.close()
-            
-            if student_data:
+            if student_usns.contains(sem, usn):
                 session['logged_in'] = True
                 session['usn'] = usn
                 session['sem'] = sem
@@ -134,6 +470,17 @@ def student_login():
 
 
 # ---------------- STUDENT DASHBOARD ----------------
+def load_standing(sem: int, usn: str):
+    """The student's row in student_standing (percentage, percentile, zscore), or None until it is computed"""
+    conn = sqlite3.connect(get_db_path(sem))
+    try:
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("SELECT percentage, percentile, zscore FROM student_standing WHERE usn = ?",
+                           (usn.strip().upper(),)).fetchone()
+    finally:
+        conn.close()
+    return dict(row) if row else None
+
 @app.route('/student/dashboard')
 def student_dashboard():
     if 'logged_in' not in session or 'usn' not in session or 'sem' not in session:
@@ -163,7 +510,8 @@ def student_dashboard():
                              name=student_name,
                              usn=usn,
                              sem=sem,
-                             subjects=df.to_dict('records'))
+                             subjects=df.to_dict('records'),
+                             standing=load_standing(sem, usn))
                              
     except Exception as e:
         flash(f'Error loading student data: {str(e)}', 'danger')
@@ -205,207 +553,173 @@ def admin_login():
     return render_template('admin_login.html')
 
 
-# ---------------- SEMESTER 1 DASHBOARD ----------------
-@app.route('/semester1_dashboard')
-def semester1_dashboard():
-    conn = sqlite3.connect(get_db_path(1))
+# ---------------- STREAMED PAGES ----------------
+# The big dashboard tables are rendered straight from a SQLite cursor: the page
+# head and summary go out first, then the rows in chunks of STREAM_CHUNK_ROWS,
+# so neither the whole table nor the whole page is ever held in memory.
+@app.template_global()
+def stream_flush():
+    """Marks a point where a streamed page sends what it has rendered so far (no-op otherwise)"""
+    return ''
+
+def iter_rows(sem: int, sql: str, params=(), flush=None):
+    """Rows of a query over the semester DB, fetched STREAM_CHUNK_ROWS at a time; flush() runs before each fetch"""
+    conn = sqlite3.connect(get_db_path(sem))
+    try:
+        cursor = conn.execute(sql, params)
+        # Plain dicts: the template reads ~15 fields per row, and sqlite3.Row looks names up by scanning
+        names = [column[0] for column in cursor.description]
+        while True:
+            if flush is not None:
+                flush()
+            rows = cursor.fetchmany(STREAM_CHUNK_ROWS)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(zip(names, row))
+    finally:
+        conn.close()
+
+class StreamedPage:
+    """A template streamed in chunks that end wherever stream_flush() or iter_rows asks for a flush.
+
+    The render holds an analytics slot (see single_flight.py) until the
+    response is closed, and the body goes through the same encoding choice
+    and compression metrics as buffered pages.
+    """
+    def __init__(self, route: str):
+        self.route = route
+        self._flush = False
+
+    def flush(self):
+        self._flush = True
+        return ''
+
+    def chunks(self, pieces):
+        buf = []
+        for piece in pieces:
+            buf.append(piece)
+            if self._flush:
+                self._flush = False
+                yield ''.join(buf)
+                buf = []
+        if buf:
+            yield ''.join(buf)
+
+    def encoded(self, pieces, release):
+        try:
+            for chunk in self.chunks(pieces):
+                yield chunk.encode('utf-8')
+        finally:
+            release()
+
+    def response(self, template: str, **context):
+        # Released when the body is finished, or when the response is closed if it never starts
+        release = analytics_flights.hold(self.route)
+        try:
+            # Read the flashes now: the session is saved before the body is streamed
+            get_flashed_messages()
+            # Rendered with template.generate under one stream_with_context: stream_template
+            # would pass each of the ~15 pieces per table row through two more generators
+            context['stream_flush'] = self.flush
+            app.update_template_context(context)
+            pieces = app.jinja_env.get_or_select_template(template).generate(context)
+            body = stream_with_context(self.encoded(pieces, release))
+            resp = Response(body, mimetype='text/html')
+            resp.vary.add('Accept-Encoding')
+            encoding = pick_encoding(request.headers.get('Accept-Encoding'))
+            if encoding:
+                route = request.url_rule.rule if request.url_rule else request.path
+                resp.response = compress_stream(body, encoding, route)
+                resp.headers['Content-Encoding'] = encoding
+        except BaseException:
+            release()
+            raise
+        resp.call_on_close(release)
+        return resp
+
+# ---------------- SEMESTER DASHBOARDS ----------------
+def load_semester_df(sem: int):
+    conn = sqlite3.connect(get_db_path(sem))
     df = pd.read_sql_query("SELECT * FROM students ORDER BY id ASC", conn)
     conn.close()
-    
-    # Handle column name transition
-    df = ensure_final_total_column(df)
+    return df
+
+def calculate_student_totals(df):
+    """Per-student total, percentage and overall grade, sorted best first"""
+    # Calculate total marks per student across all subjects
+    student_totals = df.groupby(['usn', 'name']).agg(
+        final_total100=('final_total100', 'sum'),
+        subject_count=('subject', 'nunique'),
+    ).reset_index()
+    # Convert totals to percentage (divide by actual number of subjects * 100)
+    student_totals['final_percentage'] = (student_totals['final_total100'] / (student_totals['subject_count'] * 100) * 100).round(2)
+    # Determine overall grade based on percentage
+    student_totals['overall_grade'] = grading.POLICY.bands.letters_for(student_totals['final_percentage'])
+    return student_totals.sort_values(by="final_total100", ascending=False)
+
+def _semester_dashboard_data(sem: int):
+    df = load_semester_df(sem)
 
     if df.empty:
         data_records = []
-        top10 = []
-        bottom10 = []
         subjects = []
     else:
         data_records = df.to_dict(orient="records")
-        
-        # Calculate total marks per student across all subjects
-        student_totals = df.groupby(['usn', 'name']).agg({
-            'final_total100': 'sum',
-            'grade': lambda x: list(x)  # Keep all grades for reference
-        }).reset_index()
-        student_totals = student_totals.sort_values(by="final_total100", ascending=False)
-        
-        # Convert totals to percentage (divide by actual number of subjects * 100)
-        student_totals['subject_count'] = df.groupby(['usn', 'name'])['subject'].nunique().values
-        student_totals['final_percentage'] = (student_totals['final_total100'] / (student_totals['subject_count'] * 100) * 100).round(2)
-        
-        # Determine overall grade based on percentage
-        def get_overall_grade(percentage):
-            if percentage >= 90: return 'S'
-            elif percentage >= 80: return 'A'
-            elif percentage >= 70: return 'B'
-            elif percentage >= 60: return 'C'
-            elif percentage >= 50: return 'D'
-            elif percentage >= 40: return 'E'
-            else: return 'F'
-        
-        student_totals['overall_grade'] = student_totals['final_percentage'].apply(get_overall_grade)
-        
-        top10 = student_totals.head(10).to_dict(orient="records")
-        bottom10 = student_totals.tail(10).to_dict(orient="records")
-        
         try:
             subjects = sorted([s for s in df['subject'].dropna().unique().tolist() if str(s).strip()])
         except Exception:
             subjects = []
+    return data_records, subjects
+
+def load_semester_subjects(sem: int):
+    """Subjects of the semester that have marks, by name"""
+    conn = sqlite3.connect(get_db_path(sem))
+    try:
+        return [row[0] for row in conn.execute("""
+            SELECT name FROM subject
+            WHERE TRIM(name) != '' AND EXISTS (SELECT 1 FROM marks WHERE subject_id = subject.id)
+            ORDER BY name
+        """)]
+    finally:
+        conn.close()
 
-    return render_template('semester1_dashboard.html', data=data_records, top10=top10, bottom10=bottom10, subjects=subjects)
+def _render_semester_dashboard(sem: int):
+    template = f'semester{sem}_dashboard.html'
+    if STREAM_DASHBOARDS:
+        subjects = coalesce('semester_subjects', (sem,), lambda: load_semester_subjects(sem), sem)
+        page = StreamedPage('semester_dashboard')
+        return page.response(template, subjects=subjects,
+                             data=iter_rows(sem, "SELECT * FROM students ORDER BY id ASC", flush=page.flush))
+    data_records, subjects = coalesce('semester_dashboard', (sem,), lambda: _semester_dashboard_data(sem), sem)
+    # Top/bottom 10 charts and tables are fetched from semester_chart after first paint,
+    # and each subject's table from semester_subject_rows when it is first shown
+    return render_template(template, data=data_records, subjects=subjects)
+
+@app.route('/semester/<int:sem>/subject_rows/<path:subject_enc>')
+def semester_subject_rows(sem: int, subject_enc: str):
+    """Table rows of one subject on a semester dashboard (an HTML fragment)"""
+    if sem not in (1, 2, 3, 4):
+        abort(404)
+    subject = urllib.parse.unquote_plus(subject_enc)
+    rows = iter_rows(sem, "SELECT * FROM students WHERE subject = ? ORDER BY id ASC", (subject,))
+    return render_template('semester_subject_rows.html', sem=sem, rows=rows)
+
+@app.route('/semester1_dashboard')
+def semester1_dashboard():
+    return _render_semester_dashboard(1)
 
-# ---------------- SEMESTER 2 DASHBOARD ----------------
 @app.route('/semester2_dashboard')
 def semester2_dashboard():
-    conn = sqlite3.connect(get_db_path(2))
-    df = pd.read_sql_query("SELECT * FROM students ORDER BY id ASC", conn)
-    conn.close()
-    
-    # Handle column name transition
-    df = ensure_final_total_column(df)
+    return _render_semester_dashboard(2)
 
-    if df.empty:
-        data_records = []
-        top10 = []
-        bottom10 = []
-        subjects = []
-    else:
-        data_records = df.to_dict(orient="records")
-        
-        # Calculate total marks per student across all subjects
-        student_totals = df.groupby(['usn', 'name']).agg({
-            'final_total100': 'sum',
-            'grade': lambda x: list(x)  # Keep all grades for reference
-        }).reset_index()
-        student_totals = student_totals.sort_values(by="final_total100", ascending=False)
-        
-        # Convert totals to percentage (divide by actual number of subjects * 100)
-        student_totals['subject_count'] = df.groupby(['usn', 'name'])['subject'].nunique().values
-        student_totals['final_percentage'] = (student_totals['final_total100'] / (student_totals['subject_count'] * 100) * 100).round(2)
-        
-        # Determine overall grade based on percentage
-        def get_overall_grade(percentage):
-            if percentage >= 90: return 'S'
-            elif percentage >= 80: return 'A'
-            elif percentage >= 70: return 'B'
-            elif percentage >= 60: return 'C'
-            elif percentage >= 50: return 'D'
-            elif percentage >= 40: return 'E'
-            else: return 'F'
-        
-        student_totals['overall_grade'] = student_totals['final_percentage'].apply(get_overall_grade)
-        
-        top10 = student_totals.head(10).to_dict(orient="records")
-        bottom10 = student_totals.tail(10).to_dict(orient="records")
-        
-        try:
-            subjects = sorted([s for s in df['subject'].dropna().unique().tolist() if str(s).strip()])
-        except Exception:
-            subjects = []
-
-    return render_template('semester2_dashboard.html', data=data_records, top10=top10, bottom10=bottom10, subjects=subjects)
-
-# ---------------- SEMESTER 3 DASHBOARD ----------------
 @app.route('/semester3_dashboard')
 def semester3_dashboard():
-    conn = sqlite3.connect(get_db_path(3))
-    df = pd.read_sql_query("SELECT * FROM students ORDER BY id ASC", conn)
-    conn.close()
-    
-    # Handle column name transition
-    df = ensure_final_total_column(df)
-
-    if df.empty:
-        data_records = []
-        top10 = []
-        bottom10 = []
-        subjects = []
-    else:
-        data_records = df.to_dict(orient="records")
-        
-        # Calculate total marks per student across all subjects
-        student_totals = df.groupby(['usn', 'name']).agg({
-            'final_total100': 'sum',
-            'grade': lambda x: list(x)  # Keep all grades for reference
-        }).reset_index()
-        student_totals = student_totals.sort_values(by="final_total100", ascending=False)
-        
-        # Convert totals to percentage (divide by actual number of subjects * 100)
-        student_totals['subject_count'] = df.groupby(['usn', 'name'])['subject'].nunique().values
-        student_totals['final_percentage'] = (student_totals['final_total100'] / (student_totals['subject_count'] * 100) * 100).round(2)
-        
-        # Determine overall grade based on percentage
-        def get_overall_grade(percentage):
-            if percentage >= 90: return 'S'
-            elif percentage >= 80: return 'A'
-            elif percentage >= 70: return 'B'
-            elif percentage >= 60: return 'C'
-            elif percentage >= 50: return 'D'
-            elif percentage >= 40: return 'E'
-            else: return 'F'
-        
-        student_totals['overall_grade'] = student_totals['final_percentage'].apply(get_overall_grade)
-        
-        top10 = student_totals.head(10).to_dict(orient="records")
-        bottom10 = student_totals.tail(10).to_dict(orient="records")
-        try:
-            subjects = sorted([s for s in df['subject'].dropna().unique().tolist() if str(s).strip()])
-        except Exception:
-            subjects = []
-
-    return render_template('semester3_dashboard.html', data=data_records, top10=top10, bottom10=bottom10, subjects=subjects)
+    return _render_semester_dashboard(3)
 
-# ---------------- SEMESTER 4 DASHBOARD ----------------
 @app.route('/semester4_dashboard')
 def semester4_dashboard():
-    conn = sqlite3.connect(get_db_path(4))
-    df = pd.read_sql_query("SELECT * FROM students ORDER BY id ASC", conn)
-    conn.close()
-    
-    # Handle column name transition
-    df = ensure_final_total_column(df)
-
-    if df.empty:
-        data_records = []
-        top10 = []
-        bottom10 = []
-        subjects = []
-    else:
-        data_records = df.to_dict(orient="records")
-        
-        # Calculate total marks per student across all subjects
-        student_totals = df.groupby(['usn', 'name']).agg({
-            'final_total100': 'sum',
-            'grade': lambda x: list(x)  # Keep all grades for reference
-        }).reset_index()
-        student_totals = student_totals.sort_values(by="final_total100", ascending=False)
-        
-        # Convert totals to percentage (divide by actual number of subjects * 100)
-        student_totals['subject_count'] = df.groupby(['usn', 'name'])['subject'].nunique().values
-        student_totals['final_percentage'] = (student_totals['final_total100'] / (student_totals['subject_count'] * 100) * 100).round(2)
-        
-        # Determine overall grade based on percentage
-        def get_overall_grade(percentage):
-            if percentage >= 90: return 'S'
-            elif percentage >= 80: return 'A'
-            elif percentage >= 70: return 'B'
-            elif percentage >= 60: return 'C'
-            elif percentage >= 50: return 'D'
-            elif percentage >= 40: return 'E'
-            else: return 'F'
-        
-        student_totals['overall_grade'] = student_totals['final_percentage'].apply(get_overall_grade)
-        
-        top10 = student_totals.head(10).to_dict(orient="records")
-        bottom10 = student_totals.tail(10).to_dict(orient="records")
-        try:
-            subjects = sorted([s for s in df['subject'].dropna().unique().tolist() if str(s).strip()])
-        except Exception:
-            subjects = []
-
-    return render_template('semester4_dashboard.html', data=data_records, top10=top10, bottom10=bottom10, subjects=subjects)
+    return _render_semester_dashboard(4)
 
 # ---------------- ADD MARKS (Semester-specific) ----------------
 @app.route('/add_marks/sem1', methods=['GET', 'POST'])
@@ -429,34 +743,17 @@ def add_marks_sem1():
             flash('Marks limit exceeded or negative values found! CIE & Assignments max 50, SEE max 100.')
             return redirect(url_for('add_marks_sem1'))
 
-        cie_total50 = ((cie1 + cie2) / 100.0) * 25.0
-        ass_total50 = ((a1 + a2) / 100.0) * 25.0
-        see_total50 = (see / 100.0) * 50.0
-        final_total = cie_total50 + ass_total50 + see_total50
-        grade = compute_grade(final_total)
-
-        conn = sqlite3.connect(get_db_path(1))
-        c = conn.cursor()
-        c.execute("SELECT id FROM students WHERE usn=? AND subject= ?", (usn, subject))
-        exist = c.fetchone()
-
-        if not exist:
-            c.execute(
-                """
-                INSERT INTO students (
-                    usn, name, subject,
-                    cie1, cie2, cie_total50,
-                    assignment1marks, assignment2marks, ass_total50,
-                    see, see_total50, final_total100, grade
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (usn, name, subject, cie1, cie2, cie_total50, a1, a2, ass_total50, see, see_total50, final_total, grade),
-            )
-            conn.commit()
+        row, = grading.POLICY.mark_rows([(usn, name, subject, cie1, cie2, a1, a2, see)])
+        try:
+            inserted = write_queues[1].run(lambda conn: importer.insert_marks_rows(conn, [row]))
+        except sqlite3.Error as e:
+            flash(f'Error saving marks: {e}')
+            return redirect(url_for('add_marks_sem1'))
+
+        if inserted:
             flash('Marks added successfully.')
         else:
             flash('Record already exists for this USN & Subject. No new record inserted.')
-        conn.close()
 
         return redirect(url_for('semester1_dashboard'))
 
@@ -478,12 +775,8 @@ def delete_student(sem: int):
         return redirect(url_for(redirect_endpoint))
 
     try:
-        conn = sqlite3.connect(get_db_path(sem))
-        c = conn.cursor()
-        c.execute('DELETE FROM students WHERE id = ?', (rec_id,))
-        deleted = c.rowcount
-        conn.commit()
-        conn.close()
+        # On the marks table itself: the students view reports no rowcount
+        deleted = write_queues[sem].run(lambda conn: conn.execute('DELETE FROM marks WHERE id = ?', (rec_id,)).rowcount)
         if deleted:
             flash('Record deleted successfully.', 'success')
         else:
@@ -514,34 +807,17 @@ def add_marks_sem2():
             flash('Marks limit exceeded or negative values found! CIE & Assignments max 50, SEE max 100.')
             return redirect(url_for('add_marks_sem2'))
 
-        cie_total50 = ((cie1 + cie2) / 100.0) * 25.0
-        ass_total50 = ((a1 + a2) / 100.0) * 25.0
-        see_total50 = (see / 100.0) * 50.0
-        final_total = cie_total50 + ass_total50 + see_total50
-        grade = compute_grade(final_total)
-
-        conn = sqlite3.connect(get_db_path(2))
-        c = conn.cursor()
-        c.execute("SELECT id FROM students WHERE usn=? AND subject= ?", (usn, subject))
-        exist = c.fetchone()
-
-        if not exist:
-            c.execute(
-                """
-                INSERT INTO students (
-                    usn, name, subject,
-                    cie1, cie2, cie_total50,
-                    assignment1marks, assignment2marks, ass_total50,
-                    see, see_total50, final_total100, grade
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (usn, name, subject, cie1, cie2, cie_total50, a1, a2, ass_total50, see, see_total50, final_total, grade),
-            )
-            conn.commit()
+        row, = grading.POLICY.mark_rows([(usn, name, subject, cie1, cie2, a1, a2, see)])
+        try:
+            inserted = write_queues[2].run(lambda conn: importer.insert_marks_rows(conn, [row]))
+        except sqlite3.Error as e:
+            flash(f'Error saving marks: {e}')
+            return redirect(url_for('add_marks_sem2'))
+
+        if inserted:
             flash('Marks added successfully.')
         else:
             flash('Record already exists for this USN & Subject. No new record inserted.')
-        conn.close()
 
         return redirect(url_for('semester2_dashboard'))
 
@@ -568,34 +844,17 @@ def add_marks_sem3():
             flash('Marks limit exceeded or negative values found! CIE & Assignments max 50, SEE max 100.')
             return redirect(url_for('add_marks_sem3'))
 
-        cie_total50 = ((cie1 + cie2) / 100.0) * 25.0
-        ass_total50 = ((a1 + a2) / 100.0) * 25.0
-        see_total50 = (see / 100.0) * 50.0
-        final_total = cie_total50 + ass_total50 + see_total50
-        grade = compute_grade(final_total)
-
-        conn = sqlite3.connect(get_db_path(3))
-        c = conn.cursor()
-        c.execute("SELECT id FROM students WHERE usn=? AND subject= ?", (usn, subject))
-        exist = c.fetchone()
-
-        if not exist:
-            c.execute(
-                """
-                INSERT INTO students (
-                    usn, name, subject,
-                    cie1, cie2, cie_total50,
-                    assignment1marks, assignment2marks, ass_total50,
-                    see, see_total50, final_total100, grade
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (usn, name, subject, cie1, cie2, cie_total50, a1, a2, ass_total50, see, see_total50, final_total, grade),
-            )
-            conn.commit()
+        row, = grading.POLICY.mark_rows([(usn, name, subject, cie1, cie2, a1, a2, see)])
+        try:
+            inserted = write_queues[3].run(lambda conn: importer.insert_marks_rows(conn, [row]))
+        except sqlite3.Error as e:
+            flash(f'Error saving marks: {e}')
+            return redirect(url_for('add_marks_sem3'))
+
+        if inserted:
             flash('Marks added successfully.')
         else:
             flash('Record already exists for this USN & Subject. No new record inserted.')
-        conn.close()
 
         return redirect(url_for('semester3_dashboard'))
 
@@ -623,106 +882,34 @@ def add_marks_sem4():
             flash('Marks limit exceeded or negative values found! CIE & Assignments max 50, SEE max 100.')
             return redirect(url_for('add_marks_sem4'))
 
-        cie_total50 = ((cie1 + cie2) / 100.0) * 25.0
-        ass_total50 = ((a1 + a2) / 100.0) * 25.0
-        see_total50 = (see / 100.0) * 50.0
-        final_total = cie_total50 + ass_total50 + see_total50
-        grade = compute_grade(final_total)
-
-        conn = sqlite3.connect(get_db_path(4))
-        c = conn.cursor()
-        c.execute("SELECT id FROM students WHERE usn=? AND subject= ?", (usn, subject))
-        exist = c.fetchone()
-
-        if not exist:
-            c.execute(
-                """
-                INSERT INTO students (
-                    usn, name, subject,
-                    cie1, cie2, cie_total50,
-                    assignment1marks, assignment2marks, ass_total50,
-                    see, see_total50, final_total100, grade
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (usn, name, subject, cie1, cie2, cie_total50, a1, a2, ass_total50, see, see_total50, final_total, grade),
-            )
-            conn.commit()
+        row, = grading.POLICY.mark_rows([(usn, name, subject, cie1, cie2, a1, a2, see)])
+        try:
+            inserted = write_queues[4].run(lambda conn: importer.insert_marks_rows(conn, [row]))
+        except sqlite3.Error as e:
+            flash(f'Error saving marks: {e}')
+            return redirect(url_for('add_marks_sem4'))
+
+        if inserted:
             flash('Marks added successfully.')
         else:
             flash('Record already exists for this USN & Subject. No new record inserted.')
-        conn.close()
 
         return redirect(url_for('semester4_dashboard'))
 
     return render_template('add_marks.html')
 
-def _handle_excel_upload_to_semester_db(filename: str, semester: int):
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    try:
-        if filename.lower().endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_excel(filepath)
-    except Exception as e:
-        flash(f'Error reading spreadsheet: {e}')
+def _handle_excel_upload_to_semester_db(stream, filename: str, semester: int):
+    rows, skip_count, error = importer.parse_semester_sheet(stream, filename)
+    if error:
+        flash(error)
         return False, 0, 0
 
-    required_cols = {"USN", "Name", "Subject", "CIE1", "CIE2", "Assignment1marks", "Assignment2marks", "SEE"}
-    missing = required_cols - set([c.strip() for c in df.columns])
-    if missing:
-        flash(f"Missing required columns in Excel: {', '.join(missing)}")
+    # Existing USN+subject rows are left alone (and not counted as skipped)
+    try:
+        inserted_count = write_queues[semester].run(lambda conn: importer.insert_marks_rows(conn, rows))
+    except sqlite3.Error as e:
+        flash(f'Error saving spreadsheet rows: {e}')
         return False, 0, 0
-
-    conn = sqlite3.connect(get_db_path(semester))
-    c = conn.cursor()
-
-    skip_count = 0
-    inserted_count = 0
-
-    for _, row in df.iterrows():
-        try:
-            usn = str(row.get('USN', '')).strip()
-            name = str(row.get('Name', '')).strip()
-            subject = str(row.get('Subject', '')).strip()
-            cie1 = float(row.get('CIE1') or 0)
-            cie2 = float(row.get('CIE2') or 0)
-            a1 = float(row.get('Assignment1marks') or 0)
-            a2 = float(row.get('Assignment2marks') or 0)
-            see = float(row.get('SEE') or 0)
-        except Exception:
-            skip_count += 1
-            continue
-
-        if any(x < 0 for x in (cie1, cie2, a1, a2, see)) or cie1 > 50 or cie2 > 50 or a1 > 50 or a2 > 50 or see > 100:
-            skip_count += 1
-            continue
-
-        cie_total50 = ((cie1 + cie2) / 100.0) * 25.0
-        ass_total50 = ((a1 + a2) / 100.0) * 25.0
-        see_total50 = (see / 100.0) * 50.0
-        final_total = cie_total50 + ass_total50 + see_total50
-        grade = compute_grade(final_total)
-
-        c.execute("SELECT id FROM students WHERE usn=? AND subject=?", (usn, subject))
-        exist = c.fetchone()
-        if not exist:
-            c.execute(
-                """
-                INSERT INTO students (
-                    usn, name, subject,
-                    cie1, cie2, cie_total50,
-                    assignment1marks, assignment2marks, ass_total50,
-                    see, see_total50, final_total100, grade
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (usn, name, subject, cie1, cie2, cie_total50, a1, a2, ass_total50, see, see_total50, final_total, grade),
-            )
-            inserted_count += 1
-        else:
-            pass
-
-    conn.commit()
-    conn.close()
     return True, inserted_count, skip_count
 
 # ---------------- UPLOAD EXCEL (Subject-specific) ----------------
@@ -736,124 +923,39 @@ def _upload_subject_common(semester: int, subject: str, success_redirect_endpoin
         flash('Unsupported file type. Upload .xls, .xlsx or .csv only.')
         return redirect(success_redirect_endpoint() if callable(success_redirect_endpoint) else url_for(success_redirect_endpoint))
 
-    # Generate unique filename to avoid permission issues
-    original_filename = secure_filename(file.filename)
-    name, ext = os.path.splitext(original_filename)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{name}_{timestamp}{ext}"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    
-    try:
-        file.save(filepath)
-    except PermissionError as e:
-        flash(f'Permission denied when saving file. The file might be open in another program.')
+    # Parsed straight from the upload stream; byte-identical re-uploads stop here
+    filename = secure_filename(file.filename)
+    target = f'sem{semester}/{subject}'
+    digest = upload_store.content_hash(file.stream)
+    previous = upload_catalog.find(target, digest)
+    if previous is not None:
+        flash(f'This file was already uploaded for subject {subject} on {previous["uploaded_at"]} '
+              f'(inserted {previous["inserted"]}); nothing to do.')
         return redirect(success_redirect_endpoint() if callable(success_redirect_endpoint) else url_for(success_redirect_endpoint))
 
-    ok, inserted_count, skip_count = _handle_excel_upload_to_subject_db(filename, semester, subject)
+    ok, inserted_count, skip_count = _handle_excel_upload_to_subject_db(file.stream, filename, semester, subject)
     if not ok:
         return redirect(success_redirect_endpoint() if callable(success_redirect_endpoint) else url_for(success_redirect_endpoint))
+    upload_catalog.retain(target, digest, filename, file.stream, inserted_count, skip_count)
 
     flash(f'Upload complete for subject {subject}. Inserted: {inserted_count}. Skipped/invalid rows: {skip_count}.')
     return redirect(success_redirect_endpoint() if callable(success_redirect_endpoint) else url_for(success_redirect_endpoint))
 
-def _handle_excel_upload_to_subject_db(filename: str, semester: int, subject: str):
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    try:
-        if filename.lower().endswith('.csv'):
-            df = pd.read_csv(filepath)
-        else:
-            df = pd.read_excel(filepath)
-    except Exception as e:
-        flash(f'Error reading file: {e}')
+def _handle_excel_upload_to_subject_db(stream, filename: str, semester: int, subject: str):
+    rows, skip_count, error = importer.parse_subject_sheet(stream, filename, subject)
+    if error:
+        flash(error)
         return False, 0, 0
 
-    # Clean up old files (keep only last 10 files per subject)
-    _cleanup_old_files(subject)
-
-    required_columns = ['usn', 'name', 'subject', 'cie1', 'cie2', 'assignment1marks', 'assignment2marks', 'see']
-    missing_cols = [col for col in required_columns if col not in df.columns]
-    if missing_cols:
-        flash(f'Missing columns: {missing_cols}')
+    try:
+        inserted_count = write_queues[semester].run(lambda conn: importer.insert_marks_rows(conn, rows))
+    except sqlite3.Error as e:
+        flash(f'Error saving file rows: {e}')
         return False, 0, 0
-
-    conn = sqlite3.connect(get_db_path(semester))
-    cursor = conn.cursor()
-    inserted_count = 0
-    skip_count = 0
-
-    for _, row in df.iterrows():
-        try:
-            # Override subject with the provided subject parameter
-            row_data = {
-                'usn': str(row['usn']).strip(),
-                'name': str(row['name']).strip(),
-                'subject': subject,  # Force the subject to match the upload target
-                'cie1': float(row['cie1']) if pd.notna(row['cie1']) else None,
-                'cie2': float(row['cie2']) if pd.notna(row['cie2']) else None,
-                'assignment1marks': float(row['assignment1marks']) if pd.notna(row['assignment1marks']) else None,
-                'assignment2marks': float(row['assignment2marks']) if pd.notna(row['assignment2marks']) else None,
-                'see': float(row['see']) if pd.notna(row['see']) else None
-            }
-
-            # Calculate derived fields
-            cie_total50 = ((row_data['cie1'] or 0) + (row_data['cie2'] or 0)) / 2
-            ass_total50 = ((row_data['assignment1marks'] or 0) + (row_data['assignment2marks'] or 0)) / 2
-            see_total50 = (row_data['see'] or 0) / 2
-            final_total100 = cie_total50 + ass_total50 + see_total50
-            grade = calculate_grade(final_total100)
-
-            # Check if record already exists
-            cursor.execute(
-                "SELECT COUNT(*) FROM students WHERE usn = ? AND subject = ?",
-                (row_data['usn'], subject)
-            )
-            if cursor.fetchone()[0] == 0:
-                cursor.execute(
-                    """INSERT INTO students 
-                    (usn, name, subject, cie1, cie2, cie_total50, assignment1marks, assignment2marks, ass_total50, see, see_total50, final_total100, grade)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (
-                        row_data['usn'], row_data['name'], row_data['subject'],
-                        row_data['cie1'], row_data['cie2'], cie_total50,
-                        row_data['assignment1marks'], row_data['assignment2marks'], ass_total50,
-                        row_data['see'], see_total50, final_total100, grade
-                    )
-                )
-                inserted_count += 1
-            else:
-                skip_count += 1
-        except Exception as e:
-            skip_count += 1
-            continue
-
-    conn.commit()
-    conn.close()
+    # Rows whose USN already has this subject count as skipped
+    skip_count += len(rows) - inserted_count
     return True, inserted_count, skip_count
 
-def _cleanup_old_files(subject_prefix: str, keep_count: int = 10):
-    """Clean up old uploaded files, keeping only the most recent ones"""
-    try:
-        # Get all files that start with the subject prefix
-        all_files = []
-        for filename in os.listdir(UPLOAD_FOLDER):
-            if filename.startswith(subject_prefix) and (filename.endswith('.xlsx') or filename.endswith('.xls') or filename.endswith('.csv')):
-                filepath = os.path.join(UPLOAD_FOLDER, filename)
-                mtime = os.path.getmtime(filepath)
-                all_files.append((mtime, filename, filepath))
-        
-        # Sort by modification time (newest first)
-        all_files.sort(reverse=True)
-        
-        # Remove old files beyond the keep count
-        for i, (mtime, filename, filepath) in enumerate(all_files):
-            if i >= keep_count:
-                try:
-                    os.remove(filepath)
-                except PermissionError:
-                    pass  # File might be in use, skip it
-    except Exception:
-        pass  # Ignore cleanup errors
-
 # ---------------- UPLOAD EXCEL (Semester-specific) ----------------
 def _upload_common(semester: int, success_redirect_endpoint: str):
     file = request.files.get('excel')
@@ -865,22 +967,20 @@ def _upload_common(semester: int, success_redirect_endpoint: str):
         flash('Unsupported file type. Upload .xls, .xlsx or .csv only.')
         return redirect(url_for(success_redirect_endpoint))
 
-    # Generate unique filename to avoid permission issues
-    original_filename = secure_filename(file.filename)
-    name, ext = os.path.splitext(original_filename)
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{name}_{timestamp}{ext}"
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    
-    try:
-        file.save(filepath)
-    except PermissionError as e:
-        flash(f'Permission denied when saving file. The file might be open in another program.')
+    # Parsed straight from the upload stream; byte-identical re-uploads stop here
+    filename = secure_filename(file.filename)
+    target = f'sem{semester}'
+    digest = upload_store.content_hash(file.stream)
+    previous = upload_catalog.find(target, digest)
+    if previous is not None:
+        flash(f'This file was already uploaded on {previous["uploaded_at"]} '
+              f'(inserted {previous["inserted"]}); nothing to do.')
         return redirect(url_for(success_redirect_endpoint))
 
-    ok, inserted_count, skip_count = _handle_excel_upload_to_semester_db(filename, semester)
+    ok, inserted_count, skip_count = _handle_excel_upload_to_semester_db(file.stream, filename, semester)
     if not ok:
         return redirect(url_for(success_redirect_endpoint))
+    upload_catalog.retain(target, digest, filename, file.stream, inserted_count, skip_count)
 
     flash(f'Upload complete. Inserted: {inserted_count}. Skipped/invalid rows: {skip_count}.')
     return redirect(url_for(success_redirect_endpoint))
@@ -935,6 +1035,86 @@ def admin_dashboard():
     return render_template('admin_dashboard.html')
 
 
+# ---------------- AT-RISK STUDENTS ----------------
+@app.route('/admin/at_risk')
+def at_risk():
+    """risk_flags of every semester, optionally narrowed with ?sem= and ?rule="""
+    sems = (1, 2, 3, 4)
+    try:
+        sem = int(request.args.get('sem', 0))
+    except ValueError:
+        sem = 0
+    rule = request.args.get('rule', '')
+    if sem not in (0,) + sems or (rule and rule not in risk.RISK_RULES):
+        abort(400)
+    union = " UNION ALL ".join(
+        f"SELECT {s} AS semester, usn, name, rule, value, detail FROM {semester_schema(sems, s)}.risk_flags"
+        for s in sems
+    )
+    where, params = [], []
+    if sem:
+        where.append("semester = ?")
+        params.append(sem)
+    if rule:
+        where.append("rule = ?")
+        params.append(rule)
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    conn = connect_semesters(sems)
+    try:
+        conn.row_factory = sqlite3.Row
+        counts = conn.execute(f"SELECT semester, rule, COUNT(*) AS students FROM ({union}) GROUP BY semester, rule").fetchall()
+        flags = conn.execute(
+            f"SELECT * FROM ({union}) {where_sql} ORDER BY semester, rule, value DESC, usn LIMIT {AT_RISK_PAGE_ROWS}",
+            params).fetchall()
+    finally:
+        conn.close()
+    summary = {s: {r: 0 for r in risk.RISK_RULES} for s in sems}
+    for row in counts:
+        summary[row['semester']][row['rule']] = row['students']
+    return render_template('at_risk.html', flags=flags, summary=summary, rules=risk.RISK_RULES,
+                           sem=sem, rule=rule, page_rows=AT_RISK_PAGE_ROWS)
+
+
+# ---------------- BULK UPLOAD ----------------
+def _semester_subjects(sem: int):
+    return bulk_import.semester_subjects(get_db_path(sem))
+
+@app.route('/admin/bulk_upload', methods=['GET', 'POST'])
+def bulk_upload():
+    """Many sheets or zip archives in one POST, with one report for all of them (?format=json for JSON)"""
+    if request.method == 'GET':
+        return render_template('bulk_upload.html', report=None)
+    try:
+        default_semester = int(request.form.get('semester') or 0) or None
+    except ValueError:
+        default_semester = None
+    files = [(f.filename, f.read()) for f in request.files.getlist('files') if f and f.filename]
+    if not files:
+        abort(400)
+    report = bulk_import.import_files(files, write_queues, default_semester,
+                                      known_subjects=_semester_subjects, catalog=upload_catalog)
+    if request.args.get('format') == 'json':
+        return json_payload_response(report)
+    return render_template('bulk_upload.html', report=report)
+
+
+# ---------------- RE-GRADE ----------------
+@app.route('/admin/regrade', methods=['POST'])
+def regrade():
+    """Recompute stored totals and grades under the current grading policy (?sem= for one semester)"""
+    try:
+        sem = int(request.args.get('sem', 0))
+    except ValueError:
+        sem = 0
+    if sem not in (0, 1, 2, 3, 4):
+        abort(400)
+    updated = {}
+    for s in ((sem,) if sem else (1, 2, 3, 4)):
+        # Through the writer, so the change feed refreshes standings, flags and caches on commit
+        updated[f'sem{s}'] = write_queues[s].run(grading.regrade)
+    return json_payload_response({'updated': updated})
+
+
 # ---------------- SEMESTER PAGE ----------------
 @app.route('/semester/<int:sem_number>')
 def semester_page(sem_number):
@@ -944,399 +1124,94 @@ def semester_page(sem_number):
     return render_template('semester.html', sem_number=sem_number)
 
 
-# ---------------- YEAR 1 TOPPERS (Sem 1 + Sem 2) ----------------
-@app.route('/year1_toppers')
-def year1_toppers():
-    # Load data from both semester DBs
-    def load_df(sem):
-        try:
-            conn = sqlite3.connect(get_db_path(sem))
-            df_local = pd.read_sql_query("SELECT usn, name, subject, final_total100, final_total150, grade FROM students", conn)
-            # Handle column name transition
-            df_local = ensure_final_total_column(df_local)
-            conn.close()
-            df_local["semester"] = sem
-            return df_local
-        except Exception:
-            return pd.DataFrame(columns=["usn","name","subject","final_total100","grade","semester"])
-
-    df1 = load_df(1)
-    df2 = load_df(2)
-    df = pd.concat([df1, df2], ignore_index=True)
-
-    # Graceful empty handling
-    if df.empty:
-        combined = []
-        top5_for_pie = []
-        line_chart_data = []
-    else:
-        # Compute per-student aggregate across subjects and semesters
-        agg = (
-            df.groupby(["usn","name"], as_index=False)["final_total100"]
-              .mean()
-              .rename(columns={"final_total100":"avg_final"})
-        )
-        # Sort and take top 10
-        agg_sorted = agg.sort_values(by="avg_final", ascending=False)
-        
-        # Prepare data for table with semester-wise percentages and comparison
-        combined = []
-        for _, student in agg_sorted.head(10).iterrows():
-            usn = student['usn']
-            name = student['name']
-            overall_avg = student['avg_final']
-            
-            # Get semester 1 percentage
-            sem1_data = df[(df['usn'] == usn) & (df['semester'] == 1)]
-            if not sem1_data.empty:
-                sem1_avg = sem1_data['final_total100'].mean()
-            else:
-                sem1_avg = 0
-            
-            # Get semester 2 percentage
-            sem2_data = df[(df['usn'] == usn) & (df['semester'] == 2)]
-            if not sem2_data.empty:
-                sem2_avg = sem2_data['final_total100'].mean()
-            else:
-                sem2_avg = 0
-            
-            # Calculate difference and determine high/low
-            difference = sem2_avg - sem1_avg
-            if difference > 0:
-                comparison = "High"
-                diff_display = f"+{difference:.2f}"
-            elif difference < 0:
-                comparison = "Low"
-                diff_display = f"{difference:.2f}"
-            else:
-                comparison = "Same"
-                diff_display = "0.00"
-            
-            combined.append({
-                'usn': usn,
-                'name': name,
-                'avg_final': overall_avg,
-                'sem1_percent': round(sem1_avg, 2),
-                'sem2_percent': round(sem2_avg, 2),
-                'comparison': comparison,
-                'difference': diff_display
-            })
-
-        # Prepare top5 for pie chart
-        top5 = agg_sorted.head(5)
-        top5_for_pie = [
-            {"label": f"{row['name']} ({row['usn']})", "value": float(row['avg_final'])}
-            for _, row in top5.iterrows()
-        ]
-        
-        # Prepare data for line chart - semester-wise percentages for top 10 students
-        sem_percentages = []
-        for _, student in agg_sorted.head(10).iterrows():
-            usn = student['usn']
-            name = student['name']
-            
-            # Get semester 1 percentage
-            sem1_data = df[(df['usn'] == usn) & (df['semester'] == 1)]
-            if not sem1_data.empty:
-                sem1_avg = sem1_data['final_total100'].mean()
-            else:
-                sem1_avg = 0
-            
-            # Get semester 2 percentage
-            sem2_data = df[(df['usn'] == usn) & (df['semester'] == 2)]
-            if not sem2_data.empty:
-                sem2_avg = sem2_data['final_total100'].mean()
-            else:
-                sem2_avg = 0
-            
-            # Calculate overall average
-            overall_avg = student['avg_final']
-            
-            sem_percentages.append({
-                'name': name,
-                'sem1': round(sem1_avg, 2),
-                'sem2': round(sem2_avg, 2),
-                'average': round(overall_avg, 2)
-            })
-        
-        line_chart_data = sem_percentages
+# ---------------- TOPPER RANKING ----------------
+def topper_ranking_sql(sems, weighting: str = "subject"):
+    """Dense-ranked cohort over the attached semester DBs (see connect_semesters).
 
-    return render_template(
-        'year1_toppers.html',
-        toppers=combined,
-        line_chart_data=line_chart_data
+    weighting "subject" averages every subject row, so semesters with more
+    subjects count for more; "semester" averages the per-semester means.
+    Ties on the 2-decimal score share a rank.
+    """
+    union = " UNION ALL ".join(
+        f"SELECT UPPER(usn) AS usn, name, final_total100, {s} AS semester FROM {semester_schema(sems, s)}.students"
+        for s in sems
     )
+    score = TOPPER_WEIGHTINGS[weighting]
+    per_sem = ", ".join(f"ROUND(MAX(CASE WHEN semester = {s} THEN sem_avg END), 2) AS sem{s}_percent" for s in sems)
+    return f"""
+        WITH per_sem AS (
+            SELECT usn, MAX(name) AS name, semester, COUNT(*) AS subjects,
+                   SUM(final_total100) AS sem_sum, AVG(final_total100) AS sem_avg
+            FROM ({union}) WHERE usn IS NOT NULL GROUP BY usn, semester
+        ), scored AS (
+            SELECT usn, MAX(name) AS name, ROUND({score}, 2) AS avg_final, {per_sem}
+            FROM per_sem GROUP BY usn
+        )
+        SELECT DENSE_RANK() OVER (ORDER BY avg_final DESC) AS rank, * FROM scored
+        ORDER BY avg_final DESC, usn
+    """
+
+def rank_toppers(sems, weighting: str = "subject", limit: int = None):
+    """Rows of rank, usn, name, avg_final and sem<N>_percent for each semester in sems"""
+    sql = topper_ranking_sql(sems, weighting)
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    started = time.perf_counter()
+    conn = connect_semesters(sems)
+    try:
+        conn.row_factory = sqlite3.Row
+        rows = [dict(row) for row in conn.execute(sql)]
+    finally:
+        conn.close()
+        metrics_observe('topper_ranking', f"{'+'.join(map(str, sems))}:{weighting}", time.perf_counter() - started)
+    return rows
+
+def _request_weighting():
+    weighting = request.args.get('weighting', 'subject')
+    if weighting not in TOPPER_WEIGHTINGS:
+        abort(400)
+    return weighting
+
+def _toppers_data(sems, weighting: str):
+    toppers = []
+    line_chart_data = []
+    for row in rank_toppers(sems, weighting, limit=10):
+        for s in sems:
+            # A semester the student has no marks in shows as 0
+            row[f'sem{s}_percent'] = row[f'sem{s}_percent'] or 0
+        difference = row[f'sem{sems[-1]}_percent'] - row[f'sem{sems[0]}_percent']
+        if difference > 0:
+            row['comparison'], row['difference'] = "High", f"+{difference:.2f}"
+        elif difference < 0:
+            row['comparison'], row['difference'] = "Low", f"{difference:.2f}"
+        else:
+            row['comparison'], row['difference'] = "Same", "0.00"
+        toppers.append(row)
+        line_chart_data.append({'name': row['name'], **{f'sem{s}': row[f'sem{s}_percent'] for s in sems},
+                                'average': row['avg_final']})
+    return toppers, line_chart_data
+
+def _render_toppers(scope: str, template: str):
+    """Top 10 of a TOPPER_SCOPES entry, compared first semester to last"""
+    sems = TOPPER_SCOPES[scope]
+    weighting = _request_weighting()
+    toppers, line_chart_data = coalesce('toppers', sems, lambda: _toppers_data(sems, weighting), scope, weighting)
+    return render_template(template, toppers=toppers, line_chart_data=line_chart_data, weighting=weighting)
 
+# ---------------- YEAR 1 TOPPERS (Sem 1 + Sem 2) ----------------
+@app.route('/year1_toppers')
+def year1_toppers():
+    return _render_toppers('year1', 'year1_toppers.html')
 
 # ---------------- YEAR 2 TOPPERS (Sem 3 + Sem 4) ----------------
 @app.route('/year2_toppers')
 def year2_toppers():
-    def load_df(sem):
-        try:
-            conn = sqlite3.connect(get_db_path(sem))
-            df_local = pd.read_sql_query("SELECT usn, name, subject, final_total100, final_total150, grade FROM students", conn)
-            # Handle column name transition
-            df_local = ensure_final_total_column(df_local)
-            conn.close()
-            df_local["semester"] = sem
-            return df_local
-        except Exception:
-            return pd.DataFrame(columns=["usn","name","subject","final_total100","grade","semester"])
-
-    df3 = load_df(3)
-    df4 = load_df(4)
-    df = pd.concat([df3, df4], ignore_index=True)
-
-    if df.empty:
-        combined = []
-        top5_for_pie = []
-        line_chart_data = []
-    else:
-        agg = (
-            df.groupby(["usn","name"], as_index=False)["final_total100"]
-              .mean()
-              .rename(columns={"final_total100":"avg_final"})
-        )
-        agg_sorted = agg.sort_values(by="avg_final", ascending=False)
-        
-        # Prepare data for table with semester-wise percentages and comparison
-        combined = []
-        for _, student in agg_sorted.head(10).iterrows():
-            usn = student['usn']
-            name = student['name']
-            overall_avg = student['avg_final']
-            
-            # Get semester 3 percentage
-            sem3_data = df[(df['usn'] == usn) & (df['semester'] == 3)]
-            if not sem3_data.empty:
-                sem3_avg = sem3_data['final_total100'].mean()
-            else:
-                sem3_avg = 0
-            
-            # Get semester 4 percentage
-            sem4_data = df[(df['usn'] == usn) & (df['semester'] == 4)]
-            if not sem4_data.empty:
-                sem4_avg = sem4_data['final_total100'].mean()
-            else:
-                sem4_avg = 0
-            
-            # Calculate difference and determine high/low
-            difference = sem4_avg - sem3_avg
-            if difference > 0:
-                comparison = "High"
-                diff_display = f"+{difference:.2f}"
-            elif difference < 0:
-                comparison = "Low"
-                diff_display = f"{difference:.2f}"
-            else:
-                comparison = "Same"
-                diff_display = "0.00"
-            
-            combined.append({
-                'usn': usn,
-                'name': name,
-                'avg_final': overall_avg,
-                'sem3_percent': round(sem3_avg, 2),
-                'sem4_percent': round(sem4_avg, 2),
-                'comparison': comparison,
-                'difference': diff_display
-            })
-
-        top5 = agg_sorted.head(5)
-        top5_for_pie = [
-            {"label": f"{row['name']} ({row['usn']})", "value": float(row['avg_final'])}
-            for _, row in top5.iterrows()
-        ]
-        
-        # Prepare data for line chart - semester-wise percentages for top 10 students
-        sem_percentages = []
-        for _, student in agg_sorted.head(10).iterrows():
-            usn = student['usn']
-            name = student['name']
-            
-            # Get semester 3 percentage
-            sem3_data = df[(df['usn'] == usn) & (df['semester'] == 3)]
-            if not sem3_data.empty:
-                sem3_avg = sem3_data['final_total100'].mean()
-            else:
-                sem3_avg = 0
-            
-            # Get semester 4 percentage
-            sem4_data = df[(df['usn'] == usn) & (df['semester'] == 4)]
-            if not sem4_data.empty:
-                sem4_avg = sem4_data['final_total100'].mean()
-            else:
-                sem4_avg = 0
-            
-            # Calculate overall average
-            overall_avg = student['avg_final']
-            
-            sem_percentages.append({
-                'name': name,
-                'sem3': round(sem3_avg, 2),
-                'sem4': round(sem4_avg, 2),
-                'average': round(overall_avg, 2)
-            })
-        
-        line_chart_data = sem_percentages
-
-    return render_template(
-        'year2_toppers.html',
-        toppers=combined,
-        line_chart_data=line_chart_data
-    )
-
+    return _render_toppers('year2', 'year2_toppers.html')
 
 # ---------------- COLLEGE TOPPERS (Sem 1 + 2 + 3 + 4) ----------------
 @app.route('/college_toppers')
 def college_toppers():
-    def load_df(sem):
-        try:
-            conn = sqlite3.connect(get_db_path(sem))
-            df_local = pd.read_sql_query("SELECT usn, name, subject, final_total100, final_total150, grade FROM students", conn)
-            # Handle column name transition
-            df_local = ensure_final_total_column(df_local)
-            conn.close()
-            df_local["semester"] = sem
-            return df_local
-        except Exception:
-            return pd.DataFrame(columns=["usn","name","subject","final_total100","grade","semester"])
-
-    frames = []
-    for s in (1, 2, 3, 4):
-        frames.append(load_df(s))
-    df = pd.concat(frames, ignore_index=True) if len(frames) else pd.DataFrame()
-
-    if df.empty:
-        combined = []
-        top5_for_pie = []
-        line_chart_data = []
-    else:
-        agg = (
-            df.groupby(["usn","name"], as_index=False)["final_total100"]
-              .mean()
-              .rename(columns={"final_total100":"avg_final"})
-        )
-        agg_sorted = agg.sort_values(by="avg_final", ascending=False)
-        
-        # Prepare data for table with semester-wise percentages and comparison
-        combined = []
-        for _, student in agg_sorted.head(10).iterrows():
-            usn = student['usn']
-            name = student['name']
-            overall_avg = student['avg_final']
-            
-            # Get semester 1 percentage
-            sem1_data = df[(df['usn'] == usn) & (df['semester'] == 1)]
-            if not sem1_data.empty:
-                sem1_avg = sem1_data['final_total100'].mean()
-            else:
-                sem1_avg = 0
-            
-            # Get semester 2 percentage
-            sem2_data = df[(df['usn'] == usn) & (df['semester'] == 2)]
-            if not sem2_data.empty:
-                sem2_avg = sem2_data['final_total100'].mean()
-            else:
-                sem2_avg = 0
-            
-            # Get semester 3 percentage
-            sem3_data = df[(df['usn'] == usn) & (df['semester'] == 3)]
-            if not sem3_data.empty:
-                sem3_avg = sem3_data['final_total100'].mean()
-            else:
-                sem3_avg = 0
-            
-            # Get semester 4 percentage
-            sem4_data = df[(df['usn'] == usn) & (df['semester'] == 4)]
-            if not sem4_data.empty:
-                sem4_avg = sem4_data['final_total100'].mean()
-            else:
-                sem4_avg = 0
-            
-            # Calculate difference (compare last semester with first)
-            difference = sem4_avg - sem1_avg
-            if difference > 0:
-                comparison = "High"
-                diff_display = f"+{difference:.2f}"
-            elif difference < 0:
-                comparison = "Low"
-                diff_display = f"{difference:.2f}"
-            else:
-                comparison = "Same"
-                diff_display = "0.00"
-            
-            combined.append({
-                'usn': usn,
-                'name': name,
-                'avg_final': overall_avg,
-                'sem1_percent': round(sem1_avg, 2),
-                'sem2_percent': round(sem2_avg, 2),
-                'sem3_percent': round(sem3_avg, 2),
-                'sem4_percent': round(sem4_avg, 2),
-                'comparison': comparison,
-                'difference': diff_display
-            })
-
-        top5 = agg_sorted.head(5)
-        top5_for_pie = [
-            {"label": f"{row['name']} ({row['usn']})", "value": float(row['avg_final'])}
-            for _, row in top5.iterrows()
-        ]
-        
-        # Prepare data for line chart - semester-wise percentages for top 10 students
-        sem_percentages = []
-        for _, student in agg_sorted.head(10).iterrows():
-            usn = student['usn']
-            name = student['name']
-            
-            # Get semester 1 percentage
-            sem1_data = df[(df['usn'] == usn) & (df['semester'] == 1)]
-            if not sem1_data.empty:
-                sem1_avg = sem1_data['final_total100'].mean()
-            else:
-                sem1_avg = 0
-            
-            # Get semester 2 percentage
-            sem2_data = df[(df['usn'] == usn) & (df['semester'] == 2)]
-            if not sem2_data.empty:
-                sem2_avg = sem2_data['final_total100'].mean()
-            else:
-                sem2_avg = 0
-            
-            # Get semester 3 percentage
-            sem3_data = df[(df['usn'] == usn) & (df['semester'] == 3)]
-            if not sem3_data.empty:
-                sem3_avg = sem3_data['final_total100'].mean()
-            else:
-                sem3_avg = 0
-            
-            # Get semester 4 percentage
-            sem4_data = df[(df['usn'] == usn) & (df['semester'] == 4)]
-            if not sem4_data.empty:
-                sem4_avg = sem4_data['final_total100'].mean()
-            else:
-                sem4_avg = 0
-            
-            # Calculate overall average
-            overall_avg = student['avg_final']
-            
-            sem_percentages.append({
-                'name': name,
-                'sem1': round(sem1_avg, 2),
-                'sem2': round(sem2_avg, 2),
-                'sem3': round(sem3_avg, 2),
-                'sem4': round(sem4_avg, 2),
-                'average': round(overall_avg, 2)
-            })
-        
-        line_chart_data = sem_percentages
-
-    return render_template(
-        'college_toppers.html',
-        toppers=combined,
-        line_chart_data=line_chart_data
-    )
+    return _render_toppers('college', 'college_toppers.html')
 
 
 # ---------------- SUBJECT VIEW (per semester) ----------------
@@ -1391,37 +1266,376 @@ def _calculate_top_students(df):
     
     return chart_data, top_students.to_dict('records')
 
+def load_subject_df(sem: int, subject: str):
+    conn = sqlite3.connect(get_db_path(sem))
+    df = pd.read_sql_query("SELECT * FROM students WHERE subject = ? ORDER BY id ASC", conn, params=(subject,))
+    conn.close()
+    return df
+
+def _subject_dashboard_data(sem: int, subject: str):
+    df = load_subject_df(sem, subject)
+    records = df.to_dict(orient='records') if not df.empty else []
+    
+    # Calculate fail analysis
+    _, fail_stats = _calculate_fail_analysis(df)
+    
+    # Calculate top students (chart series are served by subject_chart)
+    _, top_stats = _calculate_top_students(df)
+    return records, fail_stats, top_stats
+
+def _subject_summary(sem: int, subject: str):
+    """Row count, fail analysis and top 10 of a subject, computed in SQLite (for the streamed page)"""
+    conn = sqlite3.connect(get_db_path(sem))
+    try:
+        conn.row_factory = sqlite3.Row
+        total = conn.execute("SELECT COUNT(*) FROM students WHERE subject = ?", (subject,)).fetchone()[0]
+        fail_stats = [dict(row) for row in conn.execute("""
+            SELECT usn, MIN(name) AS name, COUNT(*) AS fail_count FROM students
+            WHERE subject = ? AND (grade = 'F' OR final_total100 < 60)
+            GROUP BY usn ORDER BY fail_count DESC, usn
+        """, (subject,))]
+        top_stats = [dict(row) for row in conn.execute("""
+            SELECT usn, name, final_total100, grade FROM students
+            WHERE subject = ? AND grade IS NOT 'F' AND final_total100 >= 60
+            ORDER BY final_total100 DESC, id LIMIT 10
+        """, (subject,))]
+    finally:
+        conn.close()
+    return total, fail_stats, top_stats
+
 @app.route('/semester/<int:sem>/subject/<path:subject_enc>')
 def subject_dashboard(sem: int, subject_enc: str):
     if sem not in (1, 2, 3, 4):
         flash('Invalid semester selected.', 'danger')
         return redirect(url_for('faculty_dashboard'))
     subject = urllib.parse.unquote_plus(subject_enc)
+    if STREAM_DASHBOARDS:
+        try:
+            total, fail_stats, top_stats = coalesce(
+                'subject_summary', (sem,), lambda: _subject_summary(sem, subject), sem, subject)
+        except single_flight.Overloaded:
+            raise
+        except Exception as e:
+            flash(f'Error loading subject view: {e}', 'danger')
+            return render_template('subject_dashboard.html', sem=sem, subject=subject, subject_enc=subject_enc,
+                                   data=[], total=0, fail_stats=[], top_stats=[])
+        page = StreamedPage('subject_dashboard')
+        return page.response('subject_dashboard.html', sem=sem, subject=subject, subject_enc=subject_enc, total=total,
+                             data=iter_rows(sem, "SELECT * FROM students WHERE subject = ? ORDER BY id ASC",
+                                            (subject,), flush=page.flush),
+                             fail_stats=fail_stats, top_stats=top_stats)
     try:
-        conn = sqlite3.connect(get_db_path(sem))
-        df = pd.read_sql_query("SELECT * FROM students WHERE subject = ? ORDER BY id ASC", conn, params=(subject,))
-        conn.close()
-        
-        # Handle column name transition
-        df = ensure_final_total_column(df)
-        records = df.to_dict(orient='records') if not df.empty else []
-        
-        # Calculate fail analysis
-        chart_data, fail_stats = _calculate_fail_analysis(df)
-        
-        # Calculate top students
-        top_chart_data, top_stats = _calculate_top_students(df)
+        records, fail_stats, top_stats = coalesce(
+            'subject_dashboard', (sem,), lambda: _subject_dashboard_data(sem, subject), sem, subject)
+    except single_flight.Overloaded:
+        raise
     except Exception as e:
         flash(f'Error loading subject view: {e}', 'danger')
         records = []
-        chart_data = []
         fail_stats = []
-        top_chart_data = []
         top_stats = []
     
-    return render_template('subject_dashboard.html', sem=sem, subject=subject, data=records, 
-                         chart_data=chart_data, fail_stats=fail_stats, 
-                         top_chart_data=top_chart_data, top_stats=top_stats)
+    return render_template('subject_dashboard.html', sem=sem, subject=subject, subject_enc=subject_enc, data=records, 
+                         total=len(records), fail_stats=fail_stats, top_stats=top_stats)
+
+# ---------------- CHART DATA (JSON) ----------------
+# Series are columnar with one-letter keys: u=usn, n=name, t=total, p=percentage,
+# g=grade, f=fail count. The dashboards fetch these after first paint.
+def _compact(value):
+    if hasattr(value, 'item'):  # numpy scalar
+        value = value.item()
+    return round(value, 2) if isinstance(value, float) else value
+
+def _columns(records, fields):
+    return {short: [_compact(r[long]) for r in records] for short, long in fields.items()}
+
+@app.route('/api/semester/<int:sem>/chart/<series>')
+def semester_chart(sem: int, series: str):
+    if sem not in (1, 2, 3, 4) or series not in ('top10', 'bottom10'):
+        abort(404)
+    def compute():
+        df = load_semester_df(sem)
+        if df.empty:
+            records = []
+        else:
+            student_totals = calculate_student_totals(df)
+            picked = student_totals.head(10) if series == 'top10' else student_totals.tail(10)
+            records = picked.to_dict(orient='records')
+        fields = {'u': 'usn', 'n': 'name', 't': 'final_total100', 'p': 'final_percentage', 'g': 'overall_grade'}
+        return _columns(records, fields)
+    return json_payload_response(coalesce('semester_chart', (sem,), compute, sem, series))
+
+@app.route('/api/semester/<int:sem>/subject/<path:subject_enc>/chart/<series>')
+def subject_chart(sem: int, subject_enc: str, series: str):
+    if sem not in (1, 2, 3, 4) or series not in ('fail', 'top'):
+        abort(404)
+    subject = urllib.parse.unquote_plus(subject_enc)
+
+    def compute():
+        df = load_subject_df(sem, subject)
+        if series == 'fail':
+            records, _ = _calculate_fail_analysis(df)
+            fields = {'u': 'usn', 'n': 'name', 'f': 'fail_count'}
+        else:
+            records, _ = _calculate_top_students(df)
+            fields = {'u': 'usn', 'n': 'name', 't': 'final_total100', 'g': 'grade'}
+        return _columns(records, fields)
+    return json_payload_response(coalesce('subject_chart', (sem,), compute, sem, subject, series))
+
+@app.route('/api/semester/<int:sem>/subject/<path:subject_enc>/components')
+def subject_components(sem: int, subject_enc: str):
+    """Correlations, SEE regressions and mark distributions for one subject (see components.py)"""
+    if sem not in (1, 2, 3, 4):
+        abort(404)
+    subject = urllib.parse.unquote_plus(subject_enc)
+    return json_payload_response(component_analytics.get(sem, subject))
+
+@app.route('/api/cube')
+def cube_query():
+    """Roll-up/drill-down over the grade cube.
+
+    ?by=semester,subject groups the result; any dimension can also filter,
+    with comma-separated values: /api/cube?by=semester&subject=DBMS&grade=B
+    """
+    by = [d for d in request.args.get('by', '').split(',') if d]
+    filters = {}
+    for dim in cube.DIMENSIONS:
+        if dim in request.args:
+            values = request.args[dim].split(',')
+            if dim == 'semester':
+                try:
+                    values = [int(v) for v in values]
+                except ValueError:
+                    abort(400)
+            filters[dim] = values
+    try:
+        rows = grade_cube.query(by=by, **filters)
+    except ValueError:
+        abort(400)
+    return json_payload_response({'by': by, 'rows': rows})
+
+@app.route('/api/changes/<int:sem>')
+def changes_feed(sem: int):
+    """Change log entries after ?since=<version>, for consumers outside this process.
+
+    Passing ?consumer=<name> acknowledges everything up to `since` under that name,
+    which keeps the entries after it from being compacted away. The name must be
+    registered first (python changelog.py register <name>); unknown names get a 403.
+    """
+    if sem not in (1, 2, 3, 4):
+        abort(404)
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        abort(400)
+    consumer = request.args.get('consumer')
+    if consumer:
+        try:
+            change_feed.ack(consumer, sem, since)
+        except changelog.UnknownConsumer:
+            abort(403)
+    changes = change_feed.changes_since(sem, since)
+    return json_payload_response({
+        'latest': change_feed.latest_version(sem),
+        'changes': [[c.version, c.usn, c.subject, c.op] for c in changes],
+    })
+
+# ---------------- EXPORT (CSV / XLSX) ----------------
+def _query_chunks(sems, sql, params=()):
+    """Yield [header] and then lists of rows straight from a SQLite cursor over connect_semesters(sems)"""
+    conn = connect_semesters(sems)
+    try:
+        cursor = conn.execute(sql, params)
+        yield [[d[0] for d in cursor.description]]
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+def _csv_stream(chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate(0)
+
+def _xlsx_stream(chunks):
+    """Write rows in xlsxwriter's constant_memory mode to a temp file, then stream it out"""
+    fd, path = tempfile.mkstemp(suffix='.xlsx')
+    os.close(fd)
+    try:
+        workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+        sheet = workbook.add_worksheet()
+        row_index = 0
+        for rows in chunks:
+            for row in rows:
+                sheet.write_row(row_index, 0, row)
+                row_index += 1
+        workbook.close()
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(64 * 1024)
+                if not block:
+                    break
+                yield block
+    finally:
+        os.remove(path)
+
+def _export_response(chunks, basename: str):
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt == 'xlsx':
+        if not xlsxwriter.available:
+            flash('XLSX export needs the xlsxwriter package. Use CSV instead.', 'danger')
+            return redirect(request.referrer or url_for('admin_dashboard'))
+        body = _xlsx_stream(chunks)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    elif fmt == 'csv':
+        body = _csv_stream(chunks)
+        mimetype = 'text/csv'
+    else:
+        abort(400)
+    # No Content-Length: the server sends the generator with chunked transfer encoding
+    resp = Response(body, mimetype=mimetype)
+    resp.headers['Content-Disposition'] = f'attachment; filename="{secure_filename(basename)}.{fmt}"'
+    return resp
+
+@app.route('/export/semester/<int:sem>')
+def export_semester(sem: int):
+    if sem not in (1, 2, 3, 4):
+        abort(404)
+    sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM students ORDER BY id ASC"
+    return _export_response(_query_chunks((sem,), sql), f"semester{sem}")
+
+@app.route('/export/semester/<int:sem>/subject/<path:subject_enc>')
+def export_subject(sem: int, subject_enc: str):
+    if sem not in (1, 2, 3, 4):
+        abort(404)
+    subject = urllib.parse.unquote_plus(subject_enc)
+    sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM students WHERE subject = ? ORDER BY id ASC"
+    return _export_response(_query_chunks((sem,), sql, (subject,)), f"semester{sem}_{subject}")
+
+@app.route('/export/semester/<int:sem>/student/<usn>')
+def export_student(sem: int, usn: str):
+    if sem not in (1, 2, 3, 4):
+        abort(404)
+    sql = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM students WHERE UPPER(usn) = UPPER(?) ORDER BY subject ASC"
+    return _export_response(_query_chunks((sem,), sql, (usn.strip(),)), f"semester{sem}_{usn}")
+
+@app.route('/export/toppers/<scope>')
+def export_toppers(scope: str):
+    sems = TOPPER_SCOPES.get(scope)
+    if sems is None:
+        abort(404)
+    sql = topper_ranking_sql(sems, _request_weighting())
+    try:
+        limit = int(request.args.get('limit', 0))
+    except ValueError:
+        limit = 0
+    if limit > 0:
+        sql += f" LIMIT {limit}"
+    return _export_response(_query_chunks(sems, sql), f"{scope}_toppers")
+
+# ---------------- STUDENT HISTORY ----------------
+def _history_trend(sgpas):
+    if len(sgpas) < 2:
+        return {'direction': 'steady', 'change': 0.0, 'deltas': []}
+    deltas = [round(b - a, 2) for a, b in zip(sgpas, sgpas[1:])]
+    change = round(sgpas[-1] - sgpas[0], 2)
+    direction = 'improving' if change > 0.25 else 'declining' if change < -0.25 else 'steady'
+    return {'direction': direction, 'change': change, 'deltas': deltas}
+
+def load_student_history(usn: str):
+    """All semesters of one student from a single query, or None if the USN is unknown.
+
+    The USN index says which semester DBs hold the student; only those are
+    attached, and each is probed through idx_student_usn_upper.
+    """
+    sems = [s for s in (1, 2, 3, 4) if student_usns.contains(s, usn)]
+    if not sems:
+        return None
+    union = " UNION ALL ".join(
+        f"SELECT {s} AS semester, name, subject, cie_total50, ass_total50, see_total50, final_total100, grade "
+        f"FROM {semester_schema(sems, s)}.students WHERE UPPER(usn) = :usn"
+        for s in sems
+    )
+    conn = connect_semesters(sems)
+    try:
+        rows = conn.execute(f"{union} ORDER BY semester, subject", {'usn': usn}).fetchall()
+    finally:
+        conn.close()
+
+    name = None
+    semesters = {}
+    for sem, row_name, subject, cie, ass, see, total, grade in rows:
+        name = name or row_name
+        semesters.setdefault(sem, []).append({
+            'subject': subject, 'cie_total50': cie, 'ass_total50': ass, 'see_total50': see,
+            'final_total100': total, 'grade': grade, 'grade_point': grade_point(total),
+        })
+    summary = []
+    for sem, subjects in semesters.items():
+        totals = [sub['final_total100'] or 0 for sub in subjects]
+        percentage = round(sum(totals) / len(totals), 2)
+        summary.append({
+            'semester': sem,
+            'subjects': subjects,
+            'subject_count': len(subjects),
+            'percentage': percentage,
+            'overall_grade': grading.POLICY.band(percentage),
+            'sgpa': round(sum(sub['grade_point'] for sub in subjects) / len(subjects), 2),
+            'failed': sum(1 for sub in subjects if sub['grade'] == 'F'),
+        })
+    sgpas = [s['sgpa'] for s in summary]
+    return {
+        'usn': usn,
+        'name': name,
+        'semesters': summary,
+        'cgpa': round(sum(sgpas) / len(sgpas), 2) if sgpas else None,
+        'trend': _history_trend(sgpas),
+    }
+
+def get_student_history(usn: str):
+    usn = usn.strip().upper()
+    with _history_lock:
+        if usn in _history_cache:
+            _history_cache.move_to_end(usn)
+            metrics_add('student_history', 'cache', hits=1)
+            return _history_cache[usn]
+        generation = _history_generation
+    history = load_student_history(usn)
+    metrics_add('student_history', 'cache', misses=1)
+    if history is not None:
+        with _history_lock:
+            if generation == _history_generation:
+                _history_cache[usn] = history
+            while len(_history_cache) > HISTORY_CACHE_SIZE:
+                _history_cache.popitem(last=False)
+    return history
+
+@app.route('/api/student/<usn>/history')
+def student_history(usn: str):
+    """Every semester of one student with per-semester SGPA and the trend across them"""
+    history = get_student_history(usn)
+    if history is None:
+        abort(404)
+    return json_payload_response(history)
+
+@app.route('/api/students/search')
+def search_students():
+    """Students whose USN or name words start with the words of ?q=, best match first, across semesters"""
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', student_search.SEARCH_LIMIT, type=int), SEARCH_MAX_RESULTS))
+    started = time.perf_counter()
+    results = student_finder.search(query, limit)
+    metrics_observe('student_search', 'query', time.perf_counter() - started)
+    for hit in results:
+        hit['url'] = url_for('student_biodata', sem=hit['semesters'][-1], usn=hit['usn'])
+    return json_payload_response({'query': query, 'results': results})
 
 # ---------------- STUDENT BIODATA VIEW ----------------
 @app.route('/semester/<int:sem>/student/<usn>')
@@ -1445,9 +1659,6 @@ def student_biodata(sem: int, usn: str):
             params=(usn.strip(),)
         )
         
-        # Handle column name transition
-        df = ensure_final_total_column(df)
-        
         if not df.empty:
             # Convert to list of dictionaries
             records = df.to_dict(orient='records')
@@ -1459,7 +1670,8 @@ def student_biodata(sem: int, usn: str):
                 name=name,
                 usn=usn.upper(),
                 sem=sem,
-                data=records
+                data=records,
+                standing=load_standing(sem, usn)
             )
         else:
             flash(f'No records found for USN: {usn} in semester {sem}', 'warning')
@@ -1478,9 +1690,22 @@ def student_biodata(sem: int, usn: str):
     return redirect(url_for('index'))
 
 
+_favicon_bytes = None
+
 @app.route('/favicon.ico')
 def favicon():
-    return send_from_directory(os.path.join(app.root_path, 'static'), 'favicon.svg', mimetype='image/svg+xml')
+    global _favicon_bytes
+    if _favicon_bytes is None:
+        try:
+            with open(os.path.join(app.static_folder, 'favicon.svg'), 'rb') as f:
+                _favicon_bytes = f.read()
+        except OSError:
+            abort(404)
+    resp = make_response(_favicon_bytes)
+    resp.mimetype = 'image/svg+xml'
+    resp.headers['Cache-Control'] = f'public, max-age={STATIC_MAX_AGE}, immutable'
+    resp.set_etag(hashlib.sha1(_favicon_bytes).hexdigest())
+    return resp.make_conditional(request)
 
 
 if __name__ == "__main__":
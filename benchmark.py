@@ -0,0 +1,720 @@
+"""EduBoard benchmarks.
+
+Every benchmark runs against a scratch copy of the semester databases
+(EDUBOARD_DATA_DIR), so the real eduboard_semN.db files are never touched.
+
+    python benchmark.py startup [--runs 5]
+    python benchmark.py writers [--writers 32 --writes 200]
+    python benchmark.py login [--students 100000 --logins 20000]
+    python benchmark.py layout [--students 100000 --runs 5]
+    python benchmark.py grading [--students 100000]
+    python benchmark.py bulk [--sheets 24 --students 2000]
+    python benchmark.py readers [--rows 10000,100000]
+    python benchmark.py search [--students 100000 --runs 5]
+    python benchmark.py coalesce [--students 10000 --writers 32]
+    python benchmark.py reports [--students 20000]
+    python benchmark.py stream [--students 10000]
+    python benchmark.py risk [--students 100000]
+    python benchmark.py compression [--students 2000 --runs 5]
+    python benchmark.py cube [--students 20000 --runs 5]
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BASE_DIR)
+
+import grading
+import migrations
+import write_queue
+
+# Imports app.py in a fresh interpreter and times the first request to each route.
+# Flat checkouts keep the templates next to app.py, so fall back to BASE_DIR for them.
+STARTUP_SNIPPET = r"""
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, %(base_dir)r)
+import app as eduboard
+imported = time.perf_counter()
+if not os.path.isdir(os.path.join(%(base_dir)r, 'templates')):
+    import jinja2
+    eduboard.app.jinja_loader = jinja2.FileSystemLoader(%(base_dir)r)
+client = eduboard.app.test_client()
+result = {'import_ms': (imported - started) * 1000, 'first_request_ms': {}, 'pandas_loaded_after': {}}
+for url in %(urls)r:
+    t0 = time.perf_counter()
+    client.get(url)
+    result['first_request_ms'][url] = (time.perf_counter() - t0) * 1000
+    result['pandas_loaded_after'][url] = 'pandas' in sys.modules
+print(json.dumps(result))
+"""
+
+STARTUP_URLS = ["/", "/student_login", "/favicon.ico", "/semester1_dashboard"]
+
+
+def scratch_data_dir():
+    """Copy the semester DBs into a temp dir and return its path"""
+    tmp = tempfile.mkdtemp(prefix="eduboard-bench-")
+    for sem in (1, 2, 3, 4):
+        src = os.path.join(BASE_DIR, f"eduboard_sem{sem}.db")
+        if os.path.exists(src):
+            shutil.copy(src, tmp)
+    return tmp
+
+
+def run_startup(data_dir: str, fast_start: bool):
+    env = dict(os.environ, EDUBOARD_DATA_DIR=data_dir, EDUBOARD_FAST_START="1" if fast_start else "0")
+    snippet = STARTUP_SNIPPET % {"base_dir": BASE_DIR, "urls": STARTUP_URLS}
+    out = subprocess.run([sys.executable, "-c", snippet], env=env, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(args):
+    for fast_start in (False, True):
+        data_dir = scratch_data_dir()
+        try:
+            runs = [run_startup(data_dir, fast_start) for _ in range(args.runs)]
+        finally:
+            shutil.rmtree(data_dir, ignore_errors=True)
+        label = "fast start" if fast_start else "eager start"
+        # Run 1 sees unstamped DBs (first boot); later runs find PRAGMA user_version already set
+        print(f"{label}: import first boot {runs[0]['import_ms']:.1f} ms, "
+              f"median {statistics.median(r['import_ms'] for r in runs):.1f} ms over {len(runs)} runs")
+        for url in STARTUP_URLS:
+            samples = [r["first_request_ms"][url] for r in runs]
+            print(f"  first {url:<22} median {statistics.median(samples):8.1f} ms"
+                  f"  (pandas loaded: {runs[-1]['pandas_loaded_after'][url]})")
+
+
+STRESS_INSERT_SQL = """
+    INSERT INTO students (usn, name, subject, cie1, cie2, cie_total50, assignment1marks, assignment2marks,
+                          ass_total50, see, see_total50, final_total100, grade)
+    VALUES (?, 'Stress', 'Stress Subject', 40, 40, 20, 40, 40, 20, 80, 40, 80, 'A')
+"""
+
+
+def bench_writers(args):
+    """Stress test: many threads writing one semester DB through its WriteQueue while readers poll"""
+    data_dir = scratch_data_dir()
+    path = os.path.join(data_dir, "eduboard_sem1.db")
+    try:
+        migrations.migrate(path)
+        before = sqlite3.connect(path).execute("SELECT COUNT(*) FROM students").fetchone()[0]
+        group_sizes = []
+        queue = write_queue.WriteQueue(path, on_commit=group_sizes.extend)
+        errors = []
+        reads = [0]
+        stop = threading.Event()
+
+        def writer(t):
+            for i in range(args.writes):
+                try:
+                    queue.run(lambda conn, usn=f"STRESS{t:03d}{i:05d}": conn.execute(STRESS_INSERT_SQL, (usn,)).rowcount)
+                except Exception as e:
+                    errors.append(e)
+
+        def reader():
+            conn = sqlite3.connect(path)
+            while not stop.is_set():
+                conn.execute("SELECT COUNT(*) FROM students").fetchone()
+                reads[0] += 1
+            conn.close()
+
+        readers = [threading.Thread(target=reader) for _ in range(4)]
+        writers = [threading.Thread(target=writer, args=(t,)) for t in range(args.writers)]
+        for th in readers:
+            th.start()
+        started = time.perf_counter()
+        for th in writers:
+            th.start()
+        for th in writers:
+            th.join()
+        elapsed = time.perf_counter() - started
+        stop.set()
+        for th in readers:
+            th.join()
+        # group_sizes is filled by the dispatcher thread, after the writers' futures resolve
+        queue.notified()
+
+        expected = before + args.writers * args.writes
+        after = sqlite3.connect(path).execute("SELECT COUNT(*) FROM students").fetchone()[0]
+        print(f"{args.writers} writers x {args.writes} writes: {args.writers * args.writes / elapsed:.0f} writes/s, "
+              f"{len(group_sizes)} commits (avg group {statistics.mean(group_sizes):.1f}), "
+              f"{reads[0]} concurrent reads, {len(errors)} errors")
+        if errors or after != expected or sum(group_sizes) != args.writers * args.writes:
+            print(f"FAILED: expected {expected} rows, found {after}; first error: {errors[0] if errors else None}")
+            sys.exit(1)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+GENERATED_INSERT_SQL = """
+    INSERT INTO students (usn, name, subject, cie1, cie2, cie_total50, assignment1marks, assignment2marks,
+                          ass_total50, see, see_total50, final_total100, grade)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def generate_semester_db(path: str, students: int, subjects: int = 6, seed: int = 1, target: int = None):
+    """Fill a DB migrated to `target` (default latest) with `students` x `subjects` rows of random marks"""
+    import random
+    rng = random.Random(seed)
+    migrations.migrate(path, target)
+    conn = sqlite3.connect(path)
+    raw = []
+    for s in range(students):
+        usn = f"1GEN{s:06d}"
+        for j in range(subjects):
+            cie1, cie2, a1, a2 = (rng.randint(10, 50) for _ in range(4))
+            see = rng.randint(20, 100)
+            raw.append((usn, f"Student {s}", f"Subject {j + 1}", cie1, cie2, a1, a2, see))
+    with conn:
+        # Same totals and grades as the add_marks forms
+        conn.executemany(GENERATED_INSERT_SQL, grading.POLICY.mark_rows(raw))
+    conn.close()
+
+
+def load_app(data_dir: str):
+    """Import app.py in-process against data_dir (flat checkouts keep templates next to it)"""
+    os.environ["EDUBOARD_DATA_DIR"] = data_dir
+    import app as eduboard
+    if not os.path.isdir(os.path.join(BASE_DIR, "templates")):
+        import jinja2
+        eduboard.app.jinja_loader = jinja2.FileSystemLoader(BASE_DIR)
+    return eduboard
+
+
+def bench_login(args):
+    """Student logins per second, half hits and half unknown USNs, against a generated semester"""
+    import random
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        path = os.path.join(data_dir, "eduboard_sem1.db")
+        generate_semester_db(path, args.students)
+        eduboard = load_app(data_dir)
+        client = eduboard.app.test_client()
+        rng = random.Random(2)
+        usns = [f"1GEN{rng.randrange(args.students * 2):06d}" for _ in range(args.logins)]
+
+        started = time.perf_counter()
+        eduboard.student_usns.contains(1, usns[0])
+        print(f"index load ({args.students} students): {(time.perf_counter() - started) * 1000:.1f} ms")
+
+        conn = sqlite3.connect(path)
+        started = time.perf_counter()
+        sql_hits = sum(conn.execute("SELECT 1 FROM students WHERE UPPER(usn) = ? LIMIT 1", (u,)).fetchone() is not None
+                       for u in usns)
+        sql_elapsed = time.perf_counter() - started
+        conn.close()
+
+        started = time.perf_counter()
+        set_hits = sum(eduboard.student_usns.contains(1, u) for u in usns)
+        set_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        redirects = 0
+        for u in usns:
+            response = client.post("/student_login", data={"usn": u, "semester": "1"})
+            redirects += response.status_code == 302
+        route_elapsed = time.perf_counter() - started
+
+        print(f"membership lookups: SQL {len(usns) / sql_elapsed:,.0f}/s, in-memory {len(usns) / set_elapsed:,.0f}/s")
+        print(f"POST /student_login: {len(usns) / route_elapsed:,.0f} logins/s ({redirects} accepted)")
+        if not (sql_hits == set_hits == redirects):
+            print(f"FAILED: SQL found {sql_hits}, index found {set_hits}, route accepted {redirects}")
+            sys.exit(1)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+# Representative reads against the students table (or view)
+LAYOUT_QUERIES = {
+    "full scan": ("SELECT * FROM students", ()),
+    "one subject": ("SELECT * FROM students WHERE subject = ?", ("Subject 3",)),
+    "one student": ("SELECT * FROM students WHERE UPPER(usn) = ?", ("1GEN000042",)),
+    "subject averages": ("SELECT subject, COUNT(*), AVG(final_total100) FROM students GROUP BY subject", ()),
+}
+
+
+def bench_layout(args):
+    """File size and read speed of the wide students table (v8) against the normalized layout"""
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        wide = os.path.join(data_dir, "wide.db")
+        generate_semester_db(wide, args.students, target=8)
+        normalized = os.path.join(data_dir, "normalized.db")
+        shutil.copy(wide, normalized)
+        started = time.perf_counter()
+        migrations.migrate(normalized)
+        print(f"migration to v{migrations.SCHEMA_VERSION} ({args.students} students): "
+              f"{time.perf_counter() - started:.1f} s")
+        # Both files compacted, so sizes compare layouts rather than free pages left by the migration
+        for path in (wide, normalized):
+            conn = sqlite3.connect(path)
+            conn.execute("VACUUM")
+            conn.close()
+
+        results = {}
+        for label, path in (("wide", wide), ("normalized", normalized)):
+            conn = sqlite3.connect(path)
+            timings = {}
+            for name, (sql, params) in LAYOUT_QUERIES.items():
+                runs = []
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    rows = conn.execute(sql, params).fetchall()
+                    runs.append((time.perf_counter() - started) * 1000)
+                timings[name] = (statistics.median(runs), sorted(rows, key=repr))
+            conn.close()
+            results[label] = (os.path.getsize(path), timings)
+
+        for label, (size, timings) in results.items():
+            print(f"{label:<10} {size / 1e6:8.1f} MB  " +
+                  "  ".join(f"{name} {ms:.1f} ms" for name, (ms, _) in timings.items()))
+        mismatched = [name for name in LAYOUT_QUERIES
+                      if results["wide"][1][name][1] != results["normalized"][1][name][1]]
+        if mismatched:
+            print(f"FAILED: results differ for {', '.join(mismatched)}")
+            sys.exit(1)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def bench_grading(args):
+    """Policy grading against the hand-written formula it replaced, and a whole-semester re-grade"""
+    import random
+    rng = random.Random(3)
+    rows = args.students * 6
+    raw = [("1GEN", "Student", "Subject", *(rng.randint(0, 50) for _ in range(4)), rng.randint(0, 100))
+           for _ in range(rows)]
+    policy = grading.POLICY
+
+    started = time.perf_counter()
+    looped = []
+    for usn, name, subject, cie1, cie2, a1, a2, see in raw:
+        cie, ass, see50 = ((cie1 + cie2) / 100.0) * 25.0, ((a1 + a2) / 100.0) * 25.0, (see / 100.0) * 50.0
+        total = cie + ass + see50
+        looped.append((usn, name, subject, cie1, cie2, cie, a1, a2, ass, see, see50, total, policy.grade(total)))
+    loop_elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    graded = policy.mark_rows(raw)
+    policy_elapsed = time.perf_counter() - started
+    print(f"{rows:,} rows: hand-written formula {rows / loop_elapsed:,.0f} rows/s, "
+          f"policy {rows / policy_elapsed:,.0f} rows/s")
+    form_row = raw[:1]
+    started = time.perf_counter()
+    for _ in range(10000):
+        policy.mark_rows(form_row)
+    print(f"one form row: {(time.perf_counter() - started) / 10000 * 1e6:.1f} us per call")
+
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        path = os.path.join(data_dir, "eduboard_sem1.db")
+        generate_semester_db(path, args.students)
+        conn = sqlite3.connect(path, isolation_level=None)
+        timings = {}
+        for label, config in (("unchanged policy", grading.DEFAULT_POLICY),
+                              ("stricter grades", {**grading.DEFAULT_POLICY,
+                                                   "grades": [[92, "O"], [80, "A"], [60, "B"], [40, "C"], [0, "F"]]})):
+            conn.execute("BEGIN IMMEDIATE")
+            started = time.perf_counter()
+            updated = grading.regrade(conn, grading.GradingPolicy(config))
+            conn.execute("COMMIT")
+            timings[label] = (time.perf_counter() - started, updated)
+        conn.close()
+        for label, (elapsed, updated) in timings.items():
+            print(f"re-grade, {label}: {updated:,} of {rows:,} rows changed in {elapsed * 1000:.0f} ms")
+        if looped != graded or timings["unchanged policy"][1] != 0:
+            print("FAILED: policy rows differ from the hand-written formula, or SQL disagrees with Python")
+            sys.exit(1)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def bench_bulk(args):
+    """Bulk import of generated XLSX subject sheets: serial parsing against the process pool"""
+    import io
+    import random
+    import bulk_import
+    import pandas as pd
+    rng = random.Random(4)
+    files = []
+    for j in range(args.sheets):
+        frame = pd.DataFrame({
+            "usn": [f"1GEN{s:06d}" for s in range(args.students)],
+            "name": [f"Student {s}" for s in range(args.students)],
+            "subject": f"Subject {j + 1}",
+            **{col: [rng.randint(0, 50) for _ in range(args.students)]
+               for col in ("cie1", "cie2", "assignment1marks", "assignment2marks")},
+            "see": [rng.randint(0, 100) for _ in range(args.students)],
+        })
+        buf = io.BytesIO()
+        frame.to_excel(buf, index=False)
+        files.append((f"sem{j % 4 + 1}/Subject {j + 1}.xlsx", buf.getvalue()))
+
+    entries = [bulk_import.Entry(name, data, *bulk_import.locate(name)) for name, data in files]
+    started = time.perf_counter()
+    serial_rows = sum(len(bulk_import.parse_entry(entry)[1].rows) for entry in entries)
+    serial = time.perf_counter() - started
+
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        queues = {}
+        for sem in (1, 2, 3, 4):
+            path = os.path.join(data_dir, f"eduboard_sem{sem}.db")
+            migrations.migrate(path)
+            queues[sem] = write_queue.WriteQueue(path)
+        started = time.perf_counter()
+        report = bulk_import.import_files(files, queues)
+        pooled = time.perf_counter() - started
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+    print(f"{args.sheets} sheets x {args.students} rows: serial parse {serial:.1f} s, "
+          f"pooled parse + insert {pooled:.1f} s on {os.cpu_count()} CPUs")
+    if report["totals"]["inserted"] != serial_rows or report["totals"]["failed"]:
+        print(f"FAILED: {report['totals']}")
+        sys.exit(1)
+
+
+def bench_readers(args):
+    """Every installed sheet_reader engine on generated CSV and XLSX semester sheets"""
+    import io
+    import random
+    import importer
+    import pandas as pd
+    import sheet_reader
+    rng = random.Random(5)
+    for rows in (int(n) for n in args.rows.split(",")):
+        frame = pd.DataFrame({
+            "USN": [f"1GEN{s:06d}" for s in range(rows)],
+            "Name": [f"Student {s}" for s in range(rows)],
+            "Subject": [f"Subject {s % 6 + 1}" for s in range(rows)],
+            **{col: [rng.randint(0, 50) for _ in range(rows)]
+               for col in ("CIE1", "CIE2", "Assignment1marks", "Assignment2marks")},
+            "SEE": [rng.randint(0, 100) for _ in range(rows)],
+            # Columns a real export carries that the import never needs
+            "Department": "CSE", "Email": [f"s{s}@example.edu" for s in range(rows)], "Remarks": "",
+        })
+        for ext in (".csv", ".xlsx"):
+            buf = io.BytesIO()
+            if ext == ".csv":
+                frame.to_csv(buf, index=False)
+            else:
+                frame.to_excel(buf, index=False)
+            data = buf.getvalue()
+            timings = {}
+            # What the upload helpers did before: every column through pandas, then iterrows
+            started = time.perf_counter()
+            df = pd.read_csv(io.BytesIO(data)) if ext == ".csv" else pd.read_excel(io.BytesIO(data))
+            baseline = importer.ParsedSheet(
+                [tuple(row) for _, row in df[importer.SEMESTER_COLUMNS].iterrows()], 0, None)
+            timings["pandas, all columns + iterrows"] = time.perf_counter() - started
+            for eng in sheet_reader.engines_for("sheet" + ext):
+                started = time.perf_counter()
+                parsed = importer.semester_sheet_rows(
+                    sheet_reader.read_sheet(io.BytesIO(data), "sheet" + ext, importer.SHEET_DTYPES, eng.name))
+                timings[eng.name] = time.perf_counter() - started
+                if len(parsed.rows) != len(baseline.rows) or parsed.skipped:
+                    print(f"FAILED: {eng.name} read {len(parsed.rows)} rows ({parsed.skipped} skipped), expected {rows}")
+                    sys.exit(1)
+            picked = sheet_reader.pick_engine("sheet" + ext).name
+            print(f"{rows:,} rows {ext} ({len(data) / 1e6:.1f} MB), picked: {picked}")
+            for label, elapsed in sorted(timings.items(), key=lambda item: item[1]):
+                print(f"  {label:32s} {elapsed * 1000:8.0f} ms  {rows / elapsed:10,.0f} rows/s")
+
+
+def bench_search(args):
+    """Student search latency over two generated semesters, and index sync on insert/delete"""
+    import random
+    import student_search
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        for sem in (1, 2):
+            generate_semester_db(os.path.join(data_dir, f"eduboard_sem{sem}.db"), args.students, seed=sem)
+        for sem in (3, 4):
+            migrations.migrate(os.path.join(data_dir, f"eduboard_sem{sem}.db"))
+        finder = student_search.StudentSearch(lambda sem: os.path.join(data_dir, f"eduboard_sem{sem}.db"))
+        rng = random.Random(6)
+        queries = {
+            "exact USN": lambda: f"1GEN{rng.randrange(args.students):06d}",
+            "USN prefix": lambda: f"1gen{rng.randrange(args.students // 100):04d}",
+            "name": lambda: f"Student {rng.randrange(args.students)}",
+            "name prefix": lambda: f"stud {rng.randrange(1000)}",
+        }
+        for label, make in queries.items():
+            samples = []
+            for _ in range(args.runs * 20):
+                query = make()
+                started = time.perf_counter()
+                results = finder.search(query)
+                samples.append(time.perf_counter() - started)
+                if not results:
+                    print(f"FAILED: no results for {query!r}")
+                    sys.exit(1)
+            samples.sort()
+            print(f"{label:12s} p50 {samples[len(samples) // 2] * 1000:6.2f} ms  "
+                  f"p95 {samples[int(len(samples) * 0.95)] * 1000:6.2f} ms  ({args.students:,} students x 2 semesters)")
+
+        conn = sqlite3.connect(os.path.join(data_dir, "eduboard_sem3.db"))
+        with conn:
+            conn.executemany(GENERATED_INSERT_SQL, grading.POLICY.mark_rows(
+                [("1NEW000001", "Zed Newcomer", "Subject 1", 30, 30, 30, 30, 60)]))
+        found = [hit["semesters"] for hit in finder.search("zed newc")]
+        with conn:
+            conn.execute("DELETE FROM students WHERE usn = '1NEW000001'")
+        conn.close()
+        if found != [[3]] or finder.search("zed newc"):
+            print("FAILED: the search index did not follow the insert and delete")
+            sys.exit(1)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def bench_coalesce(args):
+    """A burst of concurrent /college_toppers and top-10 chart requests, with and without coalescing"""
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        for sem in (1, 2, 3, 4):
+            generate_semester_db(os.path.join(data_dir, f"eduboard_sem{sem}.db"), args.students, seed=sem)
+        eduboard = load_app(data_dir)
+        eduboard.app.test_client().get("/")
+        urls = ["/college_toppers", "/api/semester/1/chart/top10"]
+        coalesce = eduboard.coalesce
+
+        def burst():
+            statuses = []
+
+            def get(url):
+                statuses.append(eduboard.app.test_client().get(url).status_code)
+            threads = [threading.Thread(target=get, args=(urls[i % len(urls)],)) for i in range(args.writers)]
+            started = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            return time.perf_counter() - started, statuses
+
+        for label, flights in (("coalesced", True), ("uncoalesced", False)):
+            eduboard.analytics_flights = eduboard.single_flight.SingleFlight(
+                args.writers, args.writers, eduboard.ANALYTICS_QUEUE_SECONDS)
+            eduboard.coalesce = coalesce if flights else (lambda route, sems, compute, *key: compute())
+            elapsed, statuses = burst()
+            routes = eduboard.analytics_flights.stats()["routes"]
+            computed = sum(counts.get("computed", 0) for counts in routes.values()) if flights else len(statuses)
+            print(f"{label:12s} {len(statuses)} requests in {elapsed:.2f} s, {computed} computations, "
+                  f"{statuses.count(200)} x 200")
+        eduboard.coalesce = coalesce
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def bench_reports(args):
+    """Report cards for a generated semester: full run, then an unchanged re-run that skips everything"""
+    import report_cards
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        generate_semester_db(os.path.join(data_dir, "eduboard_sem1.db"), args.students)
+        report_cards.DATA_DIR = data_dir
+        out_root = os.path.join(data_dir, "reports")
+        for label in ("full run", "unchanged re-run"):
+            stats = report_cards.generate(1, out_root)
+            print(f"{label:16s} {stats['rendered']:,} rendered, {stats['skipped']:,} skipped, "
+                  f"{stats['pages_per_second']:,} pages/s, {stats['elapsed_s']} s on {os.cpu_count()} CPUs")
+        if stats["rendered"] or stats["skipped"] != args.students:
+            print("FAILED: the re-run rendered cards whose data had not changed")
+            sys.exit(1)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def bench_stream(args):
+    """/semester1_dashboard streamed from a cursor vs rendered whole: first byte, total time, peak Python memory.
+
+    Timings come from warm runs without tracemalloc, which slows rendering
+    several times over; peak memory from a second, traced run. The subject
+    tables are fetched on demand by both pages, timed separately.
+    """
+    import tracemalloc
+    import urllib.parse
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        generate_semester_db(os.path.join(data_dir, "eduboard_sem1.db"), args.students)
+        eduboard = load_app(data_dir)
+        client = eduboard.app.test_client()
+        client.get("/")
+
+        def fetch(url):
+            started = time.perf_counter()
+            resp = client.get(url, buffered=False, headers={"Accept-Encoding": "identity"})
+            first_byte, size = None, 0
+            for chunk in resp.response:
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                size += len(chunk)
+            resp.close()
+            return first_byte, time.perf_counter() - started, size
+
+        fetch("/semester1_dashboard")  # compiles the template and warms the page cache for both runs
+        for label, streamed in (("streamed", True), ("buffered", False)):
+            eduboard.STREAM_DASHBOARDS = streamed
+            first_byte, elapsed, size = fetch("/semester1_dashboard")
+            tracemalloc.start()
+            fetch("/semester1_dashboard")
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{label:9s} first byte {first_byte * 1000:8.1f} ms, total {elapsed:6.2f} s, "
+                  f"{size / 1e6:6.1f} MB page, peak {peak / 1e6:7.1f} MB")
+        subjects = eduboard.load_semester_subjects(1)[:5]
+        started = time.perf_counter()
+        size = sum(fetch(f"/semester/1/subject_rows/{urllib.parse.quote_plus(s)}")[2] for s in subjects)
+        elapsed = time.perf_counter() - started
+        print(f"subject tables on demand: {len(subjects)} fetched in {elapsed:.2f} s ({size / 1e6:.1f} MB)")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def bench_risk(args):
+    """At-risk flags for semester 2 of a generated cohort: full evaluation, then 100 changed students"""
+    import random
+    import risk
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        paths = [os.path.join(data_dir, f"eduboard_sem{sem}.db") for sem in (1, 2)]
+        for sem, path in enumerate(paths, 1):
+            generate_semester_db(path, args.students, seed=sem)
+        conn = sqlite3.connect(paths[1], isolation_level=None)
+        usns = [f"1GEN{s:06d}" for s in random.Random(5).sample(range(args.students), 100)]
+        for label, scope in (("full evaluation", None), ("100 changed students", usns)):
+            started = time.perf_counter()
+            conn.execute("BEGIN IMMEDIATE")
+            risk.refresh_flags(conn, risk.previous_percentages(paths[0], scope), scope)
+            conn.execute("COMMIT")
+            elapsed = time.perf_counter() - started
+            flags = conn.execute("SELECT COUNT(*) FROM risk_flags").fetchone()[0]
+            print(f"{label:21s} {elapsed * 1000:8.0f} ms  ({args.students:,} students x 6 subjects, {flags:,} flags)")
+        conn.close()
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def bench_cube(args):
+    """Slice queries on the grade cube (warm, in-process cells) against the same aggregate over the raw rows"""
+    import cube
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        path_for = lambda sem: os.path.join(data_dir, f"eduboard_sem{sem}.db")
+        for sem in (1, 2, 3, 4):
+            generate_semester_db(path_for(sem), args.students, seed=sem)
+            conn = sqlite3.connect(path_for(sem), isolation_level=None)
+            conn.execute("BEGIN IMMEDIATE")
+            cube.rebuild(conn)
+            conn.execute("COMMIT")
+            conn.close()
+        grade_cube = cube.GradeCube(None, path_for)
+        queries = {
+            "B grades in a subject per semester": (
+                {"by": ("semester",), "subject": "Subject 3", "grade": "B"},
+                "SELECT COUNT(*) FROM students WHERE subject = 'Subject 3' AND grade = 'B'"),
+            "grade distribution per subject": (
+                {"by": ("subject", "grade")},
+                "SELECT subject, grade, COUNT(*), AVG(final_total100) FROM students GROUP BY subject, grade"),
+        }
+        started = time.perf_counter()
+        for sem in (1, 2, 3, 4):
+            grade_cube.cells(sem)
+        print(f"cell load (after each write) {(time.perf_counter() - started) * 1000:.2f} ms for 4 semesters")
+        for label, (query, sql) in queries.items():
+            rollup_times, memo_times, raw_times = [], [], []
+            for _ in range(args.runs):
+                grade_cube._results.clear()
+                started = time.perf_counter()
+                expected = grade_cube.query(**query)
+                rollup_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                if grade_cube.query(**query) != expected:
+                    print("FAILED: a memoized result differs from its roll-up")
+                    sys.exit(1)
+                memo_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                for sem in (1, 2, 3, 4):
+                    conn = sqlite3.connect(path_for(sem))
+                    conn.execute(sql).fetchall()
+                    conn.close()
+                raw_times.append(time.perf_counter() - started)
+            print(f"{label:36s} roll-up {statistics.median(rollup_times) * 1e6:6.0f} us, "
+                  f"repeated {statistics.median(memo_times) * 1e6:5.1f} us, "
+                  f"raw rows {statistics.median(raw_times) * 1000:7.1f} ms")
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def bench_compression(args):
+    """Bytes on the wire and server time per encoding for the main pages and JSON series"""
+    data_dir = tempfile.mkdtemp(prefix="eduboard-bench-")
+    try:
+        for sem in (1, 2, 3, 4):
+            generate_semester_db(os.path.join(data_dir, f"eduboard_sem{sem}.db"), args.students, seed=sem)
+        eduboard = load_app(data_dir)
+        client = eduboard.app.test_client()
+        urls = ["/semester1_dashboard", "/college_toppers", "/api/semester/1/chart/top10", "/api/students/search?q=1GEN"]
+        encodings = ["identity", "gzip"] + (["br"] if eduboard.brotli is not None else [])
+        for url in urls:
+            client.get(url)
+            cells = []
+            for encoding in encodings:
+                times = []
+                for _ in range(args.runs):
+                    started = time.perf_counter()
+                    resp = client.get(url, headers={"Accept-Encoding": encoding})
+                    size = len(resp.get_data())
+                    times.append(time.perf_counter() - started)
+                sent = resp.headers.get("Content-Encoding", "identity")
+                cells.append(f"{sent} {size / 1024:8.1f} KiB {statistics.median(times) * 1000:7.1f} ms")
+            print(f"{url:30s} " + " | ".join(cells))
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "writers": bench_writers,
+    "login": bench_login,
+    "layout": bench_layout,
+    "grading": bench_grading,
+    "bulk": bench_bulk,
+    "readers": bench_readers,
+    "search": bench_search,
+    "coalesce": bench_coalesce,
+    "reports": bench_reports,
+    "stream": bench_stream,
+    "risk": bench_risk,
+    "cube": bench_cube,
+    "compression": bench_compression,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EduBoard benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=200)
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--logins", type=int, default=20000)
+    parser.add_argument("--sheets", type=int, default=24)
+    parser.add_argument("--rows", default="10000,100000", help="sheet sizes for readers, comma-separated")
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Bulk marks import: many sheets, or zip archives of them, in one go.
+
+Each sheet is mapped to a semester and subject from its path: the last
+sem3 / semester3 / s3 token (a zip folder counts) gives the semester, and
+the rest of the file name gives the subject, matched against the subjects
+the semester already has. Semester sheets (with a Subject column per row)
+need no subject; a subject sheet whose name is not a known subject fails
+with "Unknown subject" rather than trusting its own subject column.
+
+Sheets are parsed in parallel, since reading XLSX is CPU-bound, on one
+process pool of BULK_PARSE_WORKERS shared by every import in the process
+and started by the first one. Its workers come from a forkserver (spawn
+where there is none), never forked from the app's threads. With a single
+worker, or a single sheet, they are parsed in-process. The rows of every
+semester then go to that semester's single writer as one job (one
+transaction per semester DB). import_files returns one report covering
+every file. The module is Flask-free: the bulk upload route and
+ingest_daemon.py both drive it.
+"""
+import io
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+import zipfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import importer
+import upload_store
+
+SHEET_EXTENSIONS = {".csv", ".xls", ".xlsx"}
+# Sheets per bulk import at most, and the largest zip member read
+BULK_MAX_FILES = 500
+BULK_MAX_MEMBER_BYTES = 64 * 1024 * 1024
+# Sheet-parsing processes, shared by concurrent imports
+BULK_PARSE_WORKERS = min(4, os.cpu_count() or 1)
+SEMESTER_TOKEN = re.compile(r"(?:^|[^a-z0-9])(?:semester|sem|s)[ _-]?([1-4])(?![0-9])", re.IGNORECASE)
+
+# One sheet to import; subject is None for semester sheets or when the name gives none
+Entry = namedtuple("Entry", ["name", "data", "semester", "subject"])
+
+
+def expand(name: str, data: bytes):
+    """(name, bytes) of every sheet in an upload: the file itself, or the sheets inside a zip"""
+    if os.path.splitext(name)[1].lower() != ".zip":
+        return [(name, data)]
+    sheets = []
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            base = os.path.basename(info.filename)
+            if info.is_dir() or info.filename.startswith("__MACOSX/") or base.startswith("."):
+                continue
+            if os.path.splitext(base)[1].lower() not in SHEET_EXTENSIONS:
+                continue
+            if info.file_size > BULK_MAX_MEMBER_BYTES:
+                sheets.append((info.filename, None))
+                continue
+            sheets.append((info.filename, archive.read(info)))
+    return sheets
+
+
+def semester_subjects(db_path: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        return [row[0] for row in conn.execute("SELECT name FROM subject")]
+    finally:
+        conn.close()
+
+
+def _subject_key(subject: str) -> str:
+    return re.sub(r"[^0-9a-z]", "", subject.lower())
+
+
+def locate(name: str, default_semester: int = None, known_subjects=None):
+    """(semester, subject) for a sheet path; either may be None.
+
+    With known_subjects, the name must match one of them (ignoring case and
+    punctuation) to give a subject.
+    """
+    path = name.replace("\\", "/")
+    matches = list(SEMESTER_TOKEN.finditer(path))
+    semester = int(matches[-1].group(1)) if matches else default_semester
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stem = SEMESTER_TOKEN.sub(" ", stem)
+    subject = re.sub(r"[\s_.-]+", " ", stem).strip() or None
+    if subject is not None and known_subjects is not None:
+        canonical = {_subject_key(s): s for s in known_subjects}
+        subject = canonical.get(_subject_key(subject))
+    return semester, subject
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _parse_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # A child forked while a writer or request thread holds a lock would inherit it held
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(max_workers=BULK_PARSE_WORKERS,
+                                        mp_context=multiprocessing.get_context(method))
+        return _pool
+
+
+def _parse_all(jobs):
+    """parse_entry over jobs, on the shared pool when that helps"""
+    global _pool
+    if len(jobs) < 2 or BULK_PARSE_WORKERS < 2:
+        return [parse_entry(job) for job in jobs]
+    pool = _parse_pool()
+    try:
+        return list(pool.map(parse_entry, jobs))
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); the next import starts a fresh pool
+        with _pool_lock:
+            if _pool is pool:
+                _pool = None
+        return [parse_entry(job) for job in jobs]
+
+
+def parse_entry(entry: Entry):
+    """Process-pool worker: (subject used, ParsedSheet) for one sheet"""
+    try:
+        sheet = importer.read_sheet(io.BytesIO(entry.data), entry.name)
+    except Exception as e:
+        return entry.subject, importer.ParsedSheet([], 0, f"Error reading spreadsheet: {e}")
+    if importer.is_semester_sheet(sheet):
+        return None, importer.semester_sheet_rows(sheet)
+    if entry.subject is None:
+        return None, importer.ParsedSheet(
+            [], 0, f"Unknown subject: the file name does not name a subject of semester {entry.semester}")
+    return entry.subject, importer.subject_sheet_rows(sheet, entry.subject)
+
+
+def _already_imported(catalog, semester: int, subject, sha256: str) -> bool:
+    """As a semester sheet or for this subject; anywhere in the semester when the name gives no subject"""
+    if subject is None:
+        return catalog.find_in_semester(semester, sha256) is not None
+    return any(catalog.find(target, sha256) is not None for target in (f"sem{semester}", f"sem{semester}/{subject}"))
+
+
+def _file_report(name, semester=None, subject=None, status="failed", error=None):
+    return {"name": name, "semester": semester, "subject": subject, "status": status,
+            "inserted": 0, "existing": 0, "skipped": 0, "error": error}
+
+
+def import_files(files, write_queues, default_semester: int = None, known_subjects=None,
+                 catalog: upload_store.UploadCatalog = None):
+    """Import [(name, bytes)] (zips are expanded) through write_queues {semester: WriteQueue}.
+
+    known_subjects(semester) lists a semester's subjects for name matching.
+    Each sheet's report names the uploaded file it came from as "source".
+    With a catalog, sheets already imported to the same target are skipped
+    and imported ones are retained. Returns the consolidated report.
+    """
+    started = time.perf_counter()
+    reports, entries = [], []
+    for name, data in files:
+        first = len(reports)
+        try:
+            sheets = expand(name, data)
+        except zipfile.BadZipFile:
+            sheets = []
+            reports.append(_file_report(name, error="Not a valid zip archive"))
+        if not sheets and first == len(reports):
+            reports.append(_file_report(name, error="No sheets in the archive"))
+        for sheet_name, sheet_data in sheets:
+            if len(entries) >= BULK_MAX_FILES:
+                reports.append(_file_report(sheet_name, error=f"More than {BULK_MAX_FILES} sheets in one import"))
+                continue
+            if os.path.splitext(sheet_name)[1].lower() not in SHEET_EXTENSIONS:
+                reports.append(_file_report(sheet_name, error="Unsupported file type"))
+                continue
+            if sheet_data is None:
+                reports.append(_file_report(sheet_name, error="Sheet too large"))
+                continue
+            semester, subject = locate(sheet_name, default_semester)
+            if semester not in write_queues:
+                reports.append(_file_report(sheet_name, error="Cannot tell the semester from the file name"))
+                continue
+            if subject is not None and known_subjects is not None:
+                subject = locate(sheet_name, default_semester, known_subjects(semester))[1]
+            report = _file_report(sheet_name, semester, subject, status="pending")
+            report["sha256"] = upload_store.content_hash(io.BytesIO(sheet_data))
+            if catalog is not None and _already_imported(catalog, semester, subject, report["sha256"]):
+                report["status"] = "duplicate"
+            else:
+                entries.append((report, Entry(sheet_name, sheet_data, semester, subject)))
+            reports.append(report)
+        for report in reports[first:]:
+            report["source"] = name
+
+    parsed = _parse_all([entry for _, entry in entries])
+
+    # Write: one job per semester on its writer, all semesters in flight together
+    batches = {}
+    for (report, entry), (subject, sheet) in zip(entries, parsed):
+        report["subject"] = subject
+        report["skipped"] = sheet.skipped
+        if sheet.error:
+            report["error"] = sheet.error
+            report["status"] = "failed"
+            continue
+        batches.setdefault(entry.semester, []).append((report, entry, sheet.rows))
+    futures = {
+        semester: write_queues[semester].submit(
+            lambda conn, batch=batch: [importer.insert_marks_rows(conn, rows) for _, _, rows in batch])
+        for semester, batch in batches.items()
+    }
+    for semester, future in futures.items():
+        try:
+            inserted = future.result()
+        except Exception as e:
+            inserted = None
+            error = f"Error saving rows: {e}"
+        for i, (report, entry, rows) in enumerate(batches[semester]):
+            if inserted is None:
+                report["status"], report["error"] = "failed", error
+                continue
+            report["status"] = "imported"
+            report["inserted"] = inserted[i]
+            report["existing"] = len(rows) - inserted[i]
+            if catalog is not None:
+                target = f"sem{semester}/{report['subject']}" if report["subject"] else f"sem{semester}"
+                catalog.retain(target, report["sha256"], os.path.basename(entry.name), io.BytesIO(entry.data),
+                               report["inserted"], report["skipped"])
+
+    totals = {key: sum(r[key] for r in reports) for key in ("inserted", "existing", "skipped")}
+    for status in ("imported", "duplicate", "failed"):
+        totals[status] = sum(r["status"] == status for r in reports)
+    for report in reports:
+        report.pop("sha256", None)
+    return {"files": reports, "totals": totals, "semesters": sorted(batches),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
@@ -0,0 +1,249 @@
+"""Change-data feed over the semester databases.
+
+Triggers on the mark rows (migrations 3 and 9) append every insert/update/
+delete to the per-DB change_log table as (version, usn, subject, op).
+Consumers subscribe here, receive only the changes after their cursor, and
+acknowledge them. Entries every live consumer has acknowledged are deleted.
+
+Cursors live in change_consumers, shared by every process using the DB:
+
+- In-process consumers are stored per process (name@host:pid:id), so each
+  worker process advances only its own cursors. A process starts at the
+  current version, keeps its rows alive with heartbeat(), and its rows
+  expire PROCESS_CONSUMER_TTL_SECONDS after it stops.
+- External consumers (readers of /api/changes) must be registered first
+  (python changelog.py register <name>); acknowledging under an unknown name
+  is refused. Their cursor expires EXTERNAL_CONSUMER_TTL_SECONDS after
+  their last acknowledgement, so an abandoned consumer cannot pin the log.
+"""
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+Change = namedtuple("Change", ["semester", "version", "usn", "subject", "op"])
+
+# Changes handed to a consumer per callback
+FEED_BATCH_ROWS = 5000
+# Cursors not renewed for this long are dropped and stop holding back compaction
+PROCESS_CONSUMER_TTL_SECONDS = 15 * 60
+EXTERNAL_CONSUMER_TTL_SECONDS = 7 * 24 * 3600
+
+
+class UnknownConsumer(Exception):
+    """An acknowledgement under a name that is not a registered external consumer"""
+
+
+class ChangeFeed:
+    def __init__(self, db_path_for_sem, semesters=(1, 2, 3, 4)):
+        self._db_path = db_path_for_sem
+        self._semesters = tuple(semesters)
+        self._consumers = {}
+        self._lock = threading.RLock()
+        # Set at the first subscribe, i.e. in the worker process (after any fork)
+        self._instance = None
+
+    def _connect(self, sem: int):
+        return sqlite3.connect(self._db_path(sem))
+
+    def _local(self, name: str) -> str:
+        if self._instance is None:
+            self._instance = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        return f"{name}@{self._instance}"
+
+    def latest_version(self, sem: int) -> int:
+        conn = self._connect(sem)
+        try:
+            row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def changes_since(self, sem: int, cursor: int, limit: int = FEED_BATCH_ROWS):
+        conn = self._connect(sem)
+        try:
+            rows = conn.execute(
+                "SELECT version, usn, subject, op FROM change_log WHERE version > ? ORDER BY version LIMIT ?",
+                (cursor, limit),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [Change(sem, *row) for row in rows]
+
+    def _cursor(self, row_name: str, sem: int):
+        conn = self._connect(sem)
+        try:
+            row = conn.execute("SELECT acked_version FROM change_consumers WHERE name = ?", (row_name,)).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def _ack(self, row_name: str, sem: int, version: int):
+        conn = self._connect(sem)
+        try:
+            conn.execute(
+                "INSERT INTO change_consumers (name, acked_version, seen_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET acked_version = MAX(acked_version, excluded.acked_version), "
+                "seen_at = excluded.seen_at",
+                (row_name, version, time.time()),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def cursor(self, name: str, sem: int) -> int:
+        """This process's cursor for an in-process consumer"""
+        return self._cursor(self._local(name), sem) or 0
+
+    def subscribe(self, name: str, callback):
+        """Register callback(changes) for every semester, starting at the current version.
+
+        The consumer is expected to build its initial state from a full read.
+        """
+        with self._lock:
+            self._consumers[name] = callback
+            for sem in self._semesters:
+                self._ack(self._local(name), sem, self.latest_version(sem))
+
+    def unsubscribe(self, name: str):
+        with self._lock:
+            self._consumers.pop(name, None)
+            self._delete(self._local(name))
+
+    def heartbeat(self):
+        """Renew this process's cursors so they do not expire while it is idle"""
+        with self._lock:
+            names = [self._local(name) for name in self._consumers]
+        if not names:
+            return
+        for sem in self._semesters:
+            conn = self._connect(sem)
+            try:
+                conn.execute(f"UPDATE change_consumers SET seen_at = ? WHERE name IN ({', '.join('?' * len(names))})",
+                             (time.time(), *names))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def notify(self, sem: int):
+        """Deliver pending changes for one semester to every consumer, then compact"""
+        with self._lock:
+            for name, callback in list(self._consumers.items()):
+                row_name = self._local(name)
+                cursor = self._cursor(row_name, sem)
+                if cursor is None:
+                    # Expired while this process was stalled: the changes it missed may be gone
+                    cursor = self.latest_version(sem)
+                    self._ack(row_name, sem, cursor)
+                while True:
+                    changes = self.changes_since(sem, cursor)
+                    if not changes:
+                        break
+                    try:
+                        callback(changes)
+                    except Exception:
+                        # Cursor is not advanced; the same changes are redelivered next time
+                        break
+                    cursor = changes[-1].version
+                    self._ack(row_name, sem, cursor)
+            self.compact(sem)
+
+    def notify_all(self):
+        for sem in self._semesters:
+            self.notify(sem)
+
+    # ---- external consumers ----
+    def register(self, name: str):
+        """Register an external consumer at the current version of every semester"""
+        if "@" in name:
+            raise ValueError("consumer names cannot contain '@'")
+        for sem in self._semesters:
+            conn = self._connect(sem)
+            try:
+                conn.execute("INSERT OR IGNORE INTO change_consumers (name, acked_version, seen_at, external) "
+                             "VALUES (?, ?, ?, 1)", (name, self.latest_version(sem), time.time()))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _delete(self, row_name: str):
+        for sem in self._semesters:
+            conn = self._connect(sem)
+            try:
+                conn.execute("DELETE FROM change_consumers WHERE name = ?", (row_name,))
+                conn.commit()
+            finally:
+                conn.close()
+
+    def unregister(self, name: str):
+        self._delete(name)
+
+    def consumers(self, sem: int):
+        """[(name, acked_version, seen_at, external)] of every cursor in the semester DB"""
+        conn = self._connect(sem)
+        try:
+            return conn.execute("SELECT name, acked_version, seen_at, external FROM change_consumers "
+                                "ORDER BY external DESC, name").fetchall()
+        finally:
+            conn.close()
+
+    def ack(self, name: str, sem: int, version: int):
+        """Acknowledge up to version for a registered external consumer; raises UnknownConsumer otherwise"""
+        conn = self._connect(sem)
+        try:
+            updated = conn.execute(
+                "UPDATE change_consumers SET acked_version = MAX(acked_version, MIN(?, ?)), seen_at = ? "
+                "WHERE name = ? AND external = 1",
+                (version, self.latest_version(sem), time.time(), name),
+            ).rowcount
+            conn.commit()
+        finally:
+            conn.close()
+        if not updated:
+            raise UnknownConsumer(name)
+
+    def compact(self, sem: int):
+        """Drop expired cursors, then log entries acknowledged by every remaining consumer"""
+        now = time.time()
+        conn = self._connect(sem)
+        try:
+            conn.execute("DELETE FROM change_consumers WHERE seen_at < ? AND external = 0",
+                         (now - PROCESS_CONSUMER_TTL_SECONDS,))
+            conn.execute("DELETE FROM change_consumers WHERE seen_at < ? AND external = 1",
+                         (now - EXTERNAL_CONSUMER_TTL_SECONDS,))
+            floor = conn.execute("SELECT MIN(acked_version) FROM change_consumers").fetchone()[0]
+            if floor is None:
+                conn.execute("DELETE FROM change_log")
+            else:
+                conn.execute("DELETE FROM change_log WHERE version <= ?", (floor,))
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def main(argv):
+    """python changelog.py register|unregister <name> / python changelog.py list"""
+    import migrations
+    data_dir = os.environ.get("EDUBOARD_DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+    paths = {sem: os.path.join(data_dir, f"eduboard_sem{sem}.db") for sem in (1, 2, 3, 4)}
+    migrations.migrate_all(paths.values())
+    feed = ChangeFeed(paths.get)
+    if argv[:1] == ["list"]:
+        for sem in paths:
+            for name, acked, seen_at, external in feed.consumers(sem):
+                seen = time.strftime("%Y-%m-%d %H:%M", time.localtime(seen_at)) if seen_at else "-"
+                print(f"sem{sem}  {'external' if external else 'process':8s}  {name}  at {acked}, seen {seen}")
+    elif len(argv) == 2 and argv[0] in ("register", "unregister"):
+        getattr(feed, argv[0])(argv[1])
+        print(f"{argv[0]}ed {argv[1]}")
+    else:
+        print(main.__doc__)
+        return 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,113 @@
+"""Mark-component analytics for one subject of one semester.
+
+Answers "does internal assessment predict the final exam": Pearson
+correlations between the CIE, assignment and SEE components, least-squares
+fits of SEE on CIE and on CIE + assignment, and per-component distributions.
+Columns are read into float32 NumPy arrays. Results are cached per
+(semester, subject); apply_changes drops the entries of the subjects named
+in a batch of changes.
+"""
+import sqlite3
+import threading
+
+# Component name -> students column; correlations and regressions use these
+COMPONENTS = {"cie": "cie_total50", "assignment": "ass_total50", "see": "see"}
+# Raw columns and their maximum marks, for the distributions
+DISTRIBUTION_MAX = {"cie1": 50, "cie2": 50, "assignment1marks": 50, "assignment2marks": 50, "see": 100}
+DISTRIBUTION_BINS = 10
+# Fewer complete rows than this give no correlation/regression
+MIN_SAMPLES = 3
+
+
+def load_columns(db_path: str, subject: str):
+    """{column: float32 array} for the subject's rows; NULL marks become NaN"""
+    import numpy as np
+    columns = list(dict.fromkeys(list(COMPONENTS.values()) + list(DISTRIBUTION_MAX)))
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT {', '.join(columns)} FROM students WHERE subject = ?", (subject,)).fetchall()
+    finally:
+        conn.close()
+    matrix = np.array(rows, dtype=np.float32).reshape(len(rows), len(columns))
+    return {name: matrix[:, i] for i, name in enumerate(columns)}
+
+
+def _fit(y, *xs):
+    """Least squares y ~ b0 + b1*x1 + ...; returns coefficients, r2 and residual std"""
+    import numpy as np
+    design = np.column_stack([np.ones_like(y)] + list(xs))
+    coef, *_ = np.linalg.lstsq(design, y, rcond=None)
+    residuals = y - design @ coef
+    total = float(((y - y.mean()) ** 2).sum())
+    r2 = 1.0 - float((residuals ** 2).sum()) / total if total > 0 else 0.0
+    return [round(float(c), 4) for c in coef], round(r2, 4), round(float(residuals.std()), 3)
+
+
+def analyze(columns):
+    import numpy as np
+    names = list(COMPONENTS)
+    data = np.column_stack([columns[COMPONENTS[n]] for n in names])
+    complete = data[~np.isnan(data).any(axis=1)]
+    result = {"rows": int(len(data)), "complete_rows": int(len(complete)), "components": names,
+              "correlation": None, "see_on_cie": None, "see_on_internal": None}
+
+    if len(complete) >= MIN_SAMPLES:
+        # A constant component has no defined correlation (NaN -> None)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = np.corrcoef(complete, rowvar=False)
+        result["correlation"] = [[None if np.isnan(v) else round(float(v), 4) for v in row] for row in corr]
+        cie, assignment, see = complete[:, 0], complete[:, 1], complete[:, 2]
+        (intercept, slope), r2, resid = _fit(see, cie)
+        result["see_on_cie"] = {"intercept": intercept, "slope": slope, "r2": r2, "residual_std": resid}
+        (intercept, b_cie, b_ass), r2, resid = _fit(see, cie, assignment)
+        result["see_on_internal"] = {"intercept": intercept, "cie": b_cie, "assignment": b_ass, "r2": r2,
+                                     "residual_std": resid}
+
+    distributions = {}
+    for column, max_marks in DISTRIBUTION_MAX.items():
+        values = columns[column][~np.isnan(columns[column])]
+        if not len(values):
+            distributions[column] = None
+            continue
+        counts, edges = np.histogram(values, bins=DISTRIBUTION_BINS, range=(0, max_marks))
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+        distributions[column] = {
+            "max_marks": max_marks, "mean": round(float(values.mean()), 2), "std": round(float(values.std()), 2),
+            "min": float(values.min()), "q1": round(float(q1), 2), "median": round(float(median), 2),
+            "q3": round(float(q3), 2), "max": float(values.max()),
+            "bins": [round(float(e), 1) for e in edges], "counts": counts.tolist(),
+        }
+    result["distributions"] = distributions
+    return result
+
+
+class ComponentAnalytics:
+    def __init__(self, db_path_for_sem):
+        self._db_path = db_path_for_sem
+        self._cache = {}
+        self._lock = threading.Lock()
+        # Bumped on every invalidation so a computation that raced a write is not cached
+        self._generation = 0
+
+    def get(self, sem: int, subject: str):
+        key = (sem, subject)
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+            generation = self._generation
+        result = analyze(load_columns(self._db_path(sem), subject))
+        with self._lock:
+            if generation == self._generation:
+                self._cache[key] = result
+        return result
+
+    def apply_changes(self, changes):
+        """ChangeFeed callback"""
+        with self._lock:
+            self._generation += 1
+            for change in changes:
+                if change.subject is None:
+                    for key in [k for k in self._cache if k[0] == change.semester]:
+                        del self._cache[key]
+                else:
+                    self._cache.pop((change.semester, change.subject), None)
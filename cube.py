@@ -0,0 +1,246 @@
+"""Pre-aggregated semester x subject x grade x overall-grade-band cube.
+
+Each semester DB keeps grade_cube (migration 8): one cell per (subject,
+grade, band) with the number of mark rows and the sums of their final,
+CIE, assignment and SEE marks. band is the student's overall band for the
+semester (grading.py), recorded per student in cube_bands.
+
+Triggers on the mark rows (students, or marks after migration 9, where
+totals and grade are computed from the raw marks) add and subtract single
+rows under the student's current band, so cells stay exact on every write.
+A student's band depends on all of their subjects, so band moves happen
+afterwards: GradeCube follows the change feed and, in a job on the
+semester's WriteQueue, moves the rows of students whose band changed.
+Students not banded yet sit under band ''.
+
+Queries run against an in-process copy of the cells (a few hundred rows per
+semester), reloaded after the semester changes. Results are memoized until
+the next reload, so a repeated slice is a dict lookup; a first slice rolls
+up the copied cells (see `python benchmark.py cube`).
+"""
+import sqlite3
+import threading
+from operator import itemgetter
+
+import grading
+
+DIMENSIONS = ("semester", "subject", "grade", "band")
+# Measure -> students column summed into it
+SUMMED = {"total_sum": "final_total100", "cie_sum": "cie_total50", "ass_sum": "ass_total50", "see_sum": "see_total50"}
+MEASURES = ("count",) + tuple(SUMMED)
+_TWO_PLACES = (2,) * len(SUMMED)
+
+# Bands come from the grading policy's overall-band cutoffs
+STUDENT_BANDS_SQL = (f"SELECT UPPER(usn), {grading.POLICY.bands.sql('AVG(COALESCE(final_total100, 0))')} "
+                     "FROM students WHERE usn IS NOT NULL {scope} GROUP BY UPPER(usn)")
+
+CUBE_COLUMNS = "subject, grade, band, " + ", ".join(MEASURES)
+CELL_UPSERT = "ON CONFLICT(subject, grade, band) DO UPDATE SET " + ", ".join(
+    f"{m} = {m} + excluded.{m}" for m in MEASURES)
+
+
+# Column expressions on the table the triggers sit on; {row} is NEW or OLD
+STUDENTS_ROW = {"usn": "{row}.usn", "subject": "{row}.subject",
+                **{col: f"{{row}}.{col}" for col in ["grade", *SUMMED.values()]},
+                "watched": ", ".join(["usn", "subject", "grade", *SUMMED.values()])}
+
+
+def marks_row(policy=None):
+    """Expressions for marks (migration 9 on), whose totals and grade the policy derives from raw marks"""
+    derived = (policy or grading.POLICY).derived_sql("{row}")
+    return {"usn": "(SELECT usn FROM student WHERE id = {row}.student_id)",
+            "subject": "(SELECT name FROM subject WHERE id = {row}.subject_id)",
+            **{col: derived[col] for col in ["grade", *SUMMED.values()]},
+            "watched": ", ".join(["student_id", "subject_id", *grading.RAW_COLUMNS[3:]])}
+
+
+def _cell_key(columns, row: str) -> str:
+    """(subject, grade, band) of the row"""
+    usn, subject, grade = (columns[col].format(row=row) for col in ("usn", "subject", "grade"))
+    return (f"COALESCE({subject}, ''), COALESCE({grade}, ''), "
+            f"COALESCE((SELECT band FROM cube_bands WHERE usn = UPPER({usn})), '')")
+
+
+def _add_row_sql(columns, row: str) -> str:
+    sums = ", ".join(f"COALESCE({columns[col].format(row=row)}, 0)" for col in SUMMED.values())
+    return f"INSERT INTO grade_cube ({CUBE_COLUMNS}) VALUES ({_cell_key(columns, row)}, 1, {sums}) {CELL_UPSERT};"
+
+
+def _subtract_row_sql(columns, row: str) -> str:
+    sums = ", ".join(f"{m} = {m} - COALESCE({columns[col].format(row=row)}, 0)" for m, col in SUMMED.items())
+    return (f"UPDATE grade_cube SET count = count - 1, {sums} WHERE (subject, grade, band) = ({_cell_key(columns, row)}); "
+            "DELETE FROM grade_cube WHERE count <= 0;")
+
+
+def create_triggers(conn, table: str = "students", columns=STUDENTS_ROW):
+    """cube_insert/cube_delete/cube_update on the table holding the mark rows"""
+    for name in ("cube_insert", "cube_delete", "cube_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute(f"CREATE TRIGGER cube_insert AFTER INSERT ON {table} BEGIN {_add_row_sql(columns, 'NEW')} END")
+    conn.execute(f"CREATE TRIGGER cube_delete AFTER DELETE ON {table} BEGIN {_subtract_row_sql(columns, 'OLD')} END")
+    conn.execute(f"CREATE TRIGGER cube_update AFTER UPDATE OF {columns['watched']} ON {table} BEGIN "
+                 f"{_subtract_row_sql(columns, 'OLD')} {_add_row_sql(columns, 'NEW')} END")
+
+
+def create_schema(conn):
+    """Tables, triggers and the initial build (migration 8)"""
+    measures = ", ".join(f"{m} {'INTEGER' if m == 'count' else 'REAL'} NOT NULL" for m in MEASURES)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS grade_cube(
+            subject TEXT NOT NULL, grade TEXT NOT NULL, band TEXT NOT NULL, {measures},
+            PRIMARY KEY (subject, grade, band)
+        )
+    """)
+    conn.execute("CREATE TABLE IF NOT EXISTS cube_bands(usn TEXT PRIMARY KEY, band TEXT NOT NULL)")
+    create_triggers(conn)
+    rebuild(conn)
+
+
+def rebuild(conn):
+    """Recompute every band and cell from students"""
+    conn.execute("DELETE FROM cube_bands")
+    conn.execute(f"INSERT INTO cube_bands (usn, band) {STUDENT_BANDS_SQL.format(scope='')}")
+    conn.execute("DELETE FROM grade_cube")
+    sums = ", ".join(f"SUM(COALESCE(s.{col}, 0))" for col in SUMMED.values())
+    conn.execute(f"""
+        INSERT INTO grade_cube ({CUBE_COLUMNS})
+        SELECT COALESCE(s.subject, ''), COALESCE(s.grade, ''), COALESCE(b.band, ''), COUNT(*), {sums}
+        FROM students AS s LEFT JOIN cube_bands AS b ON b.usn = UPPER(s.usn)
+        GROUP BY 1, 2, 3
+    """)
+
+
+def move_bands(conn, usns):
+    """Writer job body: re-band the given students and move their rows between cells"""
+    sums = ", ".join(f"SUM(COALESCE({col}, 0))" for col in SUMMED.values())
+    moved = 0
+    for usn in usns:
+        row = conn.execute(STUDENT_BANDS_SQL.format(scope="AND UPPER(usn) = ?"), (usn,)).fetchone()
+        new_band = row[1] if row else None
+        old = conn.execute("SELECT band FROM cube_bands WHERE usn = ?", (usn,)).fetchone()
+        old_band = old[0] if old else ""
+        if new_band == old_band:
+            continue
+        if new_band is None:
+            # No rows left: the delete triggers already took them out of the cube
+            conn.execute("DELETE FROM cube_bands WHERE usn = ?", (usn,))
+            continue
+        cells = conn.execute(
+            f"SELECT COALESCE(subject, ''), COALESCE(grade, ''), COUNT(*), {sums} FROM students "
+            "WHERE UPPER(usn) = ? GROUP BY 1, 2", (usn,)).fetchall()
+        minus = ", ".join(f"{m} = {m} - ?" for m in MEASURES)
+        conn.executemany(f"UPDATE grade_cube SET {minus} WHERE subject = ? AND grade = ? AND band = ?",
+                         [(*cell[2:], cell[0], cell[1], old_band) for cell in cells])
+        conn.execute("DELETE FROM grade_cube WHERE count <= 0")
+        conn.executemany(f"INSERT INTO grade_cube ({CUBE_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?) {CELL_UPSERT}",
+                         [(cell[0], cell[1], new_band, *cell[2:]) for cell in cells])
+        conn.execute("INSERT OR REPLACE INTO cube_bands (usn, band) VALUES (?, ?)", (usn, new_band))
+        moved += 1
+    return moved
+
+
+class GradeCube:
+    def __init__(self, write_queues, db_path_for_sem, semesters=(1, 2, 3, 4)):
+        self._queues = write_queues
+        self._db_path = db_path_for_sem
+        self._semesters = tuple(semesters)
+        self._cells = {}
+        self._results = {}
+        # Bumped on every invalidation so a result computed across one is not memoized
+        self._generation = 0
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _load(self, sem: int):
+        conn = sqlite3.connect(self._db_path(sem))
+        try:
+            # (semester, subject, grade, band, *measures): positions follow DIMENSIONS
+            return [(sem, *row) for row in conn.execute(f"SELECT {CUBE_COLUMNS} FROM grade_cube")]
+        finally:
+            conn.close()
+
+    def cells(self, sem: int):
+        cells = self._cells.get(sem)
+        if cells is None:
+            cells = self._load(sem)
+            with self._lock:
+                self._cells.setdefault(sem, cells)
+        return cells
+
+    def invalidate(self, sem: int):
+        with self._lock:
+            self._cells.pop(sem, None)
+            self._results.clear()
+            self._generation += 1
+
+    def query(self, by=(), **filters):
+        """Roll up to the dimensions in `by` (none = grand total) over the cells matching filters.
+
+        Filters map a dimension to a value or a collection of values, e.g.
+        query(by=("semester",), subject="DBMS", grade="B") counts B grades in
+        DBMS per semester; adding "band" to by drills down one level.
+        """
+        for dim in list(by) + list(filters):
+            if dim not in DIMENSIONS:
+                raise ValueError(f"unknown dimension: {dim}")
+        wanted = {dim: frozenset(v) if isinstance(v, (list, tuple, set, frozenset)) else frozenset((v,))
+                  for dim, v in filters.items()}
+        memo_key = (tuple(by), frozenset(wanted.items()))
+        rows = self._results.get(memo_key)
+        if rows is None:
+            generation = self._generation
+            rows = self._roll_up(tuple(by), wanted)
+            with self._lock:
+                if generation == self._generation:
+                    self._results[memo_key] = rows
+        return [dict(row) for row in rows]
+
+    def _roll_up(self, by, wanted):
+        sems = [s for s in self._semesters if "semester" not in wanted or s in wanted["semester"]]
+        checks = [(DIMENSIONS.index(dim), values) for dim, values in wanted.items() if dim != "semester"]
+        positions = [DIMENSIONS.index(dim) for dim in by]
+        key_of = itemgetter(*positions) if len(positions) > 1 else (
+            (lambda cell: (cell[positions[0]],)) if positions else (lambda cell: ()))
+        width = len(DIMENSIONS)
+        groups = {}
+        for sem in sems:
+            for cell in self.cells(sem):
+                if checks and not all(cell[i] in values for i, values in checks):
+                    continue
+                key = key_of(cell)
+                totals = groups.get(key)
+                if totals is None:
+                    groups[key] = list(cell[width:])
+                else:
+                    for i, value in enumerate(cell[width:]):
+                        totals[i] += value
+        rows = []
+        for key in sorted(groups, key=lambda k: tuple(map(str, k))):
+            count, *sums = groups[key]
+            row = dict(zip(by, key))
+            row["count"] = count
+            row.update(zip(SUMMED, map(round, sums, _TWO_PLACES)))
+            row["avg_total"] = round(sums[0] / count, 2) if count else None
+            rows.append(row)
+        return rows
+
+    def apply_changes(self, changes):
+        """ChangeFeed callback: cells already changed (triggers); queue band moves for the students"""
+        by_sem = {}
+        for change in changes:
+            if change.usn is not None:
+                by_sem.setdefault(change.semester, set()).add(change.usn.upper())
+        for sem, usns in by_sem.items():
+            self.invalidate(sem)
+            with self._lock:
+                scheduled = sem in self._pending
+                self._pending.setdefault(sem, set()).update(usns)
+            if not scheduled:
+                future = self._queues[sem].submit(lambda conn, sem=sem: self._move(conn, sem))
+                # The mirror is reloaded once the moves are committed
+                future.add_done_callback(lambda _, sem=sem: self.invalidate(sem))
+
+    def _move(self, conn, sem: int):
+        with self._lock:
+            usns = self._pending.pop(sem, set())
+        return move_bands(conn, sorted(usns))
@@ -0,0 +1,201 @@
+"""Grading policy: how raw marks become derived totals, subject grades and overall bands.
+
+One policy is shared by every write path (the add_marks forms, sheet and
+subject uploads) and every read path (dashboards, student history, cube
+bands). Rows are derived one at a time in plain Python (bisect over the
+cutoffs): the rows go back to SQLite as tuples, and building numpy columns
+and converting them back costs as much as the arithmetic saves, so a
+column-wise pass is no faster even at 100,000 rows. Set-based work in the
+DB (the students view, the cube triggers) uses the same formulas and cutoffs
+as SQL, and a dashboard's pandas column of percentages is banded with
+numpy.searchsorted.
+
+The active policy is DEFAULT_POLICY, or the JSON file named by
+EDUBOARD_GRADING_POLICY (same keys as DEFAULT_POLICY). Stored rows keep
+only raw marks; the students view derives the rest. After changing the
+policy, re-grade to switch the view over instead of re-uploading:
+
+    python grading.py regrade             # eduboard_sem1..4.db
+    python grading.py regrade some.db     # specific files
+
+The running app does the same through POST /admin/regrade.
+"""
+import bisect
+import json
+import os
+import sys
+
+# Raw mark columns of an upload row, in insert order
+RAW_COLUMNS = ["usn", "name", "subject", "cie1", "cie2", "assignment1marks", "assignment2marks", "see"]
+# Columns of a stored mark row (migrations.MARK_COLUMNS)
+ROW_COLUMNS = ["usn", "name", "subject", "cie1", "cie2", "cie_total50", "assignment1marks", "assignment2marks",
+               "ass_total50", "see", "see_total50", "final_total100", "grade"]
+DERIVED_COLUMNS = ["cie_total50", "ass_total50", "see_total50", "final_total100", "grade"]
+
+DEFAULT_POLICY = {
+    # Derived column -> (marks summed, their maximum, weight out of 100); final_total100 is the sum
+    "components": {
+        "cie_total50": [["cie1", "cie2"], 100, 25],
+        "ass_total50": [["assignment1marks", "assignment2marks"], 100, 25],
+        "see_total50": [["see"], 100, 50],
+    },
+    # Subject grade from final_total100, best first; the last entry is the floor
+    "grades": [[90, "O"], [75, "A"], [55, "B"], [35, "C"], [0, "F"]],
+    # Overall band from a student's semester percentage
+    "bands": [[90, "S"], [80, "A"], [70, "B"], [60, "C"], [50, "D"], [40, "E"], [0, "F"]],
+}
+
+
+def _number(value) -> float:
+    """compute_grade semantics: anything non-numeric counts as 0"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return 0.0 if value != value else value
+
+
+class Scale:
+    """Letters over ascending cutoffs; value >= cutoff earns that cutoff's letter"""
+
+    def __init__(self, steps):
+        steps = sorted(((float(cutoff), letter) for cutoff, letter in steps), reverse=True)
+        self.floor = steps[-1][1]
+        self.cutoffs = [cutoff for cutoff, _ in reversed(steps[:-1])]
+        self.letters = [self.floor] + [letter for _, letter in reversed(steps[:-1])]
+
+    def letter(self, value) -> str:
+        return self.letters[bisect.bisect_right(self.cutoffs, _number(value))]
+
+    def letters_for(self, values):
+        """Vectorized letter(): one searchsorted over the whole column"""
+        import numpy as np
+        values = np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)
+        return np.asarray(self.letters, dtype=object)[np.searchsorted(self.cutoffs, values, side="right")]
+
+    def sql(self, expr: str) -> str:
+        whens = " ".join(f"WHEN {expr} >= {cutoff!r} THEN '{letter}'"
+                         for cutoff, letter in reversed(list(zip(self.cutoffs, self.letters[1:]))))
+        return f"CASE {whens} ELSE '{self.floor}' END"
+
+
+class GradingPolicy:
+    def __init__(self, config=DEFAULT_POLICY):
+        if set(config["components"]) != set(DERIVED_COLUMNS[:3]):
+            raise ValueError(f"components must define exactly {', '.join(DERIVED_COLUMNS[:3])}")
+        self.components = {column: (list(marks), float(out_of), float(weight))
+                           for column, (marks, out_of, weight) in config["components"].items()}
+        # derive() order: positions in a RAW_COLUMNS tuple per component of DERIVED_COLUMNS
+        self._positions = [([RAW_COLUMNS.index(name) for name in self.components[column][0]],
+                            *self.components[column][1:]) for column in DERIVED_COLUMNS[:3]]
+        self.grades = Scale(config["grades"])
+        self.bands = Scale(config["bands"])
+        # Lowest passing final_total100
+        self.pass_mark = self.grades.cutoffs[0] if self.grades.cutoffs else 0.0
+
+    @classmethod
+    def from_file(cls, path: str):
+        with open(path) as f:
+            return cls({**DEFAULT_POLICY, **json.load(f)})
+
+    def grade(self, final_total) -> str:
+        return self.grades.letter(final_total)
+
+    def band(self, percentage) -> str:
+        return self.bands.letter(percentage)
+
+    def derive(self, row):
+        """(cie_total50, ass_total50, see_total50, final_total100, grade) for one RAW_COLUMNS tuple.
+
+        None/NaN marks count as 0.
+        """
+        derived = []
+        final = 0.0
+        for positions, out_of, weight in self._positions:
+            total = 0.0
+            for i in positions:
+                total += _number(row[i])
+            total = (total / out_of) * weight
+            derived.append(total)
+            final += total
+        return (*derived, final, self.grade(final))
+
+    def mark_rows(self, rows):
+        """Full ROW_COLUMNS tuples, ready for insert_marks_rows, from RAW_COLUMNS tuples"""
+        mark_rows = []
+        for row in rows:
+            usn, name, subject, cie1, cie2, a1, a2, see = row
+            cie, ass, see50, total, grade = self.derive(row)
+            mark_rows.append((usn, name, subject, cie1, cie2, cie, a1, a2, ass, see, see50, total, grade))
+        return mark_rows
+
+    def derived_sql(self, row: str = None):
+        """Derived column -> SQL expression over the raw mark columns of the same row (qualified by `row`)"""
+        exprs = {}
+        for column in DERIVED_COLUMNS[:3]:
+            names, out_of, weight = self.components[column]
+            total = " + ".join(f"COALESCE({row + '.' if row else ''}{name}, 0)" for name in names)
+            exprs[column] = f"(({total}) / {out_of!r}) * {weight!r}"
+        exprs["final_total100"] = " + ".join(f"({expr})" for expr in exprs.values())
+        exprs["grade"] = self.grades.sql(f"({exprs['final_total100']})")
+        return exprs
+
+
+def load_policy():
+    path = os.environ.get("EDUBOARD_GRADING_POLICY")
+    return GradingPolicy.from_file(path) if path else GradingPolicy()
+
+
+POLICY = load_policy()
+
+
+def regrade(conn, policy: GradingPolicy = None) -> int:
+    """Switch the students view to the policy's totals and grades; returns the rows whose values change.
+
+    Runs inside the caller's transaction (a WriteQueue job in the app). Totals
+    and grades are not stored, so nothing is rewritten: the view and the cube
+    triggers are recreated with the new expressions, and the rows that change
+    are logged to change_log like any other update, so consumers catch up. An
+    unchanged policy leaves the change log alone. Bands are recomputed by
+    rebuilding the cube.
+    """
+    import cube
+    import migrations
+    policy = policy or POLICY
+    exprs = policy.derived_sql()
+    changed = " OR ".join(f"{column} IS NOT {expr}" for column, expr in exprs.items())
+    updated = conn.execute(
+        f"INSERT INTO change_log (usn, subject, op) SELECT usn, subject, 'U' FROM students WHERE {changed}").rowcount
+    migrations.create_students_view(conn, migrations.table_columns(conn, "students"), policy)
+    cube.create_triggers(conn, "marks", cube.marks_row(policy))
+    cube.rebuild(conn)
+    return updated
+
+
+def _main(argv):
+    import sqlite3
+    import migrations
+    if not argv or argv[0] != "regrade":
+        print(__doc__)
+        return 2
+    data_dir = os.environ.get("EDUBOARD_DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+    paths = argv[1:] or [os.path.join(data_dir, f"eduboard_sem{sem}.db") for sem in range(1, 5)]
+    for path in paths:
+        migrations.migrate(path)
+        conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                updated = regrade(conn)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        print(f"{path}: {updated} rows re-graded")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
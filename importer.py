@@ -0,0 +1,117 @@
+"""Marks spreadsheet import, shared by the upload routes, bulk uploads and the ingest daemon.
+
+Two layouts are accepted:
+
+  semester sheets  USN, Name, Subject, CIE1, CIE2, Assignment1marks,
+                   Assignment2marks, SEE - each row names its subject
+  subject sheets   usn, name, subject, cie1, ... - every row goes to the
+                   subject the sheet was uploaded for
+
+Only those columns are read, by the fastest installed sheet_reader
+engine. Parsing is Flask-free and returns a ParsedSheet of full mark rows
+(derived totals and grades from the grading policy). Rows go in with
+insert_marks_rows, as a job on the semester's WriteQueue.
+"""
+from collections import namedtuple
+
+import grading
+import sheet_reader
+
+SEMESTER_COLUMNS = ["USN", "Name", "Subject", "CIE1", "CIE2", "Assignment1marks", "Assignment2marks", "SEE"]
+SUBJECT_COLUMNS = [column.lower() for column in SEMESTER_COLUMNS]
+
+MARKS_INSERT_SQL = """
+    INSERT INTO students (
+        usn, name, subject,
+        cie1, cie2, cie_total50,
+        assignment1marks, assignment2marks, ass_total50,
+        see, see_total50, final_total100, grade
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# error is None when the sheet was read; rows are MARKS_INSERT_SQL tuples, skipped counts invalid rows
+ParsedSheet = namedtuple("ParsedSheet", ["rows", "skipped", "error"])
+
+
+def insert_marks_rows(conn, rows):
+    """Writer job: insert rows (in MARKS_INSERT_SQL order) whose USN+subject is new; returns the inserted count"""
+    inserted = 0
+    for row in rows:
+        if conn.execute("SELECT id FROM students WHERE usn=? AND subject=?", (row[0], row[2])).fetchone():
+            continue
+        conn.execute(MARKS_INSERT_SQL, row)
+        inserted += 1
+    return inserted
+
+
+# Columns read from a sheet, either layout, and their dtypes; anything else in the sheet is never parsed
+SHEET_DTYPES = {column: str if column.lower() in ("usn", "name", "subject") else float
+                for column in SEMESTER_COLUMNS + SUBJECT_COLUMNS}
+
+
+def read_sheet(stream, filename: str) -> sheet_reader.Sheet:
+    return sheet_reader.read_sheet(stream, filename, SHEET_DTYPES)
+
+
+def is_semester_sheet(sheet) -> bool:
+    return not set(SEMESTER_COLUMNS) - sheet.columns.keys()
+
+
+def _mark(value):
+    return float(value) if value is not None else None
+
+
+def semester_sheet_rows(sheet) -> ParsedSheet:
+    missing = set(SEMESTER_COLUMNS) - sheet.columns.keys()
+    if missing:
+        return ParsedSheet([], 0, f"Missing required columns in Excel: {', '.join(missing)}")
+
+    rows = []
+    skip_count = 0
+    for usn, name, subject, cie1, cie2, a1, a2, see in zip(*(sheet.columns[c] for c in SEMESTER_COLUMNS)):
+        try:
+            cie1, cie2, a1, a2, see = float(cie1 or 0), float(cie2 or 0), float(a1 or 0), float(a2 or 0), float(see or 0)
+        except Exception:
+            skip_count += 1
+            continue
+
+        if not (0 <= cie1 <= 50 and 0 <= cie2 <= 50 and 0 <= a1 <= 50 and 0 <= a2 <= 50 and 0 <= see <= 100):
+            skip_count += 1
+            continue
+
+        rows.append((usn or '', name or '', subject or '', cie1, cie2, a1, a2, see))
+    return ParsedSheet(grading.POLICY.mark_rows(rows), skip_count, None)
+
+
+def subject_sheet_rows(sheet, subject: str) -> ParsedSheet:
+    missing_cols = [col for col in SUBJECT_COLUMNS if col not in sheet.columns]
+    if missing_cols:
+        return ParsedSheet([], 0, f'Missing columns: {missing_cols}')
+
+    rows = []
+    skip_count = 0
+    for usn, name, _, cie1, cie2, a1, a2, see in zip(*(sheet.columns[c] for c in SUBJECT_COLUMNS)):
+        try:
+            # The subject column is overridden by the subject the sheet is for
+            rows.append((usn or '', name or '', subject,
+                         _mark(cie1), _mark(cie2), _mark(a1), _mark(a2), _mark(see)))
+        except Exception:
+            skip_count += 1
+            continue
+    return ParsedSheet(grading.POLICY.mark_rows(rows), skip_count, None)
+
+
+def parse_semester_sheet(stream, filename: str) -> ParsedSheet:
+    try:
+        sheet = read_sheet(stream, filename)
+    except Exception as e:
+        return ParsedSheet([], 0, f'Error reading spreadsheet: {e}')
+    return semester_sheet_rows(sheet)
+
+
+def parse_subject_sheet(stream, filename: str, subject: str) -> ParsedSheet:
+    try:
+        sheet = read_sheet(stream, filename)
+    except Exception as e:
+        return ParsedSheet([], 0, f'Error reading file: {e}')
+    return subject_sheet_rows(sheet, subject)
@@ -0,0 +1,181 @@
+"""Watch-folder ingestion of marks sheets, run as its own process.
+
+    python ingest_daemon.py              # poll incoming/ every INGEST_POLL_SECONDS
+    python ingest_daemon.py --once       # a single pass (cron, scripts)
+
+Sheets and zip archives dropped into incoming/ (next to uploads/, or
+EDUBOARD_INGEST_DIR) are picked up once their size and mtime stop
+changing. They are imported through bulk_import, which uses the same
+mapping, validation and insert code as the upload routes. Files are then
+moved to incoming/done, or to incoming/failed if any of their sheets
+failed or the file could not be imported at all (logged to stderr; the
+daemon keeps polling). Each pass writes a JSON report to incoming/reports.
+
+Writes go through one WriteQueue per semester DB, one transaction per
+semester per pass. They wait on the web app's writer through
+busy_timeout, and the app picks them up from change_log.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+from datetime import datetime
+
+import bulk_import
+import migrations
+import upload_store
+import write_queue
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("EDUBOARD_DATA_DIR", BASE_DIR)
+UPLOAD_FOLDER = os.path.join(DATA_DIR, "uploads")
+INGEST_DIR = os.environ.get("EDUBOARD_INGEST_DIR", os.path.join(DATA_DIR, "incoming"))
+INGEST_POLL_SECONDS = 5.0
+# Files imported per pass at most; the rest wait for the next one
+INGEST_MAX_FILES = 200
+# Editor lock files and partial copies are never picked up
+IGNORED_PREFIXES = (".", "~$")
+IGNORED_SUFFIXES = (".part", ".tmp", ".crdownload")
+
+
+def db_path(sem: int) -> str:
+    return os.path.join(DATA_DIR, f"eduboard_sem{sem}.db")
+
+
+class IngestDaemon:
+    def __init__(self, drop_dir: str = INGEST_DIR, semesters=(1, 2, 3, 4)):
+        self.drop_dir = drop_dir
+        self.done_dir = os.path.join(drop_dir, "done")
+        self.failed_dir = os.path.join(drop_dir, "failed")
+        self.reports_dir = os.path.join(drop_dir, "reports")
+        for folder in (self.drop_dir, self.done_dir, self.failed_dir, self.reports_dir):
+            os.makedirs(folder, exist_ok=True)
+        migrations.migrate_all([db_path(sem) for sem in semesters])
+        self.write_queues = {sem: write_queue.WriteQueue(db_path(sem)) for sem in semesters}
+        self.catalog = upload_store.UploadCatalog(UPLOAD_FOLDER)
+        # name -> (size, mtime) at the previous poll
+        self._seen = {}
+
+    def ready_files(self):
+        """Files whose size and mtime did not change since the previous poll"""
+        current = {}
+        for entry in os.scandir(self.drop_dir):
+            if not entry.is_file() or entry.name.startswith(IGNORED_PREFIXES) or entry.name.endswith(IGNORED_SUFFIXES):
+                continue
+            stat = entry.stat()
+            current[entry.name] = (stat.st_size, stat.st_mtime)
+        ready = sorted(name for name, sig in current.items() if self._seen.get(name) == sig)
+        self._seen = current
+        return ready[:INGEST_MAX_FILES]
+
+    def run_once(self, wait_for_stable: bool = True):
+        """One pass; returns the report, or None when nothing was ready"""
+        names = self.ready_files()
+        if not wait_for_stable:
+            names = sorted(self._seen)[:INGEST_MAX_FILES]
+        if not names:
+            return None
+        # name -> why the file could not be imported at all
+        errors = {}
+        files = []
+        for name in names:
+            try:
+                with open(os.path.join(self.drop_dir, name), "rb") as f:
+                    files.append((name, f.read()))
+            except OSError as e:
+                errors[name] = f"Error reading file: {e}"
+        try:
+            report = self._import(files)
+        except Exception:
+            # One file can break the whole batch; import them one at a time so only it fails
+            report = self._import_each(files, errors)
+        report["errors"] = errors
+
+        report["moved"] = {}
+        for name in names:
+            failed = name in errors or any(r["status"] == "failed" for r in report["files"] if r.get("source") == name)
+            if name in errors:
+                print(f"{name}: {errors[name]}", file=sys.stderr, flush=True)
+            folder = self.failed_dir if failed else self.done_dir
+            try:
+                report["moved"][name] = os.path.relpath(self._move(name, folder), self.drop_dir)
+            except OSError as e:
+                print(f"{name}: cannot move to {folder}: {e}", file=sys.stderr, flush=True)
+            self._seen.pop(name, None)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        with open(os.path.join(self.reports_dir, f"ingest-{stamp}.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+    def _import(self, files):
+        return bulk_import.import_files(
+            files, self.write_queues,
+            known_subjects=lambda sem: bulk_import.semester_subjects(db_path(sem)), catalog=self.catalog)
+
+    def _import_each(self, files, errors):
+        """_import per file, merged into one report; files that raise go into errors"""
+        report = {"files": [], "totals": {}, "semesters": set(), "elapsed_ms": 0.0}
+        for name, data in files:
+            try:
+                one = self._import([(name, data)])
+            except Exception as e:
+                errors[name] = f"Error importing file: {e!r}"
+                continue
+            report["files"] += one["files"]
+            for key, value in one["totals"].items():
+                report["totals"][key] = report["totals"].get(key, 0) + value
+            report["semesters"].update(one["semesters"])
+            report["elapsed_ms"] += one["elapsed_ms"]
+        report["semesters"] = sorted(report["semesters"])
+        return report
+
+    def _move(self, name: str, folder: str) -> str:
+        """Move a processed file into folder; a name taken by an earlier file gets a timestamp"""
+        target = os.path.join(folder, name)
+        if os.path.exists(target):
+            stem, ext = os.path.splitext(name)
+            target = os.path.join(folder, f"{stem}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{ext}")
+        os.replace(os.path.join(self.drop_dir, name), target)
+        return target
+
+    def run_forever(self, interval: float = INGEST_POLL_SECONDS, stop: threading.Event = None):
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                report = self.run_once()
+            except Exception as e:
+                # e.g. the drop folder or a DB is briefly unavailable; the next poll tries again
+                print(f"ingest pass failed: {e!r}", file=sys.stderr, flush=True)
+                report = None
+            if report is not None:
+                totals = report["totals"]
+                print(f"{len(report['moved'])} files: {totals.get('imported', 0)} sheets imported, "
+                      f"{totals.get('duplicate', 0)} already uploaded, {totals.get('failed', 0)} failed, "
+                      f"{len(report['errors'])} errored; {totals.get('inserted', 0)} rows inserted", flush=True)
+            stop.wait(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EduBoard watch-folder ingestion")
+    parser.add_argument("--once", action="store_true", help="import what is in the drop folder now and exit")
+    parser.add_argument("--interval", type=float, default=INGEST_POLL_SECONDS)
+    parser.add_argument("--drop-dir", default=INGEST_DIR)
+    args = parser.parse_args()
+    daemon = IngestDaemon(args.drop_dir)
+    if args.once:
+        report = daemon.run_once(wait_for_stable=False)
+        print(json.dumps(report["totals"] if report else {}, indent=2))
+        return
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    print(f"watching {daemon.drop_dir} every {args.interval:g} s", flush=True)
+    try:
+        daemon.run_forever(args.interval, stop)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,507 @@
+"""Versioned schema migrations for the semester databases.
+
+Each DB records the last applied migration in PRAGMA user_version. Each step
+runs in its own transaction together with the version stamp, and its DDL is
+guarded (IF NOT EXISTS, or a check of the current schema), so an interrupted
+run simply resumes from the last committed step. Row rewrites and copies on
+large tables happen beforehand in a step's prepare phase, through
+batched_update: one short transaction per id range, so writers are only held
+off for a single batch at a time, and a rerun only copies what is missing.
+The step's own transaction then only catches up rows written meanwhile.
+
+Space freed by a migration (a dropped table) is reused by later writes; run
+VACUUM offline to shrink the file.
+
+    python migrations.py            # migrate eduboard_sem1..4.db
+    python migrations.py some.db    # migrate specific files
+"""
+import os
+import sqlite3
+import sys
+
+# Rows rewritten per transaction by batched_update
+MIGRATION_BATCH_ROWS = 5000
+# Columns holding marks as entered; changes to anything else on students are derived data
+MARK_COLUMNS = ["usn", "name", "subject", "cie1", "cie2", "cie_total50", "assignment1marks", "assignment2marks",
+                "ass_total50", "see", "see_total50", "final_total100", "grade"]
+
+MIGRATIONS = []
+
+
+def migration(version: int, description: str, prepare=None):
+    """Register apply(conn) as schema version `version`.
+
+    prepare(conn), if given, runs first in autocommit mode and must manage
+    its own (batched) transactions; apply runs inside BEGIN IMMEDIATE.
+    """
+    def register(apply):
+        MIGRATIONS.append((version, description, prepare, apply))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return apply
+    return register
+
+
+def table_columns(conn, table: str = "students"):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def object_type(conn, name: str):
+    """'table', 'view', 'index' or 'trigger' for a schema object, None if there is none"""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def batched_update(conn, sql: str, table: str = "students", batch_rows: int = MIGRATION_BATCH_ROWS):
+    """Run `sql` (with ? placeholders for an inclusive id range) over the table in id batches"""
+    lo, hi = conn.execute(f"SELECT MIN(id), MAX(id) FROM {table}").fetchone()
+    if lo is None:
+        return
+    for start in range(lo, hi + 1, batch_rows):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(sql, (start, start + batch_rows - 1))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# ---------------- MIGRATIONS ----------------
+@migration(1, "create students table")
+def _create_students(conn):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS students(
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            usn TEXT,
+            name TEXT,
+            subject TEXT,
+            cie1 REAL,
+            cie2 REAL,
+            cie_total50 REAL,
+            assignment1marks REAL,
+            assignment2marks REAL,
+            ass_total50 REAL,
+            see REAL,
+            see_total50 REAL,
+            final_total100 REAL,
+            grade TEXT
+        )
+        """
+    )
+    # Tables created before the final_total100 switch only have final_total150;
+    # later steps read every mark column, so add any an old table is missing
+    columns = table_columns(conn)
+    for column in MARK_COLUMNS:
+        if column not in columns:
+            kind = "TEXT" if column in ("usn", "name", "subject", "grade") else "REAL"
+            conn.execute(f"ALTER TABLE students ADD COLUMN {column} {kind}")
+
+
+def _backfill_final_total100(conn):
+    if 'final_total150' in table_columns(conn):
+        batched_update(conn, """
+            UPDATE students SET final_total100 = final_total150
+            WHERE final_total100 IS NULL AND final_total150 IS NOT NULL AND id BETWEEN ? AND ?
+        """)
+
+
+@migration(2, "move final_total150 into final_total100 and drop it", prepare=_backfill_final_total100)
+def _drop_final_total150(conn):
+    if 'final_total150' not in table_columns(conn):
+        return
+    # Rows written between the last batch and this transaction
+    conn.execute("""
+        UPDATE students SET final_total100 = final_total150
+        WHERE final_total100 IS NULL AND final_total150 IS NOT NULL
+    """)
+    # DROP COLUMN needs SQLite 3.35; older builds keep the (now unused) column
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute("ALTER TABLE students DROP COLUMN final_total150")
+
+
+@migration(3, "change_log table and triggers on students")
+def _change_log(conn):
+    # AUTOINCREMENT: versions are never reused after the log is compacted
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_log(
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            usn TEXT,
+            subject TEXT,
+            op TEXT NOT NULL,
+            changed_at REAL NOT NULL DEFAULT (julianday('now'))
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS change_consumers(
+            name TEXT PRIMARY KEY,
+            acked_version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS students_log_insert AFTER INSERT ON students BEGIN
+            INSERT INTO change_log (usn, subject, op) VALUES (NEW.usn, NEW.subject, 'I');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS students_log_update AFTER UPDATE ON students BEGIN
+            INSERT INTO change_log (usn, subject, op)
+            SELECT OLD.usn, OLD.subject, 'D' WHERE OLD.usn IS NOT NEW.usn OR OLD.subject IS NOT NEW.subject;
+            INSERT INTO change_log (usn, subject, op) VALUES (NEW.usn, NEW.subject, 'U');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS students_log_delete AFTER DELETE ON students BEGIN
+            INSERT INTO change_log (usn, subject, op) VALUES (OLD.usn, OLD.subject, 'D');
+        END
+    """)
+
+
+@migration(4, "index on UPPER(usn) for per-student lookups")
+def _usn_index(conn):
+    # Matches the WHERE UPPER(usn) = ? lookups in the student routes
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_usn_upper ON students(UPPER(usn))")
+
+
+@migration(5, "cohort standing columns and student_standing table")
+def _standing(conn):
+    columns = table_columns(conn)
+    for column in ("subject_percentile", "subject_zscore"):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE students ADD COLUMN {column} REAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS student_standing(
+            usn TEXT PRIMARY KEY,
+            subject_count INTEGER,
+            percentage REAL,
+            percentile REAL,
+            zscore REAL
+        )
+    """)
+    # Derived columns written back by standing.py must not show up as changes
+    conn.execute("DROP TRIGGER IF EXISTS students_log_update")
+    conn.execute(f"""
+        CREATE TRIGGER students_log_update AFTER UPDATE OF {", ".join(MARK_COLUMNS)} ON students BEGIN
+            INSERT INTO change_log (usn, subject, op)
+            SELECT OLD.usn, OLD.subject, 'D' WHERE OLD.usn IS NOT NEW.usn OR OLD.subject IS NOT NEW.subject;
+            INSERT INTO change_log (usn, subject, op) VALUES (NEW.usn, NEW.subject, 'U');
+        END
+    """)
+
+
+@migration(6, "risk_flags table for the at-risk pipeline")
+def _risk_flags(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS risk_flags(
+            usn TEXT NOT NULL,
+            name TEXT,
+            rule TEXT NOT NULL,
+            value REAL,
+            detail TEXT,
+            flagged_at REAL NOT NULL DEFAULT (julianday('now')),
+            PRIMARY KEY (usn, rule)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_risk_flags_rule ON risk_flags(rule, value DESC)")
+
+
+@migration(7, "index on subject for per-subject reads")
+def _subject_index(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_subject ON students(subject)")
+
+
+@migration(8, "grade_cube, cube_bands and their triggers")
+def _grade_cube(conn):
+    import cube
+    cube.create_schema(conn)
+
+
+# Mark columns kept per row in marks: the marks as entered. Totals and grade
+# are not stored; the students view computes them with the grading policy.
+MARKS_VALUE_COLUMNS = ["cie1", "cie2", "assignment1marks", "assignment2marks", "see"]
+
+
+def _normalized_copy_sql(values: str, where: str) -> str:
+    return f"""
+        INSERT OR IGNORE INTO marks (id, student_id, subject_id, {values}, subject_percentile, subject_zscore)
+        SELECT s.id, st.id, sb.id, {", ".join(f"s.{col}" for col in MARKS_VALUE_COLUMNS)},
+               s.subject_percentile, s.subject_zscore
+        FROM students AS s
+        JOIN student AS st ON st.usn = COALESCE(s.usn, '')
+        JOIN subject AS sb ON sb.name = COALESCE(s.subject, '')
+        WHERE {where}
+    """
+
+
+def _copy_students_to_marks(conn):
+    """Prepare for migration 9: build student, subject and marks from students, in batches.
+
+    normalize_dirty records every students row written from here on, so the
+    migration's own transaction re-copies just those. Rerunning after an
+    interruption skips the rows already copied.
+    """
+    if object_type(conn, "students") != "table":
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS normalize_dirty(id INTEGER PRIMARY KEY)")
+        for event, rows in (("INSERT", ("NEW",)), ("UPDATE", ("OLD", "NEW")), ("DELETE", ("OLD",))):
+            inserts = " ".join(f"INSERT OR IGNORE INTO normalize_dirty VALUES ({row}.id);" for row in rows)
+            conn.execute(f"CREATE TRIGGER IF NOT EXISTS normalize_dirty_{event.lower()} "
+                         f"AFTER {event} ON students BEGIN {inserts} END")
+        conn.execute("CREATE TABLE IF NOT EXISTS student(id INTEGER PRIMARY KEY, usn TEXT NOT NULL UNIQUE, name TEXT)")
+        conn.execute("CREATE TABLE IF NOT EXISTS subject(id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS marks(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER NOT NULL REFERENCES student(id),
+                subject_id INTEGER NOT NULL REFERENCES subject(id),
+                {", ".join(f"{col} REAL" for col in MARKS_VALUE_COLUMNS)},
+                subject_percentile REAL,
+                subject_zscore REAL
+            )
+        """)
+        # A student is recorded under the name of their first row
+        conn.execute("""
+            INSERT OR IGNORE INTO student (usn, name)
+            SELECT COALESCE(usn, ''), name FROM students
+            WHERE id IN (SELECT MIN(id) FROM students GROUP BY COALESCE(usn, '')) ORDER BY id
+        """)
+        conn.execute("INSERT OR IGNORE INTO subject (name) SELECT DISTINCT COALESCE(subject, '') FROM students ORDER BY 1")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    batched_update(conn, _normalized_copy_sql(", ".join(MARKS_VALUE_COLUMNS), "s.id BETWEEN ? AND ?"))
+
+
+def create_students_view(conn, columns, policy=None):
+    """(Re)create the students view over marks, student and subject, and its INSTEAD OF triggers.
+
+    `columns` are the view's columns in order. Totals and grade come from
+    the policy's SQL over the raw marks, so grading.regrade recreates the
+    view when the policy changes; values written to them are ignored.
+    """
+    import grading
+    values = ", ".join(MARKS_VALUE_COLUMNS)
+    source = {"id": "m.id", "usn": "st.usn", "name": "st.name", "subject": "sb.name",
+              **{col: f"m.{col}" for col in MARKS_VALUE_COLUMNS + ["subject_percentile", "subject_zscore"]},
+              **(policy or grading.POLICY).derived_sql("m")}
+    conn.execute("DROP VIEW IF EXISTS students")  # takes its triggers with it
+    view_columns = ", ".join(f"{source[col]} AS {col}" for col in columns if col in source)
+    conn.execute(f"""
+        CREATE VIEW students AS
+        SELECT {view_columns}
+        FROM marks AS m
+        JOIN student AS st ON st.id = m.student_id
+        JOIN subject AS sb ON sb.id = m.subject_id
+    """)
+    student_id = "(SELECT id FROM student WHERE usn = COALESCE(NEW.usn, ''))"
+    subject_id = "(SELECT id FROM subject WHERE name = COALESCE(NEW.subject, ''))"
+    ensure_keys = """
+            INSERT OR IGNORE INTO student (usn, name) VALUES (COALESCE(NEW.usn, ''), NEW.name);
+            INSERT OR IGNORE INTO subject (name) VALUES (COALESCE(NEW.subject, ''));"""
+    conn.execute(f"""
+        CREATE TRIGGER students_insert INSTEAD OF INSERT ON students BEGIN {ensure_keys}
+            INSERT INTO marks (id, student_id, subject_id, {values}, subject_percentile, subject_zscore)
+            VALUES (NEW.id, {student_id}, {subject_id}, {", ".join(f"NEW.{col}" for col in MARKS_VALUE_COLUMNS)},
+                    NEW.subject_percentile, NEW.subject_zscore);
+        END
+    """)
+    # Only the parts that differ are written, so derived-only updates do not reach the change log
+    changed = " OR ".join(f"NEW.{col} IS NOT OLD.{col}" for col in ["usn", "subject"] + MARKS_VALUE_COLUMNS)
+    conn.execute(f"""
+        CREATE TRIGGER students_update INSTEAD OF UPDATE ON students BEGIN {ensure_keys}
+            UPDATE student SET name = NEW.name WHERE usn = COALESCE(NEW.usn, '') AND name IS NOT NEW.name;
+            UPDATE marks SET student_id = {student_id}, subject_id = {subject_id},
+                {", ".join(f"{col} = NEW.{col}" for col in MARKS_VALUE_COLUMNS)}
+            WHERE id = OLD.id AND ({changed});
+            UPDATE marks SET subject_percentile = NEW.subject_percentile, subject_zscore = NEW.subject_zscore
+            WHERE id = OLD.id AND (NEW.subject_percentile IS NOT OLD.subject_percentile
+                                   OR NEW.subject_zscore IS NOT OLD.subject_zscore);
+        END
+    """)
+    conn.execute("CREATE TRIGGER students_delete INSTEAD OF DELETE ON students BEGIN "
+                 "DELETE FROM marks WHERE id = OLD.id; END")
+
+
+def _create_marks_log_triggers(conn):
+    """Change log entries for writes to marks (and renames on student)"""
+    old_key = "(SELECT usn FROM student WHERE id = OLD.student_id), (SELECT name FROM subject WHERE id = OLD.subject_id)"
+    new_key = "(SELECT usn FROM student WHERE id = NEW.student_id), (SELECT name FROM subject WHERE id = NEW.subject_id)"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS marks_log_insert AFTER INSERT ON marks BEGIN
+            INSERT INTO change_log (usn, subject, op) VALUES ({new_key}, 'I');
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS marks_log_update
+        AFTER UPDATE OF student_id, subject_id, {", ".join(MARKS_VALUE_COLUMNS)} ON marks BEGIN
+            INSERT INTO change_log (usn, subject, op)
+            SELECT {old_key}, 'D' WHERE OLD.student_id IS NOT NEW.student_id OR OLD.subject_id IS NOT NEW.subject_id;
+            INSERT INTO change_log (usn, subject, op) VALUES ({new_key}, 'U');
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS marks_log_delete AFTER DELETE ON marks BEGIN
+            INSERT INTO change_log (usn, subject, op) VALUES ({old_key}, 'D');
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS student_log_rename AFTER UPDATE OF name ON student BEGIN
+            INSERT INTO change_log (usn, subject, op)
+            SELECT NEW.usn, sb.name, 'U' FROM marks AS m JOIN subject AS sb ON sb.id = m.subject_id
+            WHERE m.student_id = NEW.id;
+        END
+    """)
+
+
+@migration(9, "normalize students into student, subject and marks behind a students view",
+           prepare=_copy_students_to_marks)
+def _normalize(conn):
+    import cube
+    values = ", ".join(MARKS_VALUE_COLUMNS)
+    old_columns = table_columns(conn)
+    if object_type(conn, "students") == "table":
+        # Catch up on the rows written since the batched copy
+        dirty = "s.id IN (SELECT id FROM normalize_dirty)"
+        conn.execute(f"""
+            INSERT OR IGNORE INTO student (usn, name)
+            SELECT COALESCE(s.usn, ''), s.name FROM students AS s WHERE {dirty} ORDER BY s.id
+        """)
+        conn.execute(f"""
+            UPDATE student SET name = (SELECT name FROM students WHERE COALESCE(usn, '') = student.usn ORDER BY id LIMIT 1)
+            WHERE usn IN (SELECT COALESCE(s.usn, '') FROM students AS s WHERE {dirty})
+        """)
+        conn.execute(f"INSERT OR IGNORE INTO subject (name) SELECT DISTINCT COALESCE(s.subject, '') FROM students AS s WHERE {dirty}")
+        conn.execute("DELETE FROM marks WHERE id IN (SELECT id FROM normalize_dirty)")
+        conn.execute(_normalized_copy_sql(values, dirty))
+    # Keep ids of deleted rows from being handed out again
+    conn.execute("""
+        UPDATE sqlite_sequence SET seq = MAX(seq, (SELECT seq FROM sqlite_sequence WHERE name = 'students'))
+        WHERE name = 'marks' AND EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'students')
+    """)
+    conn.execute("""
+        INSERT INTO sqlite_sequence (name, seq) SELECT 'marks', seq FROM sqlite_sequence
+        WHERE name = 'students' AND NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'marks')
+    """)
+    if object_type(conn, "students") == "table":
+        conn.execute("DROP TABLE students")  # takes its indexes and triggers with it
+    conn.execute("DROP TABLE IF EXISTS normalize_dirty")
+
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_student_usn_upper ON student(UPPER(usn))")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_marks_student ON marks(student_id, subject_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_marks_subject ON marks(subject_id)")
+
+    # Same columns, in the same order, as the old table
+    create_students_view(conn, old_columns)
+    # Change log and cube now follow marks (and renames on student)
+    _create_marks_log_triggers(conn)
+    cube.create_triggers(conn, "marks", cube.marks_row())
+
+
+@migration(10, "student_search full-text index over student usn and name")
+def _student_search(conn):
+    # External content: the index stores only tokens, rows are read from student
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS student_search USING fts5(
+            usn, name, content='student', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 4'
+        )
+    """)
+    conn.execute("INSERT INTO student_search (student_search) VALUES ('rebuild')")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS student_search_insert AFTER INSERT ON student BEGIN
+            INSERT INTO student_search (rowid, usn, name) VALUES (NEW.id, NEW.usn, NEW.name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS student_search_delete AFTER DELETE ON student BEGIN
+            INSERT INTO student_search (student_search, rowid, usn, name) VALUES ('delete', OLD.id, OLD.usn, OLD.name);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS student_search_update AFTER UPDATE OF usn, name ON student BEGIN
+            INSERT INTO student_search (student_search, rowid, usn, name) VALUES ('delete', OLD.id, OLD.usn, OLD.name);
+            INSERT INTO student_search (rowid, usn, name) VALUES (NEW.id, NEW.usn, NEW.name);
+        END
+    """)
+
+
+@migration(11, "per-process and registered external cursors in change_consumers, with expiry")
+def _consumer_expiry(conn):
+    columns = table_columns(conn, "change_consumers")
+    if "seen_at" not in columns:
+        conn.execute("ALTER TABLE change_consumers ADD COLUMN seen_at REAL")
+    if "external" not in columns:
+        conn.execute("ALTER TABLE change_consumers ADD COLUMN external INTEGER NOT NULL DEFAULT 0")
+    # Cursors from before: process consumers shared by name and unregistered external ones
+    conn.execute("DELETE FROM change_consumers WHERE seen_at IS NULL")
+
+
+@migration(12, "compute totals and grades in the students view instead of storing them in marks")
+def _derive_in_view(conn):
+    import cube
+    import grading
+    stored = [col for col in grading.DERIVED_COLUMNS if col in table_columns(conn, "marks")]
+    if not stored:
+        return
+    columns = table_columns(conn, "students")
+    # Everything reading the stored columns goes before they do
+    conn.execute("DROP VIEW students")
+    for trigger in ("marks_log_update", "cube_insert", "cube_delete", "cube_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    # DROP COLUMN needs SQLite 3.35; older builds keep the (now unused) columns
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        for col in stored:
+            conn.execute(f"ALTER TABLE marks DROP COLUMN {col}")
+    create_students_view(conn, columns)
+    _create_marks_log_triggers(conn)
+    cube.create_triggers(conn, "marks", cube.marks_row())
+    # Cells summed stored values; recount them from the view
+    cube.rebuild(conn)
+
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------------- RUNNER ----------------
+def migrate(db_path: str, target: int = None):
+    """Bring one DB up to `target` (default SCHEMA_VERSION); returns the versions applied"""
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    applied = []
+    try:
+        current = conn.execute("PRAGMA user_version").fetchone()[0]
+        for version, _, prepare, apply in MIGRATIONS:
+            if version <= current or (target is not None and version > target):
+                continue
+            if prepare is not None:
+                prepare(conn)
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                apply(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            applied.append(version)
+    finally:
+        conn.close()
+    return applied
+
+
+def migrate_all(db_paths):
+    return {path: migrate(path) for path in db_paths}
+
+
+if __name__ == "__main__":
+    data_dir = os.environ.get("EDUBOARD_DATA_DIR", os.path.dirname(os.path.abspath(__file__)))
+    paths = sys.argv[1:] or [os.path.join(data_dir, f"eduboard_sem{sem}.db") for sem in range(1, 5)]
+    for path, applied in migrate_all(paths).items():
+        descriptions = {m[0]: m[1] for m in MIGRATIONS}
+        if applied:
+            for version in applied:
+                print(f"{path}: applied {version} ({descriptions[version]})")
+        else:
+            print(f"{path}: already at version {SCHEMA_VERSION}")
@@ -0,0 +1,281 @@
+"""Batch report cards (HTML and PDF) for every student of a semester.
+
+    python report_cards.py                  # all four semesters
+    python report_cards.py 3 --workers 4    # one semester, four processes
+    python report_cards.py 3 --force        # regenerate everything
+
+Each semester's mark rows come from one query ordered by USN and are
+grouped per student in Python. Students are rendered in chunks on a process
+pool: report_card.html through Jinja for the HTML, and a plain text layout
+written as a minimal PDF (no PDF library needed).
+
+Output goes to reports/sem<N>/<USN>.html and .pdf under the data directory
+(EDUBOARD_DATA_DIR), named by the trimmed, upper-cased USN, with manifest.json
+recording each student's digest (their rows, standing and the template).
+A run skips students whose digest and files are unchanged, and removes
+the cards of students who are gone. The manifest is saved as chunks
+finish, so an interrupted run resumes where it stopped.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from itertools import groupby
+
+import grading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("EDUBOARD_DATA_DIR", BASE_DIR)
+REPORTS_DIR = os.path.join(DATA_DIR, "reports")
+TEMPLATE = "report_card.html"
+# Students per process-pool task, and how often the manifest is saved during a run
+REPORT_CHUNK_STUDENTS = 200
+MANIFEST_SAVE_SECONDS = 2.0
+
+CARD_COLUMNS = ["usn", "name", "subject", "cie1", "cie2", "cie_total50", "assignment1marks", "assignment2marks",
+                "ass_total50", "see", "see_total50", "final_total100", "grade"]
+
+# PDF page: A4 in points, Courier 9 pt
+PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT = 595, 842
+PDF_FONT_SIZE, PDF_LEADING, PDF_MARGIN = 9, 12, 48
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+
+
+def db_path(sem: int) -> str:
+    return os.path.join(DATA_DIR, f"eduboard_sem{sem}.db")
+
+
+def _template_source() -> str:
+    for folder in (os.path.join(BASE_DIR, "templates"), BASE_DIR):
+        path = os.path.join(folder, TEMPLATE)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+    raise FileNotFoundError(TEMPLATE)
+
+
+def load_students(path: str):
+    """(USN, name, rows, standing) per student, from one query over the semester"""
+    conn = sqlite3.connect(path)
+    try:
+        # Keyed like the groups below; student_standing is keyed by UPPER(usn), untrimmed
+        standing = {}
+        for usn, percentage, percentile, zscore in conn.execute(
+                "SELECT usn, percentage, percentile, zscore FROM student_standing WHERE usn IS NOT NULL ORDER BY usn"):
+            standing.setdefault(usn.strip().upper(),
+                                {"percentage": percentage, "percentile": percentile, "zscore": zscore})
+        cursor = conn.execute(f"""
+            SELECT {", ".join(CARD_COLUMNS)} FROM students
+            WHERE usn IS NOT NULL AND TRIM(usn) != ''
+            ORDER BY UPPER(TRIM(usn)), subject
+        """)
+        for usn, rows in groupby(cursor, key=lambda row: row[0].strip().upper()):
+            rows = [dict(zip(CARD_COLUMNS, row)) for row in rows]
+            yield usn, rows[0]["name"] or "", rows, standing.get(usn)
+    finally:
+        conn.close()
+
+
+def digest(rows, standing, template_hash: str) -> str:
+    payload = json.dumps([rows, standing, template_hash], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def card_context(sem: int, usn: str, name: str, rows, standing):
+    percentage = sum(row["final_total100"] or 0 for row in rows) / len(rows)
+    return {"sem": sem, "usn": usn, "name": name, "data": rows, "standing": standing,
+            "percentage": percentage, "overall_grade": grading.POLICY.bands.letter(percentage),
+            "generated_at": datetime.now().strftime("%Y-%m-%d %H:%M")}
+
+
+def card_lines(context):
+    """The report card as fixed-width text lines, for the PDF"""
+    lines = [f"{context['name']}", f"USN {context['usn']}  -  Semester {context['sem']}", "",
+             f"Subjects {len(context['data'])}   Percentage {context['percentage']:.2f}   "
+             f"Overall grade {context['overall_grade']}"
+             + (f"   Percentile {context['standing']['percentile']:.1f}"
+                if context["standing"] and context["standing"]["percentile"] is not None else ""),
+             "", f"{'#':>2}  {'Subject':<34} {'CIE':>6} {'Assign':>6} {'SEE':>6} {'Final':>6}  Grade", "-" * 78]
+    for i, row in enumerate(context["data"], 1):
+        lines.append(f"{i:>2}  {str(row['subject'])[:34]:<34} {row['cie_total50'] or 0:>6.2f} "
+                     f"{row['ass_total50'] or 0:>6.2f} {row['see_total50'] or 0:>6.2f} "
+                     f"{row['final_total100'] or 0:>6.2f}  {row['grade'] or ''}")
+    lines += ["", f"Generated {context['generated_at']}"]
+    return lines
+
+
+def _pdf_text(line: str) -> str:
+    text = line.encode("latin-1", "replace").decode("latin-1")
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_document(lines) -> bytes:
+    """A minimal PDF 1.4 with the lines set in Courier, as many A4 pages as they need"""
+    pages = [lines[i:i + PDF_LINES_PER_PAGE] for i in range(0, len(lines), PDF_LINES_PER_PAGE)] or [[]]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>"]
+    kids = []
+    for page in pages:
+        text = "\n".join(f"({_pdf_text(line)}) Tj T*" for line in page)
+        stream = (f"BT /F1 {PDF_FONT_SIZE} Tf {PDF_LEADING} TL {PDF_MARGIN} {PDF_PAGE_HEIGHT - PDF_MARGIN} Td\n"
+                  f"{text}\nET").encode("latin-1")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode("latin-1") + stream + b"\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PDF_PAGE_WIDTH} {PDF_PAGE_HEIGHT}] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode("latin-1")
+        out += body if isinstance(body, bytes) else body.encode("latin-1")
+        out += b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
+
+
+def card_filename(usn: str) -> str:
+    """File name (without extension) of a student's cards: the trimmed, upper-cased USN.
+
+    A USN with characters unsafe in file names gets them replaced and a
+    digest of the USN appended, so two students never share a file.
+    """
+    usn = usn.strip().upper()
+    safe = re.sub(r"[^A-Z0-9_-]", "_", usn)
+    if safe == usn:
+        return usn
+    return f"{safe}-{hashlib.sha1(usn.encode('utf-8')).hexdigest()[:8]}"
+
+
+def _write(path: str, data: bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+_template = None
+
+
+def render_chunk(job):
+    """Process-pool worker: write the cards of one chunk; returns [(usn, manifest entry)]"""
+    global _template
+    out_dir, sem, students = job
+    if _template is None:
+        import jinja2
+        _template = jinja2.Environment(autoescape=True).from_string(_template_source())
+    done = []
+    for usn, name, rows, standing, card_digest in students:
+        context = card_context(sem, usn, name, rows, standing)
+        base = card_filename(usn)
+        _write(os.path.join(out_dir, f"{base}.html"), _template.render(**context).encode("utf-8"))
+        _write(os.path.join(out_dir, f"{base}.pdf"), pdf_document(card_lines(context)))
+        done.append((usn, {"name": name, "subjects": len(rows), "digest": card_digest,
+                           "html": f"{base}.html", "pdf": f"{base}.pdf"}))
+    return done
+
+
+def load_manifest(out_dir: str):
+    try:
+        with open(os.path.join(out_dir, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"students": {}}
+
+
+def save_manifest(out_dir: str, manifest):
+    _write(os.path.join(out_dir, "manifest.json"), json.dumps(manifest, indent=1).encode("utf-8"))
+
+
+def generate(sem: int, out_root: str = REPORTS_DIR, workers: int = None, force: bool = False,
+             chunk_students: int = REPORT_CHUNK_STUDENTS):
+    """Bring reports/sem<N> up to date; returns the run's stats"""
+    started = time.perf_counter()
+    out_dir = os.path.join(out_root, f"sem{sem}")
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = load_manifest(out_dir)
+    previous = manifest.get("students", {})
+    template_hash = hashlib.sha1(_template_source().encode("utf-8")).hexdigest()
+
+    current, pending = {}, []
+    for usn, name, rows, standing in load_students(db_path(sem)):
+        card_digest = digest(rows, standing, template_hash)
+        entry = previous.get(usn)
+        if (not force and entry and entry["digest"] == card_digest
+                and all(os.path.exists(os.path.join(out_dir, entry[kind])) for kind in ("html", "pdf"))):
+            current[usn] = entry
+        else:
+            pending.append((usn, name, rows, standing, card_digest))
+    skipped = len(current)
+
+    # Cards of students no longer in the semester, and ones about to be written under a new name
+    rerendered = {student[0] for student in pending}
+    for usn in set(previous) - set(current):
+        for kind in ("html", "pdf"):
+            if usn in rerendered and previous[usn][kind] == f"{card_filename(usn)}.{kind}":
+                continue
+            try:
+                os.remove(os.path.join(out_dir, previous[usn][kind]))
+            except OSError:
+                pass
+    manifest = {"semester": sem, "students": current}
+
+    jobs = [(out_dir, sem, pending[i:i + chunk_students]) for i in range(0, len(pending), chunk_students)]
+    last_save = time.monotonic()
+
+    def finished(done):
+        nonlocal last_save
+        current.update(done)
+        if time.monotonic() - last_save >= MANIFEST_SAVE_SECONDS:
+            save_manifest(out_dir, manifest)
+            last_save = time.monotonic()
+
+    render_started = time.perf_counter()
+    if len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(len(jobs), workers or os.cpu_count() or 1)) as pool:
+            for future in as_completed([pool.submit(render_chunk, job) for job in jobs]):
+                finished(future.result())
+    else:
+        for job in jobs:
+            finished(render_chunk(job))
+    render_elapsed = time.perf_counter() - render_started
+
+    stats = {"rendered": len(pending), "skipped": skipped, "pages": len(pending) * 2,
+             "pages_per_second": round(len(pending) * 2 / render_elapsed, 1) if pending else 0.0,
+             "elapsed_s": round(time.perf_counter() - started, 2)}
+    manifest["generated_at"] = datetime.now().isoformat(timespec="seconds")
+    manifest["last_run"] = stats
+    save_manifest(out_dir, manifest)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EduBoard batch report cards")
+    parser.add_argument("semesters", nargs="*", type=int, default=[1, 2, 3, 4])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--force", action="store_true", help="regenerate cards whose data has not changed")
+    parser.add_argument("--out", default=REPORTS_DIR)
+    args = parser.parse_args()
+    import migrations
+    for sem in args.semesters:
+        if sem not in (1, 2, 3, 4):
+            parser.error(f"no semester {sem}")
+        migrations.migrate(db_path(sem))
+        stats = generate(sem, args.out, args.workers, args.force)
+        print(f"sem{sem}: {stats['rendered']} cards rendered, {stats['skipped']} unchanged, "
+              f"{stats['pages_per_second']:,} pages/s, {stats['elapsed_s']} s", flush=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
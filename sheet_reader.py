@@ -0,0 +1,191 @@
+"""Spreadsheet readers for marks imports, with pluggable parsing engines.
+
+read_sheet returns only the wanted columns of a sheet's first worksheet.
+Each column is a list of cell values: text columns become stripped str
+and mark columns float, with None for blank cells. A mark that is not a
+number stays the raw text, so the import rejects that one row rather than
+the whole sheet. Fully blank rows are dropped, as pandas does.
+
+Engines are tried fastest first, per file type, and the first one whose
+modules are installed is used (see `python benchmark.py readers`):
+
+  .csv   pyarrow (Arrow's C++ CSV reader), csv (stdlib, no pandas import),
+         pandas (C parser)
+  .xlsx  calamine (python-calamine, Rust), openpyxl (streaming read-only
+         rows, no DataFrame), pandas (read_excel)
+  .xls   calamine, pandas (xlrd)
+
+EDUBOARD_SHEET_ENGINE=<name> forces an engine for every type it handles.
+"""
+import csv
+import importlib.util
+import io
+import os
+from collections import namedtuple
+from operator import itemgetter
+
+# columns: header -> list of cell values, in sheet order; engine: the engine that read it
+Sheet = namedtuple("Sheet", ["columns", "rows", "engine"])
+
+# name, file extensions, modules it needs,
+# read(stream, {wanted header: dtype}, ext) -> (header, row iterator)
+Engine = namedtuple("Engine", ["name", "extensions", "modules", "read"])
+
+ENGINES = []
+FORCED_ENGINE = os.environ.get("EDUBOARD_SHEET_ENGINE")
+
+
+def engine(name: str, extensions, modules=()):
+    """Register a reader; registration order is preference order"""
+    def register(read):
+        ENGINES.append(Engine(name, frozenset(extensions), tuple(modules), read))
+        return read
+    return register
+
+
+def installed(eng: Engine) -> bool:
+    return all(importlib.util.find_spec(module) is not None for module in eng.modules)
+
+
+def engines_for(filename: str):
+    """Installed engines able to read filename, fastest first"""
+    ext = os.path.splitext(filename)[1].lower()
+    return [eng for eng in ENGINES if ext in eng.extensions and installed(eng)]
+
+
+def pick_engine(filename: str) -> Engine:
+    candidates = engines_for(filename)
+    if not candidates:
+        raise ValueError(f"No reader installed for {os.path.splitext(filename)[1] or 'this file type'}")
+    for eng in candidates:
+        if eng.name == FORCED_ENGINE:
+            return eng
+    return candidates[0]
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _to_str(value):
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)  # Excel stores numeric USNs as floats
+    return str(value).strip()
+
+
+def _convert(values, dtype):
+    """One column to its dtype; blank cells (None, "", NaN) become None"""
+    values = [None if v is None or v == "" or v != v else v for v in values]  # v != v: NaN
+    if dtype is float:
+        try:
+            return [None if v is None else float(v) for v in values]
+        except (TypeError, ValueError):
+            return [None if v is None else _to_float(v) for v in values]
+    return [None if v is None else v.strip() if type(v) is str else _to_str(v) for v in values]
+
+
+def read_sheet(stream, filename: str, dtypes, engine_name: str = None) -> Sheet:
+    """The columns named in dtypes {header: str or float} that the sheet has, converted to their dtype"""
+    eng = pick_engine(filename) if engine_name is None else next(
+        e for e in engines_for(filename) if e.name == engine_name)
+    header, rows = eng.read(stream, dtypes, os.path.splitext(filename)[1].lower())
+    header = [None if h is None else str(h).strip() for h in header]
+    # First occurrence of each wanted header
+    picked = {}
+    for i, name in enumerate(header):
+        if name in dtypes and name not in picked:
+            picked[name] = i
+    if not picked:
+        for _ in rows:
+            pass  # lets the engine close its workbook
+        return Sheet({}, 0, eng.name)
+    names = list(picked)
+    indexes = [picked[name] for name in names]
+    width = max(indexes) + 1
+    pick = itemgetter(*indexes) if len(indexes) > 1 else (lambda row: (row[indexes[0]],))
+    # Row-wise only to pick the cells (itemgetter); conversion is per column
+    selected = [pick(row) if len(row) >= width else tuple(row[i] if i < len(row) else None for i in indexes)
+                for row in rows]
+    columns = [_convert(values, dtypes[name]) for name, values in zip(names, zip(*selected))] or [[] for _ in names]
+    # Drop fully blank rows
+    blank = {r for r, value in enumerate(columns[0]) if value is None}
+    for column in columns[1:]:
+        if not blank:
+            break
+        blank = {r for r in blank if column[r] is None}
+    if blank:
+        columns = [[value for r, value in enumerate(column) if r not in blank] for column in columns]
+    return Sheet(dict(zip(names, columns)), len(columns[0]), eng.name)
+
+
+def _rows_after_header(rows):
+    rows = iter(rows)
+    header = next(rows, None)
+    return (list(header) if header is not None else []), rows
+
+
+@engine("pyarrow", {".csv"}, modules=("pyarrow",))
+def _read_pyarrow(stream, wanted, ext):
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+    # Header first: only the wanted columns are converted, and text columns are
+    # read as strings (type inference would turn USN 007 into the integer 7)
+    start = stream.tell()
+    header = next(csv.reader([stream.readline().decode("utf-8-sig", errors="replace")]), [])
+    stream.seek(start)
+    names = list(dict.fromkeys(name for name in header if name.strip() in wanted))
+    if not names:
+        return header, iter(())
+    options = pacsv.ConvertOptions(
+        include_columns=names,
+        column_types={name: pa.string() for name in names if wanted[name.strip()] is str})
+    table = pacsv.read_csv(stream, convert_options=options)
+    return table.column_names, zip(*(column.to_pylist() for column in table.columns))
+
+
+@engine("csv", {".csv"})
+def _read_csv(stream, wanted, ext):
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+    def rows():
+        try:
+            yield from csv.reader(text)
+        finally:
+            text.detach()  # the caller's stream stays open (uploads are retained after parsing)
+    return _rows_after_header(rows())
+
+
+@engine("calamine", {".xls", ".xlsx"}, modules=("python_calamine",))
+def _read_calamine(stream, wanted, ext):
+    from python_calamine import CalamineWorkbook
+    workbook = CalamineWorkbook.from_filelike(stream)
+    return _rows_after_header(workbook.get_sheet_by_index(0).to_python(skip_empty_area=False))
+
+
+@engine("openpyxl", {".xlsx"}, modules=("openpyxl",))
+def _read_openpyxl(stream, wanted, ext):
+    from openpyxl import load_workbook
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+
+    def rows():
+        try:
+            yield from workbook.worksheets[0].iter_rows(values_only=True)
+        finally:
+            workbook.close()
+    return _rows_after_header(rows())
+
+
+@engine("pandas", {".csv", ".xls", ".xlsx"}, modules=("pandas",))
+def _read_pandas(stream, wanted, ext):
+    import pandas as pd
+
+    def usecols(name):
+        return str(name).strip() in wanted
+    if ext == ".csv":
+        df = pd.read_csv(stream, usecols=usecols, dtype=object)
+    else:
+        df = pd.read_excel(stream, usecols=usecols, dtype=object)
+    return [str(c) for c in df.columns], df.itertuples(index=False, name=None)
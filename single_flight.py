@@ -0,0 +1,138 @@
+"""Single-flight coalescing with admission control for expensive computations.
+
+SingleFlight.do(key, compute) runs compute() once per key at a time: callers
+arriving while it is in flight wait for that run and share its result (or
+its exception) instead of starting their own. Keys carry the data version
+(see changelog.ChangeFeed.latest_version), so a write simply makes later
+callers start a fresh run; nothing is cached once a run has finished.
+
+At most max_concurrent runs execute together. A new run beyond that
+queues for up to queue_timeout seconds, and is shed with Overloaded when
+max_queued runs are already waiting or no slot frees up in time. Callers
+that coalesce onto a run never take a slot of their own. Work that cannot
+be shared (a page streamed from its own cursor) holds a slot through
+hold() for as long as it runs.
+"""
+import threading
+from collections import Counter
+
+
+class Overloaded(Exception):
+    """No computation slot could be had within the queue limits"""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+        self._max_concurrent = max_concurrent
+        self._max_queued = max_queued
+        self._queue_timeout = queue_timeout
+        self._queued = 0
+        self._running = 0
+        # key[0] (the route) -> Counter of computed / coalesced / queued / shed / failed
+        self._counts = {}
+
+    def _count(self, key, event: str):
+        # Called with self._lock held
+        self._counts.setdefault(key[0], Counter())[event] += 1
+
+    def _admit(self, key):
+        if self._slots.acquire(blocking=False):
+            return
+        with self._lock:
+            if self._queued >= self._max_queued:
+                self._count(key, "shed")
+                raise Overloaded(f"{self._queued} computations already queued")
+            self._queued += 1
+            self._count(key, "queued")
+        try:
+            admitted = self._slots.acquire(timeout=self._queue_timeout)
+        finally:
+            with self._lock:
+                self._queued -= 1
+        if not admitted:
+            with self._lock:
+                self._count(key, "shed")
+            raise Overloaded(f"no computation slot within {self._queue_timeout:g} s")
+
+    def do(self, key, compute):
+        """compute() for key, shared with every concurrent caller of the same key"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._count(key, "coalesced")
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            self._admit(key)
+            with self._lock:
+                self._running += 1
+            try:
+                call.result = compute()
+            finally:
+                self._slots.release()
+                with self._lock:
+                    self._running -= 1
+            with self._lock:
+                self._count(key, "computed")
+        except Exception as e:
+            call.error = e
+            if not isinstance(e, Overloaded):
+                with self._lock:
+                    self._count(key, "failed")
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def hold(self, route: str):
+        """Take a slot for work that cannot be shared, such as a streamed page; returns its release().
+
+        Admission is the same as for a new run (queue, then Overloaded).
+        release() is idempotent, so it can be tied to the response closing.
+        """
+        key = (route,)
+        self._admit(key)
+        with self._lock:
+            self._running += 1
+            self._count(key, "streamed")
+        released = threading.Event()
+
+        def release():
+            with self._lock:
+                if released.is_set():
+                    return
+                released.set()
+                self._running -= 1
+            self._slots.release()
+        return release
+
+    def stats(self):
+        with self._lock:
+            return {
+                "running": self._running,
+                "queued": self._queued,
+                "max_concurrent": self._max_concurrent,
+                "max_queued": self._max_queued,
+                "routes": {route: dict(counts) for route, counts in self._counts.items()},
+            }
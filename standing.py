@@ -0,0 +1,156 @@
+"""Cohort standing for the semester databases.
+
+Every subject row carries the student's percentile and z-score within that
+subject (marks.subject_percentile / subject_zscore); student_standing
+holds the same for each student's semester percentage. Both are computed
+with vectorized pandas ranking inside a writer job, so they are committed
+like any other write.
+
+Standing is relative to the cohort, so one changed mark can move every
+other student's percentile. A refresh therefore re-ranks each changed
+subject in full, and the whole semester when any of the changed students'
+percentage or subject count moved: one GROUP BY over the marks and a rank
+over the students. Only rows whose values actually changed are written.
+When no percentage moved (a renamed student, a re-saved form), the
+semester ranking is skipped.
+"""
+import threading
+
+def _percentile(grouped):
+    """Share of the cohort scoring at or below each student"""
+    return (grouped.rank(method="max", pct=True) * 100).round(2)
+
+def _zscore(values, mean, std):
+    # A cohort where everyone has the same mark has no spread: z = 0
+    return ((values - mean) / std.where(std > 0)).fillna(0.0).where(values.notna()).round(3)
+
+def _nullable(value):
+    return None if value != value else float(value)
+
+def _differs(new, old):
+    """Element-wise new != old, with NaN equal to NaN"""
+    return ~((new == old) | (new.isna() & old.isna()))
+
+
+def stale_subjects(conn):
+    """Subjects with marks that have no standing yet"""
+    return {row[0] for row in conn.execute(
+        "SELECT DISTINCT subject FROM students WHERE subject_percentile IS NULL AND final_total100 IS NOT NULL")}
+
+
+def refresh_subjects(conn, subjects):
+    """Recompute subject_percentile/subject_zscore over the given subjects; returns the rows written"""
+    import pandas as pd
+    subjects = list(subjects)
+    if not subjects:
+        return 0
+    placeholders = ", ".join("?" * len(subjects))
+    df = pd.read_sql_query(
+        f"SELECT id, subject, final_total100, subject_percentile AS old_percentile, subject_zscore AS old_zscore "
+        f"FROM students WHERE subject IN ({placeholders})", conn, params=subjects)
+    if df.empty:
+        return 0
+    grouped = df.groupby("subject")["final_total100"]
+    df["percentile"] = _percentile(grouped)
+    df["zscore"] = _zscore(df["final_total100"], grouped.transform("mean"), grouped.transform("std", ddof=0))
+    changed = df[_differs(df["percentile"], df["old_percentile"]) | _differs(df["zscore"], df["old_zscore"])]
+    conn.executemany(
+        "UPDATE marks SET subject_percentile = ?, subject_zscore = ? WHERE id = ?",
+        ((_nullable(p), _nullable(z), int(i)) for i, p, z in zip(changed["id"], changed["percentile"], changed["zscore"])),
+    )
+    return len(changed)
+
+
+STANDING_SQL = """
+    SELECT UPPER(usn) AS usn, COUNT(*) AS subject_count, AVG(final_total100) AS percentage
+    FROM students WHERE usn IS NOT NULL {scope} GROUP BY UPPER(usn)
+"""
+
+
+def percentages_moved(conn, usns) -> bool:
+    """Whether any of these students' subject count or percentage differs from student_standing"""
+    usns = sorted({usn.upper() for usn in usns if usn is not None})
+    if not usns:
+        return False
+    placeholders = ", ".join("?" * len(usns))
+    current = {usn: (count, round(percentage, 2) if percentage is not None else None)
+               for usn, count, percentage in conn.execute(
+                   STANDING_SQL.format(scope=f"AND UPPER(usn) IN ({placeholders})"), usns)}
+    stored = {row[0]: row[1:] for row in conn.execute(
+        f"SELECT usn, subject_count, percentage FROM student_standing WHERE usn IN ({placeholders})", usns)}
+    return current != stored
+
+
+def refresh_semester(conn):
+    """Re-rank every student's semester percentage; writes only the student_standing rows that changed"""
+    import pandas as pd
+    df = pd.read_sql_query(STANDING_SQL.format(scope=""), conn)
+    percentage = df["percentage"]
+    df["percentile"] = _percentile(percentage)
+    df["zscore"] = _zscore(percentage, percentage.mean(), pd.Series(percentage.std(ddof=0), index=df.index))
+    stored = {row[0]: row[1:] for row in conn.execute(
+        "SELECT usn, subject_count, percentage, percentile, zscore FROM student_standing")}
+    rows = [(u, int(n), _nullable(round(p, 2)), _nullable(pc), _nullable(z))
+            for u, n, p, pc, z in zip(df["usn"], df["subject_count"], percentage, df["percentile"], df["zscore"])]
+    changed = [row for row in rows if stored.get(row[0]) != row[1:]]
+    conn.executemany(
+        "INSERT INTO student_standing (usn, subject_count, percentage, percentile, zscore) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(usn) DO UPDATE SET subject_count = excluded.subject_count, percentage = excluded.percentage, "
+        "percentile = excluded.percentile, zscore = excluded.zscore",
+        changed,
+    )
+    gone = set(stored) - set(df["usn"])
+    conn.executemany("DELETE FROM student_standing WHERE usn = ?", ((usn,) for usn in gone))
+    return len(changed) + len(gone)
+
+
+class StandingRefresher:
+    """Coalesces changed subjects and students per semester into one refresh job on that semester's WriteQueue"""
+
+    def __init__(self, write_queues):
+        self._queues = write_queues
+        # sem -> (changed subjects, changed USNs)
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def mark_dirty(self, sem: int, subjects, usns=()):
+        with self._lock:
+            scheduled = sem in self._pending
+            pending_subjects, pending_usns = self._pending.setdefault(sem, (set(), set()))
+            pending_subjects.update(subjects)
+            pending_usns.update(usns)
+        if not scheduled:
+            return self._queues[sem].submit(lambda conn: self._refresh(conn, sem))
+
+    def refresh_stale(self, sem: int):
+        """Queue a job that fills in standing missing after a migration or an interrupted refresh"""
+        return self._queues[sem].submit(lambda conn: self._refresh_stale(conn, sem))
+
+    def apply_changes(self, changes):
+        """ChangeFeed callback"""
+        by_sem = {}
+        for change in changes:
+            subjects, usns = by_sem.setdefault(change.semester, (set(), set()))
+            subjects.add(change.subject)
+            usns.add(change.usn)
+        for sem, (subjects, usns) in by_sem.items():
+            self.mark_dirty(sem, subjects, usns)
+
+    def _refresh(self, conn, sem: int):
+        with self._lock:
+            subjects, usns = self._pending.pop(sem, (set(), set()))
+        subjects.discard(None)
+        rows = refresh_subjects(conn, subjects)
+        if percentages_moved(conn, usns):
+            refresh_semester(conn)
+        return rows
+
+    def _refresh_stale(self, conn, sem: int):
+        subjects = stale_subjects(conn)
+        missing = conn.execute(
+            "SELECT EXISTS (SELECT 1 FROM students) AND NOT EXISTS (SELECT 1 FROM student_standing)").fetchone()[0]
+        if not subjects and not missing:
+            return 0
+        rows = refresh_subjects(conn, subjects)
+        refresh_semester(conn)
+        return rows
@@ -0,0 +1,75 @@
+"""Student search by USN prefix and name across the semester databases.
+
+Each semester DB has an FTS5 index over student(usn, name) (migration 10).
+Triggers on student keep it in step with every write path: inserts through
+the students view, bulk imports and renames. A student stays in student
+after their last mark row is deleted, so only students with marks are
+returned, which makes deletes take effect immediately too.
+
+Every word of the query must prefix-match a word of the USN or name.
+Matches are ranked exact USN first, then USN prefix, then by bm25 with
+the USN weighted above the name. Students found in several semesters are
+merged into one result listing those semesters.
+"""
+import re
+import sqlite3
+
+SEARCH_LIMIT = 20
+# bm25 column weights: usn, name
+USN_WEIGHT, NAME_WEIGHT = 4.0, 1.0
+
+SEARCH_SQL = f"""
+    SELECT s.usn, s.name,
+           CASE WHEN UPPER(s.usn) = :usn THEN 0
+                WHEN substr(UPPER(s.usn), 1, length(:usn)) = :usn THEN 1
+                ELSE 2 END AS tier,
+           bm25(student_search, {USN_WEIGHT}, {NAME_WEIGHT}) AS score
+    FROM student_search
+    JOIN student AS s ON s.id = student_search.rowid
+    WHERE student_search MATCH :match
+      AND EXISTS (SELECT 1 FROM marks AS m WHERE m.student_id = s.id)
+    ORDER BY tier, score
+    LIMIT :limit
+"""
+
+
+def match_expression(query: str):
+    """FTS5 query: every word of `query` as a quoted prefix; None when it has no words"""
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+class StudentSearch:
+    def __init__(self, db_path_for_sem, semesters=(1, 2, 3, 4)):
+        self._db_path = db_path_for_sem
+        self._semesters = tuple(semesters)
+
+    def _search_semester(self, sem: int, params):
+        conn = sqlite3.connect(self._db_path(sem))
+        try:
+            return conn.execute(SEARCH_SQL, params).fetchall()
+        except sqlite3.OperationalError:
+            return []  # DB not migrated yet (no student_search)
+        finally:
+            conn.close()
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT):
+        """[{usn, name, semesters}] best match first"""
+        match = match_expression(query or '')
+        if match is None:
+            return []
+        params = {"match": match, "usn": query.strip().upper(), "limit": limit}
+        found = {}
+        for sem in self._semesters:
+            for usn, name, tier, score in self._search_semester(sem, params):
+                hit = found.get(usn.upper())
+                if hit is None:
+                    found[usn.upper()] = hit = {"usn": usn, "name": name, "semesters": [], "rank": (tier, score)}
+                hit["semesters"].append(sem)
+                hit["rank"] = min(hit["rank"], (tier, score))
+        results = sorted(found.values(), key=lambda hit: hit["rank"])[:limit]
+        for hit in results:
+            del hit["rank"]
+        return results
@@ -0,0 +1,90 @@
+"""Compacting change_log never drops changes a lagging consumer has not acknowledged.
+
+    python -m pytest test_changelog.py
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import changelog
+import migrations
+
+INSERT_SQL = "INSERT INTO students (usn, name, subject, cie1) VALUES (?, 'Feed', 'Maths', 10)"
+
+
+class CompactionTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory(prefix="eduboard-test-")
+        self.path = os.path.join(self.tmp.name, "eduboard_sem1.db")
+        migrations.migrate(self.path)
+        self.feed = changelog.ChangeFeed(lambda sem: self.path, semesters=(1,))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, *usns):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                conn.executemany(INSERT_SQL, [(usn,) for usn in usns])
+        finally:
+            conn.close()
+
+    def logged(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            return [row[0] for row in conn.execute("SELECT usn FROM change_log ORDER BY version")]
+        finally:
+            conn.close()
+
+    def test_external_consumer_behind(self):
+        seen = []
+        self.feed.subscribe("fast", lambda changes: seen.extend(c.usn for c in changes))
+        self.feed.register("reporting")
+        self.write("A1", "A2")
+        self.feed.notify(1)
+        self.write("A3")
+        self.feed.notify(1)
+        self.assertEqual(seen, ["A1", "A2", "A3"])
+        # "fast" acknowledged everything, but "reporting" has read nothing yet
+        self.assertEqual(self.logged(), ["A1", "A2", "A3"])
+        changes = self.feed.changes_since(1, self.feed.consumers(1)[0][1])
+        self.assertEqual([c.usn for c in changes], ["A1", "A2", "A3"])
+
+        self.feed.ack("reporting", 1, changes[1].version)
+        self.feed.compact(1)
+        self.assertEqual(self.logged(), ["A3"])
+        self.feed.ack("reporting", 1, changes[-1].version)
+        self.feed.compact(1)
+        self.assertEqual(self.logged(), [])
+
+    def test_failing_consumer_keeps_its_changes(self):
+        seen, failing = [], {"on": True}
+
+        def flaky(changes):
+            if failing["on"]:
+                raise RuntimeError("consumer down")
+            seen.extend(c.usn for c in changes)
+
+        self.feed.subscribe("fast", lambda changes: None)
+        self.feed.subscribe("flaky", flaky)
+        self.write("B1")
+        self.feed.notify(1)
+        self.write("B2", "B3")
+        self.feed.notify(1)
+        self.assertEqual(self.logged(), ["B1", "B2", "B3"])
+
+        failing["on"] = False
+        self.feed.notify(1)
+        # Redelivered in order, with nothing skipped, then compacted away
+        self.assertEqual(seen, ["B1", "B2", "B3"])
+        self.assertEqual(self.logged(), [])
+
+    def test_unknown_external_consumer(self):
+        with self.assertRaises(changelog.UnknownConsumer):
+            self.feed.ack("nobody", 1, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+"""Every change-feed consumer in app.py follows adds, updates and deletes.
+
+app.py is imported once, in this process, against copies of the shipped
+semester DBs in a scratch EDUBOARD_DATA_DIR (its data directory is read at
+import time). Writes go through the app's write queues; settle() waits
+until the feed has reached every consumer and their writer jobs have run.
+
+    python -m pytest test_consumers.py
+"""
+import importlib
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+import grading
+import importer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SEM = 1
+
+
+class ConsumersTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        if "app" in sys.modules:
+            raise unittest.SkipTest("app.py was already imported against another data directory")
+        cls.tmp = tempfile.TemporaryDirectory(prefix="eduboard-test-")
+        for sem in (1, 2, 3, 4):
+            shutil.copy(os.path.join(BASE_DIR, f"eduboard_sem{sem}.db"), cls.tmp.name)
+        os.environ["EDUBOARD_DATA_DIR"] = cls.tmp.name
+        os.environ["EDUBOARD_FAST_START"] = "1"
+        cls.app = importlib.import_module("app")
+        cls.app.ensure_backfill_queued()
+        cls.settle()
+        conn = sqlite3.connect(cls.app.get_db_path(SEM))
+        try:
+            cls.subjects = [row[0] for row in conn.execute("SELECT name FROM subject ORDER BY name LIMIT 3")]
+        finally:
+            conn.close()
+
+    @classmethod
+    def tearDownClass(cls):
+        sys.modules.pop("app", None)
+        os.environ.pop("EDUBOARD_DATA_DIR", None)
+        os.environ.pop("EDUBOARD_FAST_START", None)
+        cls.tmp.cleanup()
+
+    @classmethod
+    def settle(cls):
+        # Commit -> feed -> consumers queue jobs -> those commit; a no-op job runs after them
+        for _ in range(2):
+            for queue in cls.app.write_queues.values():
+                queue.notified()
+                queue.run(lambda conn: None)
+                queue.notified()
+
+    def write(self, job):
+        result = self.app.write_queues[SEM].run(job)
+        self.settle()
+        return result
+
+    def add(self, usn: str, name: str, marks):
+        """One row per subject with the same (cie1, cie2, a1, a2, see)"""
+        rows = grading.POLICY.mark_rows([(usn, name, subject, *marks) for subject in self.subjects])
+        self.assertEqual(self.write(lambda conn: importer.insert_marks_rows(conn, rows)), len(rows))
+
+    def delete(self, usn: str):
+        self.write(lambda conn: conn.execute(
+            "DELETE FROM marks WHERE id IN (SELECT id FROM students WHERE UPPER(usn) = ?)", (usn,)))
+
+    def query(self, sql, *params):
+        conn = sqlite3.connect(self.app.get_db_path(SEM))
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def standing(self, usn: str):
+        rows = self.query("SELECT percentage FROM student_standing WHERE usn = ?", usn)
+        return rows[0][0] if rows else None
+
+    def flags(self, usn: str):
+        return {row[0] for row in self.query("SELECT rule FROM risk_flags WHERE usn = ?", usn)}
+
+    def cube_count(self):
+        return self.app.grade_cube.query(semester=SEM)[0]["count"]
+
+    def component_rows(self):
+        return self.app.component_analytics.get(SEM, self.subjects[0])["rows"]
+
+    def found(self, query: str):
+        return [(hit["usn"], hit["name"]) for hit in self.app.student_finder.search(query)]
+
+    def warm(self, usn: str):
+        """Load every in-process cache first, so the feed has something to update"""
+        self.app.student_usns.contains(SEM, usn)
+        self.app.get_student_history(usn)
+        return self.cube_count(), self.component_rows()
+
+    def test_add(self):
+        usn = "1TC99AD001"
+        cells, rows = self.warm(usn)
+        self.assertIsNone(self.app.get_student_history(usn))
+        self.add(usn, "Quillon Addtest", (5, 5, 5, 5, 10))
+
+        self.assertTrue(self.app.student_usns.contains(SEM, usn))
+        history = self.app.get_student_history(usn)
+        self.assertEqual(history["semesters"][0]["subject_count"], len(self.subjects))
+        self.assertIsNotNone(self.standing(usn))
+        self.assertEqual(len(self.query("SELECT 1 FROM students WHERE usn = ? AND subject_percentile IS NOT NULL",
+                                        usn)), len(self.subjects))
+        self.assertIn("multiple_fails", self.flags(usn))
+        self.assertEqual(self.cube_count(), cells + len(self.subjects))
+        self.assertEqual(self.component_rows(), rows + 1)
+        self.assertEqual(self.found("quillon"), [(usn, "Quillon Addtest")])
+
+    def test_update(self):
+        usn = "1TC99UP001"
+        self.add(usn, "Quintus Uptest", (5, 5, 5, 5, 10))
+        cells, rows = self.warm(usn)
+        failing = self.app.get_student_history(usn)["semesters"][0]["percentage"]
+        self.assertIn("multiple_fails", self.flags(usn))
+
+        self.write(lambda conn: conn.execute(
+            "UPDATE students SET cie1 = 50, cie2 = 50, assignment1marks = 50, assignment2marks = 50, see = 100, "
+            "name = 'Quintus Renamed' WHERE usn = ?", (usn,)))
+
+        self.assertTrue(self.app.student_usns.contains(SEM, usn))
+        history = self.app.get_student_history(usn)
+        self.assertEqual(history["semesters"][0]["percentage"], 100.0)
+        self.assertNotEqual(failing, 100.0)
+        self.assertEqual(self.standing(usn), 100.0)
+        self.assertNotIn("multiple_fails", self.flags(usn))
+        self.assertEqual(self.cube_count(), cells)
+        self.assertGreaterEqual(self.app.grade_cube.query(semester=SEM, subject=self.subjects[0], grade="O",
+                                                          band="S")[0]["count"], 1)
+        self.assertEqual(self.component_rows(), rows)
+        self.assertEqual(self.app.component_analytics.get(SEM, self.subjects[0])["distributions"]["see"]["max"], 100.0)
+        self.assertEqual(self.found("quintus"), [(usn, "Quintus Renamed")])
+
+    def test_delete(self):
+        usn = "1TC99DL001"
+        self.add(usn, "Quorra Deltest", (5, 5, 5, 5, 10))
+        cells, rows = self.warm(usn)
+        self.assertIsNotNone(self.app.get_student_history(usn))
+
+        self.delete(usn)
+
+        self.assertFalse(self.app.student_usns.contains(SEM, usn))
+        self.assertIsNone(self.app.get_student_history(usn))
+        self.assertIsNone(self.standing(usn))
+        self.assertEqual(self.flags(usn), set())
+        self.assertEqual(self.cube_count(), cells - len(self.subjects))
+        self.assertEqual(self.component_rows(), rows - 1)
+        self.assertEqual(self.found("quorra"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
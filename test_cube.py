@@ -0,0 +1,108 @@
+"""GradeCube answers match a direct aggregation over the students view.
+
+Writes go through the semester's WriteQueue and reach the cube through the
+change feed, as in app.py; the expected cells are recomputed from scratch
+with SQL plus the grading policy's bands after each write.
+
+    python -m pytest test_cube.py
+"""
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from collections import defaultdict
+
+import changelog
+import cube
+import grading
+import importer
+import migrations
+import write_queue
+
+SUBJECTS = ["Maths", "Physics", "Chemistry"]
+
+
+def raw_rows(usns, rng):
+    return [(usn, f"Student {usn}", subject, *(rng.randint(5, 50) for _ in range(4)), rng.randint(10, 100))
+            for usn in usns for subject in SUBJECTS]
+
+
+class GradeCubeTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory(prefix="eduboard-test-")
+        self.path = os.path.join(self.tmp.name, "eduboard_sem1.db")
+        migrations.migrate(self.path)
+        self.rng = random.Random(7)
+        db_path = lambda sem: self.path
+        feed = changelog.ChangeFeed(db_path, semesters=(1,))
+        self.queue = write_queue.WriteQueue(self.path, on_commit=lambda batches: feed.notify(1))
+        self.cube = cube.GradeCube({1: self.queue}, db_path, semesters=(1,))
+        feed.subscribe("cube", self.cube.apply_changes)
+        self.write(lambda conn: importer.insert_marks_rows(
+            conn, grading.POLICY.mark_rows(raw_rows([f"1CB{i:03d}" for i in range(40)], self.rng))))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, job):
+        result = self.queue.run(job)
+        # The feed queues band moves on the writer; a second job runs after them
+        self.queue.notified()
+        self.queue.run(lambda conn: None)
+        self.queue.notified()
+        return result
+
+    def expected(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            bands = {usn: grading.POLICY.band(avg) for usn, avg in conn.execute(
+                "SELECT UPPER(usn), AVG(COALESCE(final_total100, 0)) FROM students GROUP BY UPPER(usn)")}
+            cells = defaultdict(lambda: [0, 0.0, 0.0, 0.0, 0.0])
+            for usn, subject, grade, *marks in conn.execute(
+                    "SELECT UPPER(usn), subject, grade, final_total100, cie_total50, ass_total50, see_total50 "
+                    "FROM students"):
+                cell = cells[(1, subject, grade, bands[usn])]
+                cell[0] += 1
+                for i, mark in enumerate(marks, 1):
+                    cell[i] += mark or 0
+            return cells
+        finally:
+            conn.close()
+
+    def assert_matches(self):
+        expected = self.expected()
+        actual = {(row["semester"], row["subject"], row["grade"], row["band"]): row
+                  for row in self.cube.query(by=cube.DIMENSIONS)}
+        self.assertEqual(set(actual), set(expected))
+        for key, (count, *sums) in expected.items():
+            self.assertEqual(actual[key]["count"], count, key)
+            for measure, total in zip(cube.SUMMED, sums):
+                self.assertAlmostEqual(actual[key][measure], total, delta=0.011, msg=(key, measure))
+        total, = self.cube.query()
+        self.assertEqual(total["count"], sum(cell[0] for cell in expected.values()))
+
+    def test_initial_rows(self):
+        self.assert_matches()
+
+    def test_insert(self):
+        rows = grading.POLICY.mark_rows(raw_rows(["1CB900", "1CB901"], self.rng))
+        # An extra subject for an existing student moves their band
+        rows += grading.POLICY.mark_rows([("1CB000", "Student 1CB000", "Biology", 50, 50, 50, 50, 100)])
+        self.assertEqual(self.write(lambda conn: importer.insert_marks_rows(conn, rows)), len(rows))
+        self.assert_matches()
+
+    def test_delete(self):
+        self.write(lambda conn: conn.execute("DELETE FROM marks WHERE id IN "
+                                             "(SELECT id FROM students WHERE usn IN ('1CB001', '1CB002'))"))
+        self.write(lambda conn: conn.execute("DELETE FROM marks WHERE id = "
+                                             "(SELECT id FROM students WHERE usn = '1CB003' AND subject = 'Maths')"))
+        self.assert_matches()
+
+    def test_update(self):
+        self.write(lambda conn: conn.execute("UPDATE students SET see = 100, cie1 = 50 WHERE usn = '1CB004'"))
+        self.assert_matches()
+
+
+if __name__ == "__main__":
+    unittest.main()
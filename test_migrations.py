@@ -0,0 +1,102 @@
+"""Migrating a copy of each shipped semester DB keeps every mark row.
+
+The shipped eduboard_sem<N>.db files are at schema version 0 (a plain
+students table, some with the old final_total150 column). Each is copied
+to a scratch directory and migrated, in one go and in two steps through
+the last wide-table version.
+
+    python -m pytest test_migrations.py
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import migrations
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SHIPPED = [os.path.join(BASE_DIR, f"eduboard_sem{sem}.db") for sem in (1, 2, 3, 4)]
+# Version 8 is the last with a students table; 9 moves the rows behind the view
+LAST_WIDE_VERSION = 8
+
+SNAPSHOT_SQL = """
+    SELECT COUNT(*), COUNT(DISTINCT UPPER(usn)), COUNT(DISTINCT subject),
+           SUM(cie1), SUM(cie2), SUM(assignment1marks), SUM(assignment2marks), SUM(see)
+    FROM students
+"""
+
+
+def snapshot(path: str):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute(SNAPSHOT_SQL).fetchone()
+    finally:
+        conn.close()
+
+
+def user_version(path: str) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+class ShippedDbMigrationTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory(prefix="eduboard-test-")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def copy(self, shipped: str) -> str:
+        path = os.path.join(self.tmp.name, os.path.basename(shipped))
+        shutil.copy(shipped, path)
+        return path
+
+    def test_upgrade_keeps_rows(self):
+        for shipped in SHIPPED:
+            with self.subTest(db=os.path.basename(shipped)):
+                path = self.copy(shipped)
+                before = snapshot(path)
+                self.assertGreater(before[0], 0)
+                self.assertEqual(migrations.migrate(path), [m[0] for m in migrations.MIGRATIONS])
+                self.assertEqual(user_version(path), migrations.SCHEMA_VERSION)
+                self.assertEqual(snapshot(path), before)
+                # Already current: nothing to apply, nothing changes
+                self.assertEqual(migrations.migrate(path), [])
+                self.assertEqual(snapshot(path), before)
+
+    def test_upgrade_in_steps_keeps_rows(self):
+        for shipped in SHIPPED:
+            with self.subTest(db=os.path.basename(shipped)):
+                path = self.copy(shipped)
+                before = snapshot(path)
+                migrations.migrate(path, LAST_WIDE_VERSION)
+                self.assertEqual(user_version(path), LAST_WIDE_VERSION)
+                self.assertEqual(snapshot(path), before)
+                migrations.migrate(path)
+                self.assertEqual(snapshot(path), before)
+
+    def test_normalized_rows_match_the_originals(self):
+        shipped = SHIPPED[0]
+        columns = ["id", "usn", "name", "subject"] + migrations.MARKS_VALUE_COLUMNS + ["final_total100", "grade"]
+        conn = sqlite3.connect(shipped)
+        try:
+            original = sorted(conn.execute(f"SELECT {', '.join(columns)} FROM students").fetchall())
+        finally:
+            conn.close()
+        path = self.copy(shipped)
+        migrations.migrate(path)
+        conn = sqlite3.connect(path)
+        try:
+            self.assertEqual(migrations.object_type(conn, "students"), "view")
+            migrated = sorted(conn.execute(f"SELECT {', '.join(columns)} FROM students").fetchall())
+        finally:
+            conn.close()
+        self.assertEqual(migrated, original)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""Importing app.py must work in both start modes.
+
+EDUBOARD_FAST_START=0 initialises everything at import time, so a name used
+by ensure_db_ready but defined further down app.py only fails there. With
+EDUBOARD_FAST_START=1 a student login must not pay for pandas. Each
+import runs in a fresh interpreter against an empty scratch data directory.
+
+    python -m pytest test_startup.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SNIPPET = """
+import os, sys, jinja2
+sys.path.insert(0, {base_dir!r})
+import app
+app.app.jinja_loader = jinja2.FileSystemLoader({base_dir!r})
+client = app.app.test_client()
+fast = os.environ["EDUBOARD_FAST_START"] == "1"
+assert client.get('/student_login').status_code == 200
+# The login form opens no DB; its POST migrates them but leaves the pandas-backed backfill alone
+assert not fast or not os.path.exists(app.get_db_path(1))
+assert client.post('/student_login', data={{'usn': '1XX00XX000', 'semester': '1'}}).status_code == 200
+assert all(os.path.exists(app.get_db_path(sem)) for sem in (1, 2, 3, 4))
+assert not fast or "pandas" not in sys.modules
+"""
+
+
+class StartupTest(unittest.TestCase):
+    def import_app(self, fast_start: str):
+        with tempfile.TemporaryDirectory(prefix="eduboard-test-") as data_dir:
+            env = dict(os.environ, EDUBOARD_DATA_DIR=data_dir, EDUBOARD_FAST_START=fast_start)
+            result = subprocess.run([sys.executable, "-c", SNIPPET.format(base_dir=BASE_DIR)],
+                                    env=env, cwd=data_dir, capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_eager_start(self):
+        self.import_app("0")
+
+    def test_fast_start(self):
+        self.import_app("1")
+
+
+if __name__ == "__main__":
+    unittest.main()
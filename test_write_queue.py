@@ -0,0 +1,100 @@
+"""Concurrent writers through WriteQueue lose nothing and never see "database is locked".
+
+Threads share one queue, as app.py's request handlers do, while a second
+queue on the same file stands in for another process (the ingest daemon)
+and readers poll on their own connections.
+
+    python -m pytest test_write_queue.py
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import migrations
+import write_queue
+
+INSERT_SQL = """
+    INSERT INTO students (usn, name, subject, cie1, cie2, cie_total50, assignment1marks, assignment2marks,
+                          ass_total50, see, see_total50, final_total100, grade)
+    VALUES (?, 'Writer', ?, 40, 40, 20, 40, 40, 20, 80, 40, 80, 'A')
+"""
+
+WRITERS = 16
+WRITES = 40
+
+
+class ConcurrentWritersTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory(prefix="eduboard-test-")
+        self.path = os.path.join(self.tmp.name, "eduboard_sem1.db")
+        migrations.migrate(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def count(self, sql, *params):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(sql, params).fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_no_lost_writes(self):
+        batches = {"app": [], "daemon": []}
+        queues = {name: write_queue.WriteQueue(self.path, on_commit=sizes.extend) for name, sizes in batches.items()}
+        errors = []
+        stop = threading.Event()
+
+        def writer(name, t):
+            for i in range(WRITES):
+                try:
+                    queues[name].run(lambda conn, usn=f"W{t:03d}{i:05d}": conn.execute(INSERT_SQL, (usn, name)))
+                except Exception as e:
+                    errors.append(e)
+
+        def reader():
+            conn = sqlite3.connect(self.path)
+            try:
+                while not stop.is_set():
+                    conn.execute("SELECT COUNT(*) FROM students").fetchone()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                conn.close()
+
+        readers = [threading.Thread(target=reader) for _ in range(2)]
+        writers = [threading.Thread(target=writer, args=("app" if t % 4 else "daemon", t)) for t in range(WRITERS)]
+        for th in readers + writers:
+            th.start()
+        for th in writers:
+            th.join()
+        stop.set()
+        for th in readers:
+            th.join()
+        for q in queues.values():
+            q.notified()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.count("SELECT COUNT(*) FROM students"), WRITERS * WRITES)
+        self.assertEqual(self.count("SELECT COUNT(DISTINCT usn) FROM students"), WRITERS * WRITES)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM students WHERE subject = 'daemon'"), WRITERS // 4 * WRITES)
+        # on_commit saw every job exactly once, one entry per committed batch
+        self.assertEqual(sum(batches["app"]), (WRITERS - WRITERS // 4) * WRITES)
+        self.assertEqual(sum(batches["daemon"]), WRITERS // 4 * WRITES)
+        self.assertTrue(all(size > 0 for sizes in batches.values() for size in sizes))
+
+    def test_failing_job_keeps_the_rest_of_its_batch(self):
+        queue = write_queue.WriteQueue(self.path)
+        futures = [queue.submit(lambda conn, i=i: conn.execute(INSERT_SQL, (f"F{i:03d}", "ok"))) for i in range(10)]
+        futures.insert(5, queue.submit(lambda conn: conn.execute("INSERT INTO no_such_table VALUES (1)")))
+        with self.assertRaises(sqlite3.OperationalError):
+            futures[5].result(30)
+        for future in futures[:5] + futures[6:]:
+            future.result(30)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM students"), 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
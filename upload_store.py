@@ -0,0 +1,194 @@
+"""Uploaded spreadsheets: hashed while they stream in, retained by content hash.
+
+The request body of an upload is written into a HashingSpool, which keeps it
+in memory up to a size threshold, spills to a temp file above it, and hashes
+the bytes as they arrive. Handlers parse that stream directly; nothing is
+written to UPLOAD_FOLDER before parsing.
+
+Copies of successfully imported sheets are kept as <sha256><ext> and listed
+in catalog.db next to them, one row per (target, sha256), where target is
+"sem1" or "sem1/<subject>". The catalog answers "was this exact file
+imported here before?" with one index probe, and pruning old copies reads
+the catalog instead of listing and stat-ing the folder. The folder and
+catalog are created on the first upload, not when the app is imported.
+
+"Imported before" only holds while the rows are still there: forget()
+drops the entries of a semester's subjects once rows of them are deleted
+(the app calls it from the change feed), so the same sheet can be imported
+again after a delete.
+"""
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+# Retained copies per target
+UPLOAD_KEEP_PER_TARGET = 10
+COPY_CHUNK_BYTES = 1 << 20
+
+
+class HashingSpool(tempfile.SpooledTemporaryFile):
+    """SpooledTemporaryFile that keeps a SHA-256 of everything written to it"""
+
+    def __init__(self, max_size: int):
+        super().__init__(max_size=max_size, mode="w+b")
+        self.sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.sha256.update(data)
+        return super().write(data)
+
+
+def content_hash(stream) -> str:
+    """Hex SHA-256 of an upload stream, computed while spooling when possible"""
+    if isinstance(stream, HashingSpool):
+        return stream.sha256.hexdigest()
+    digest = hashlib.sha256()
+    stream.seek(0)
+    for chunk in iter(lambda: stream.read(COPY_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()
+
+
+class UploadCatalog:
+    def __init__(self, folder: str, keep: int = UPLOAD_KEEP_PER_TARGET):
+        self.folder = folder
+        self.keep = keep
+        self.path = os.path.join(folder, "catalog.db")
+        self._ready = False
+        self._lock = threading.Lock()
+
+    def _ensure(self):
+        """Create the folder and catalog on first use"""
+        if self._ready:
+            return
+        with self._lock:
+            if not self._ready:
+                self._create()
+                self._ready = True
+
+    def _create(self):
+        os.makedirs(self.folder, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS uploads(
+                    id INTEGER PRIMARY KEY,
+                    target TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    stored_as TEXT NOT NULL,
+                    filename TEXT,
+                    size INTEGER,
+                    inserted INTEGER,
+                    skipped INTEGER,
+                    uploaded_at REAL NOT NULL DEFAULT (julianday('now')),
+                    UNIQUE (target, sha256)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_uploads_sha256 ON uploads(sha256)")
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _connect(self):
+        self._ensure()
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def find(self, target: str, sha256: str):
+        """The earlier import of these exact bytes into target, or None"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT filename, inserted, skipped, datetime(uploaded_at, 'localtime') AS uploaded_at "
+                "FROM uploads WHERE target = ? AND sha256 = ?", (target, sha256)).fetchone()
+        finally:
+            conn.close()
+
+    def find_in_semester(self, semester: int, sha256: str):
+        """An earlier import of these bytes into any target of the semester, or None"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT target, filename, inserted, skipped, datetime(uploaded_at, 'localtime') AS uploaded_at "
+                "FROM uploads WHERE sha256 = ? AND (target = ? OR target LIKE ?)",
+                (sha256, f"sem{semester}", f"sem{semester}/%")).fetchone()
+        finally:
+            conn.close()
+
+    def retain(self, target: str, sha256: str, filename: str, stream, inserted: int, skipped: int):
+        """Keep a copy of the imported stream and record it; older copies of target beyond keep are dropped"""
+        self._ensure()
+        ext = os.path.splitext(filename)[1].lower()
+        stored_as = f"{sha256}{ext}"
+        path = os.path.join(self.folder, stored_as)
+        if not os.path.exists(path):
+            # Identical bytes already on disk (from another target) are shared
+            fd, tmp = tempfile.mkstemp(dir=self.folder, suffix=".part")
+            try:
+                with os.fdopen(fd, "wb") as out:
+                    stream.seek(0)
+                    shutil.copyfileobj(stream, out, COPY_CHUNK_BYTES)
+                os.replace(tmp, path)
+            except OSError:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+                return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO uploads (target, sha256, stored_as, filename, size, inserted, skipped) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(target, sha256) DO UPDATE SET "
+                    "filename = excluded.filename, inserted = excluded.inserted, skipped = excluded.skipped, "
+                    "uploaded_at = excluded.uploaded_at",
+                    (target, sha256, stored_as, filename, os.path.getsize(path), inserted, skipped))
+                expired = conn.execute(
+                    "SELECT id, sha256, stored_as FROM uploads WHERE target = ? "
+                    "ORDER BY uploaded_at DESC, id DESC LIMIT -1 OFFSET ?", (target, self.keep)).fetchall()
+                orphans = self._drop(conn, expired)
+        finally:
+            conn.close()
+        self._remove(orphans)
+
+    def forget(self, semester: int, subjects) -> int:
+        """Drop the entries of whole-semester and subject imports that covered deleted rows; returns entries dropped"""
+        if not self._ready and not os.path.exists(self.path):
+            return 0
+        subjects = list(subjects)
+        if not subjects:
+            return 0
+        conn = self._connect()
+        try:
+            with conn:
+                # A whole-semester sheet may have held any subject
+                rows = conn.execute(
+                    f"SELECT id, sha256, stored_as FROM uploads WHERE target = ? "
+                    f"OR target IN ({', '.join('?' * len(subjects))})",
+                    (f"sem{semester}", *(f"sem{semester}/{subject}" for subject in subjects))).fetchall()
+                orphans = self._drop(conn, rows)
+        finally:
+            conn.close()
+        self._remove(orphans)
+        return len(rows)
+
+    @staticmethod
+    def _drop(conn, rows):
+        """Delete catalog rows; returns the stored copies no other row refers to"""
+        conn.executemany("DELETE FROM uploads WHERE id = ?", [(row["id"],) for row in rows])
+        return [row["stored_as"] for row in rows
+                if conn.execute("SELECT 1 FROM uploads WHERE sha256 = ? AND stored_as = ?",
+                                (row["sha256"], row["stored_as"])).fetchone() is None]
+
+    def _remove(self, stored_copies):
+        for stored in stored_copies:
+            try:
+                os.remove(os.path.join(self.folder, stored))
+            except OSError:
+                pass  # already gone, or held open by another program
@@ -0,0 +1,66 @@
+"""In-memory USN membership per semester.
+
+student_login only needs to know whether a USN has any rows in a semester, so
+each semester's distinct UPPER(usn) values are kept in a set. A set is loaded
+from the UPPER(usn) index the first time its semester is asked
+about and is kept current from the change feed (see changelog.ChangeFeed).
+The feed delivers this process's writes shortly after they commit, and
+writes by other processes (ingest_daemon.py, grading.py regrades, other
+workers) once app._watch_outside_writes sees them, within
+OUTSIDE_WRITES_POLL_SECONDS.
+"""
+import sqlite3
+import threading
+
+
+class UsnIndex:
+    def __init__(self, db_path_for_sem, semesters=(1, 2, 3, 4)):
+        self._db_path = db_path_for_sem
+        self._semesters = tuple(semesters)
+        self._sets = {}
+        self._lock = threading.Lock()
+
+    def _load(self, sem: int):
+        conn = sqlite3.connect(self._db_path(sem))
+        try:
+            return {row[0] for row in conn.execute("SELECT DISTINCT UPPER(usn) FROM students WHERE usn IS NOT NULL")}
+        finally:
+            conn.close()
+
+    def _set_for(self, sem: int):
+        usns = self._sets.get(sem)
+        if usns is None:
+            loaded = self._load(sem)
+            with self._lock:
+                usns = self._sets.setdefault(sem, loaded)
+        return usns
+
+    def rebuild(self):
+        loaded = {sem: self._load(sem) for sem in self._semesters}
+        with self._lock:
+            self._sets = loaded
+
+    def contains(self, sem: int, usn: str) -> bool:
+        if sem not in self._semesters:
+            return False
+        return (usn or '').strip().upper() in self._set_for(sem)
+
+    def apply_changes(self, changes):
+        """ChangeFeed callback"""
+        for change in changes:
+            if change.usn is None or change.semester not in self._sets:
+                continue
+            usn = change.usn.upper()
+            if change.op in ('I', 'U'):
+                with self._lock:
+                    self._sets[change.semester].add(usn)
+            elif change.op == 'D' and not self._still_present(change.semester, usn):
+                with self._lock:
+                    self._sets[change.semester].discard(usn)
+
+    def _still_present(self, sem: int, usn: str) -> bool:
+        conn = sqlite3.connect(self._db_path(sem))
+        try:
+            return conn.execute("SELECT 1 FROM students WHERE UPPER(usn) = ? LIMIT 1", (usn,)).fetchone() is not None
+        finally:
+            conn.close()
@@ -0,0 +1,129 @@
+"""Single-writer queue for one semester database.
+
+Every write (form inserts, spreadsheet uploads, deletes) is submitted as a
+job, a callable taking the writer's sqlite3 connection. One background
+thread owns that connection and runs queued jobs back to back inside a
+single transaction (group commit). Each job runs under its own SAVEPOINT,
+so a failing job is rolled back and reported to its caller without
+affecting the others. The DB is switched to WAL so readers on other
+connections are never blocked by the writer.
+
+Callers' futures resolve as soon as their batch commits. on_commit then
+runs on a separate dispatcher thread, with the commits that piled up
+meanwhile folded into one call (it gets the job count of each of them,
+oldest first), so downstream work never delays a write
+or holds up the writer. Derived state therefore catches up shortly after
+a caller resumes; notified() waits for it.
+"""
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+
+# Jobs committed together at most
+GROUP_COMMIT_MAX_JOBS = 64
+# How long the writer waits on a lock held by a writer outside this process
+WRITER_BUSY_TIMEOUT_MS = 30000
+
+
+class WriteQueue:
+    def __init__(self, db_path: str, on_commit=None, max_jobs: int = GROUP_COMMIT_MAX_JOBS):
+        self.db_path = db_path
+        self._on_commit = on_commit
+        self._max_jobs = max_jobs
+        self._jobs = queue.Queue()
+        # Job counts of committed batches waiting for on_commit
+        self._commits = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, job) -> Future:
+        """Queue job(conn); the future resolves after the transaction containing it commits"""
+        future = Future()
+        self._ensure_started()
+        self._jobs.put((job, future))
+        return future
+
+    def run(self, job, timeout: float = None):
+        """Submit and wait; re-raises the job's exception"""
+        return self.submit(job).result(timeout)
+
+    def notified(self):
+        """Block until on_commit has run for every batch committed so far"""
+        self._commits.join()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                if self._on_commit is not None:
+                    threading.Thread(target=self._dispatcher, name=f"on-commit:{self.db_path}", daemon=True).start()
+                self._thread = threading.Thread(target=self._writer, name=f"writer:{self.db_path}", daemon=True)
+                self._thread.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+        conn.execute(f"PRAGMA busy_timeout = {WRITER_BUSY_TIMEOUT_MS}")
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        return conn
+
+    def _writer(self):
+        conn = self._connect()
+        while True:
+            batch = [self._jobs.get()]
+            while len(batch) < self._max_jobs:
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit_batch(conn, batch)
+
+    def _dispatcher(self):
+        while True:
+            counts = [self._commits.get()]
+            while True:
+                try:
+                    counts.append(self._commits.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._on_commit(counts)
+            except Exception:
+                pass
+            finally:
+                for _ in counts:
+                    self._commits.task_done()
+
+    def _commit_batch(self, conn, batch):
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job, future in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT job")
+                try:
+                    results.append((future, job(conn), None))
+                    conn.execute("RELEASE job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    results.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        if self._on_commit is not None:
+            self._commits.put(len(results))